@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 import argparse
+import os
 import subprocess
 import shlex
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "demos_hailo", "common"))
+from encoder_probe import add_encoder_arguments, resolve_encoder
+
 def build_raw_sender(args):
     # gst-launch-1.0 -v \
     #   v4l2src device=/dev/video0 ! \
@@ -49,7 +53,7 @@ def build_raw_receiver(args):
     ]
     return pipeline
 
-def build_h264_sender(args):
+def build_h264_sender(args, encoder):
     # gst-launch-1.0 -v \
     #   v4l2src device=/dev/video0 ! \
     #   video/x-raw,width=1280,height=720,framerate=120/1 ! \
@@ -63,17 +67,20 @@ def build_h264_sender(args):
         "v4l2src", f"device={args.device}", "!",
         f"video/x-raw,width={args.width},height={args.height},framerate={args.framerate}/1", "!",
         "videoconvert", "!",
-        "x264enc",
-        f"tune={args.tune}",
-        f"speed-preset={args.speed_preset}",
-        f"bitrate={args.bitrate}",
-        f"key-int-max={args.key_int_max}", "!",
+        *shlex.split(encoder), "!",
         "h264parse", "!",
         "rtph264pay", "config-interval=1", "pt=96", "!",
         "udpsink", f"host={args.host}", f"port={args.port}",
     ]
     return pipeline
 
+def h264_encoder(args):
+    """Encoder fragment: the x264enc options below, or the one picked by --encoder"""
+    default = (f"x264enc tune={args.tune} speed-preset={args.speed_preset} "
+               f"bitrate={args.bitrate} key-int-max={args.key_int_max}")
+    return resolve_encoder(args, args.width, args.height, args.framerate, args.bitrate, args.key_int_max,
+                           default=default)
+
 def build_h264_receiver(args):
     # gst-launch-1.0 -v \
     #   udpsrc port=5000 caps="application/x-rtp, media=video, encoding-name=H264, clock-rate=90000, payload=96" ! \
@@ -97,7 +104,7 @@ def build_h264_receiver(args):
 def pipeline_to_cmd(pipeline):
     return " ".join(shlex.quote(x) for x in pipeline)
 
-def print_counter_side(role, codec, args):
+def print_counter_side(role, codec, args, encoder=None):
     """
     When we run sender, print the matching receiver command and vice versa.
     """
@@ -113,7 +120,7 @@ def print_counter_side(role, codec, args):
             pipe = build_raw_receiver(args)
     else:  # h264
         if other_role == "sender":
-            pipe = build_h264_sender(args)
+            pipe = build_h264_sender(args, encoder)
         else:
             pipe = build_h264_receiver(args)
 
@@ -172,6 +179,7 @@ def main():
                         help="x264enc tune (default: zerolatency).")
     parser.add_argument("--speed-preset", default="veryfast",
                         help="x264enc speed-preset (default: veryfast).")
+    add_encoder_arguments(parser)
 
     # Receiver display options
     parser.add_argument("--no-text-overlay", dest="text_overlay",
@@ -200,6 +208,9 @@ def main():
     if args.receiver:
         args.role = "receiver"
 
+    # The H.264 sender line (run here or printed for the other side) uses one resolved encoder
+    encoder = h264_encoder(args) if args.codec == "h264" else None
+
     # Build pipeline according to role+codec
     if args.codec == "raw":
         if args.role == "sender":
@@ -208,7 +219,7 @@ def main():
             pipeline = build_raw_receiver(args)
     else:  # h264
         if args.role == "sender":
-            pipeline = build_h264_sender(args)
+            pipeline = build_h264_sender(args, encoder)
         else:
             pipeline = build_h264_receiver(args)
 
@@ -221,7 +232,7 @@ def main():
     print("===================================================")
 
     # Print matching command for the other side
-    print_counter_side(args.role, args.codec, args)
+    print_counter_side(args.role, args.codec, args, encoder)
 
     if args.dry_run:
         print("Dry-run requested, not executing pipeline.")
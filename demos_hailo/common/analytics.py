@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+analytics.py - Python analytics callbacks off the GStreamer streaming thread
+The pad probe / handoff only copies the Hailo metadata it needs (a roi_arrays structured array, no
+GstBuffer or ROI references) into a bounded queue; worker threads, or a process pool for CPU-heavy callbacks, run the
+user function. A full queue follows the policy:
+
+  drop_oldest  replace the oldest waiting frame (latest data wins, never blocks the pipeline)
+  drop_newest  discard the incoming frame
+  block        backpressure: the streaming thread waits up to --analytics-block-ms, then drops
+
+Per frame: queue wait, callback run time and end-to-end latency (p50/p95/p99), plus drop and error counts.
+
+Callbacks take one FrameMeta and may return anything (passed to on_result on the worker thread).
+frame.objects has the fields of roi_arrays.object_dtype, frame.labels maps class_id -> label:
+  def my_analytics(frame):
+      return int(np.count_nonzero(frame.objects["confidence"] > 0.5))
+
+Usage (in a pipeline script):
+  from analytics import AnalyticsDispatcher, add_analytics_arguments, analytics_from_args
+  dispatcher = AnalyticsDispatcher(load_callback("my_module:my_analytics"), workers=2).start()
+  dispatcher.attach(pipeline.get_by_name("identity_callback"))
+"""
+
+import importlib
+import multiprocessing
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gi.repository import GLib
+
+from roi_arrays import HAVE_HAILO, RoiExtractor, count_by_class, extract_roi
+
+POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# Picklable copy of one frame's metadata (safe for worker processes);
+# objects is a structured array (roi_arrays.object_dtype), labels maps class_id -> label
+FrameMeta = namedtuple("FrameMeta", "seq pts timestamp objects labels")
+
+
+# -------- built-in callbacks --------
+
+def count_objects(frame):
+    """Objects per label"""
+    counts = count_by_class(frame.objects)
+    return {frame.labels.get(c, str(c)): int(n) for c, n in enumerate(counts) if n}
+
+
+BUILTINS = {"count": count_objects}
+
+
+def load_callback(spec):
+    """'count' or 'module:function' (module importable from the current directory / sys.path)"""
+    if spec in BUILTINS:
+        return BUILTINS[spec]
+    module_name, _, func_name = spec.partition(":")
+    if not func_name:
+        raise ValueError(f"analytics callback must be 'module:function' or one of {list(BUILTINS)}, got {spec!r}")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+# -------- dispatcher --------
+
+class LatencyWindow:
+    """Rolling window of millisecond samples"""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+
+    def add(self, ms):
+        self.samples.append(ms)
+
+    def stats(self):
+        if not self.samples:
+            return None
+        arr = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        p50, p95, p99 = np.percentile(arr, (50, 95, 99))
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(arr.max())}
+
+
+class AnalyticsDispatcher:
+    """Bounded queue between the streaming thread and the analytics workers"""
+
+    def __init__(self, callback, workers=1, processes=False, queue_size=8, policy="drop_oldest",
+                 block_ms=20.0, on_result=None, report_interval=10, window=1000):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {POLICIES}")
+        self.callback = callback
+        self.workers = max(1, workers)
+        self.processes = processes
+        self.policy = policy
+        self.block_s = block_ms / 1000.0
+        self.on_result = on_result
+        self.report_interval = report_interval
+
+        self._queue = deque()
+        self._queue_size = max(1, queue_size)
+        self._cond = threading.Condition()
+        self._threads = []
+        self._pool = None
+        self._stop = False
+        self._report_id = None
+        self._seq = 0
+        self.extractor = RoiExtractor()  # ROI -> structured array, reused across frames
+
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = Counter()   # reason -> frames
+        self.errors = 0
+        self.last_error = None
+        self.blocked_ms = 0.0      # time the streaming thread spent waiting (block policy)
+        self.wait = LatencyWindow(window)
+        self.run = LatencyWindow(window)
+        self.total = LatencyWindow(window)
+        self.start_time = time.time()
+
+    # -------- producer (streaming thread) --------
+
+    def attach(self, identity):
+        """Feed every buffer passing an identity element (handoff signal)"""
+        identity.set_property("signal-handoffs", True)
+        identity.connect("handoff", lambda _identity, buffer: self.submit(
+            extract_roi(buffer, self.extractor, copy=True), buffer.pts))
+        return self
+
+    def submit(self, objects, pts=None, labels=None):
+        """Queue one frame's metadata (structured array owned by the queue from now on) -> False when dropped"""
+        now = time.perf_counter()
+        labels = dict(self.extractor.labels if labels is None else labels)
+        with self._cond:
+            self._seq += 1
+            self.submitted += 1
+            frame = FrameMeta(self._seq, pts, time.time(), objects, labels)
+            if len(self._queue) >= self._queue_size:
+                if self.policy == "drop_newest":
+                    self.dropped["newest"] += 1
+                    return False
+                if self.policy == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped["oldest"] += 1
+                else:
+                    deadline = now + self.block_s
+                    while len(self._queue) >= self._queue_size and not self._stop:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    self.blocked_ms += (time.perf_counter() - now) * 1000.0
+                    if len(self._queue) >= self._queue_size:
+                        self.dropped["timeout"] += 1
+                        return False
+            self._queue.append((now, frame))
+            self._cond.notify_all()
+        return True
+
+    # -------- workers --------
+
+    def start(self):
+        if self.processes:
+            # spawn: forking a process that runs GStreamer streaming threads is not safe
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"analytics-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.report_interval:
+            self._report_id = GLib.timeout_add_seconds(self.report_interval, self.print_status)
+        return self
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stop:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                t_enqueue, frame = self._queue.popleft()
+                self._cond.notify_all()  # room for a blocked producer
+
+            t_start = time.perf_counter()
+            try:
+                if self._pool is not None:
+                    # One task in flight per worker thread: the pool never queues more than `workers`
+                    result = self._pool.submit(self.callback, frame).result()
+                else:
+                    result = self.callback(frame)
+                if self.on_result is not None:
+                    self.on_result(result, frame)
+            except Exception as e:
+                self.errors += 1
+                if self.last_error is None:
+                    print(f"⚠️  [ANALYTICS] callback failed: {type(e).__name__}: {e}")
+                self.last_error = f"{type(e).__name__}: {e}"
+            t_done = time.perf_counter()
+
+            self.processed += 1
+            self.wait.add((t_start - t_enqueue) * 1000.0)
+            self.run.add((t_done - t_start) * 1000.0)
+            self.total.add((t_done - t_enqueue) * 1000.0)
+
+    def stop(self, timeout=2.0):
+        """Let the workers finish what is queued (up to timeout), then shut down"""
+        if self._report_id is not None:
+            GLib.source_remove(self._report_id)
+            self._report_id = None
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while self._queue and time.perf_counter() < deadline:
+                self._cond.wait(0.05)
+            self.dropped["shutdown"] += len(self._queue)
+            self._queue.clear()
+            self._stop = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.perf_counter()))
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # -------- output --------
+
+    def report(self):
+        return {
+            "policy": self.policy,
+            "workers": self.workers,
+            "processes": self.processes,
+            "queue_size": self._queue_size,
+            "queued": len(self._queue),
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "dropped": dict(self.dropped),
+            "drop_rate": sum(self.dropped.values()) / self.submitted if self.submitted else 0.0,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "blocked_ms": round(self.blocked_ms, 3),
+            "wait_ms": self.wait.stats(),
+            "run_ms": self.run.stats(),
+            "total_ms": self.total.stats(),
+            "duration_s": round(time.time() - self.start_time, 3),
+        }
+
+    def print_status(self):
+        r = self.report()
+        line = (f"[ANALYTICS] {r['processed']}/{r['submitted']} frames, dropped {sum(r['dropped'].values())} "
+                f"({r['drop_rate'] * 100:.1f}%), errors {r['errors']}")
+        for key in ("run_ms", "total_ms"):
+            s = r[key]
+            if s:
+                line += f", {key[:-3]} p50 {s['p50']:.1f} p95 {s['p95']:.1f} ms"
+        if r["blocked_ms"]:
+            line += f", blocked {r['blocked_ms']:.0f} ms"
+        print(line)
+        return True
+
+
+# -------- CLI --------
+
+def add_analytics_arguments(parser):
+    """Standard --analytics options"""
+    parser.add_argument("--analytics", default=None,
+                        help="Run a Python callback on every frame's metadata off the streaming thread: "
+                             f"'module:function' or one of {list(BUILTINS)}")
+    parser.add_argument("--analytics-workers", type=int, default=1,
+                        help="--analytics: worker threads / processes (default: 1)")
+    parser.add_argument("--analytics-processes", action="store_true",
+                        help="--analytics: run the callback in a process pool (CPU-bound Python, no GIL contention)")
+    parser.add_argument("--analytics-queue", type=int, default=8,
+                        help="--analytics: frames waiting for a worker (default: 8)")
+    parser.add_argument("--analytics-policy", choices=POLICIES, default="drop_oldest",
+                        help="--analytics: full queue policy (default: drop_oldest)")
+    parser.add_argument("--analytics-block-ms", type=float, default=20.0,
+                        help="--analytics-policy block: longest streaming-thread wait before dropping (default: 20)")
+    parser.add_argument("--analytics-interval", type=int, default=10,
+                        help="--analytics: seconds between status lines, 0 = final only (default: 10)")
+
+
+def analytics_from_args(args, on_result=None):
+    """Started dispatcher, or None without --analytics"""
+    if not args.analytics:
+        return None
+    callback = load_callback(args.analytics)
+    dispatcher = AnalyticsDispatcher(
+        callback, workers=args.analytics_workers, processes=args.analytics_processes,
+        queue_size=args.analytics_queue, policy=args.analytics_policy, block_ms=args.analytics_block_ms,
+        on_result=on_result, report_interval=args.analytics_interval,
+    )
+    if not HAVE_HAILO:
+        print("⚠️  hailo Python module not available: analytics frames carry no objects")
+    return dispatcher.start()
+
+
+def finish_analytics(dispatcher):
+    if dispatcher is None:
+        return
+    dispatcher.stop()
+    dispatcher.print_status()
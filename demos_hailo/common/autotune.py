@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+autotune.py - Search queue depths, n-threads and hailonet batch size for a pipeline on this host
+Runs the pipeline builder headless (fakesink) over a fixed clip once per candidate PipelineParams,
+measures output fps and per-frame latency (videorate -> display sink pad probes), and walks the
+parameter space by coordinate descent: one field at a time, keep the best value, repeat until a
+pass brings no improvement. The winner is stored per host in the profile file (pipeline_params.py),
+which the scripts load with --profile.
+
+Objectives:
+  throughput  clip decoded as fast as possible, maximise fps (ties -> lower p95 latency)
+  latency     clip paced in real time, minimise p95 latency while keeping the inference rate
+
+Usage:
+  python autotune.py --pipeline pose --clip clip.mp4 --hef ../demo0_pose/yolov8m_pose.hef \\
+      --post ../demo0_pose/libyolov8pose_postprocess.so --objective latency
+  python ../demo0_pose/pose_pipe.py --profile --profile-objective latency
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+from pipeline_params import OBJECTIVES, PROFILE_PATH, profile_key, save_profile_entry
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (demo directory, module, builder, searched fields)
+PIPELINES = {
+    "pose": ("demo0_pose", "pose_pipe", "build_pipeline",
+             ("queue_buffers", "hailonet_queue_buffers", "scale_threads", "convert_threads",
+              "source_convert_threads", "batch_size")),
+    "pose_profile": ("demo0_pose", "pose_pipe_profile", "build_pipeline",
+                     ("queue_buffers", "hailonet_queue_buffers", "scale_threads", "convert_threads",
+                      "source_convert_threads", "batch_size")),
+    "detection": ("demo1_detec", "detection", "build_detection_pipeline",
+                  ("queue_buffers", "hailonet_queue_buffers", "scale_threads", "convert_threads", "batch_size")),
+}
+
+SPACE = {
+    "queue_buffers": [1, 2, 3, 5, 8, 16, 30],
+    "hailonet_queue_buffers": [None, 1, 2, 4, 8],
+    "scale_threads": [1, 2, 3, 4],
+    "convert_threads": [1, 2, 3, 4],
+    "source_convert_threads": [None, 1, 2, 3, 4],
+    "batch_size": [1, 2, 4, 8],
+}
+
+
+def load_builder(pipeline):
+    """(builder function, module DEFAULT_PARAMS, searched fields)"""
+    directory, module_name, builder_name, fields = PIPELINES[pipeline]
+    sys.path.insert(0, os.path.join(HERE, "..", directory))
+    module = importlib.import_module(module_name)
+    return getattr(module, builder_name), module.DEFAULT_PARAMS, fields
+
+
+def builder_kwargs(pipeline, args):
+    """Builder arguments for a headless run over the clip"""
+    kwargs = dict(width=args.width, height=args.height, hef_path=args.hef, post_so=args.post,
+                  input_source=args.clip, video_sink="fakesink")
+    if pipeline == "pose_profile":
+        kwargs.update(sensor_fps=args.fps, process_fps=args.inference_fps or args.fps)
+    else:
+        kwargs.update(input_fps=args.fps, inference_fps=args.inference_fps or args.fps)
+    if pipeline == "detection":
+        kwargs.update(network_name=args.network)
+    return kwargs
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_once(pipeline_str, seconds=10.0, warmup=2.0, paced=False):
+    """Run one headless pipeline -> {'ok', 'fps', 'p50_ms', 'p95_ms', 'frames'[, 'error']}"""
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst, GLib
+    Gst.init(None)
+
+    try:
+        pipeline = Gst.parse_launch(pipeline_str)
+    except GLib.GError as e:
+        return {"ok": False, "error": str(e)}
+
+    pace = pipeline.get_by_name("source_pace")
+    if pace is not None:
+        pace.set_property("sync", paced)
+
+    t_in = {}
+    out = {"latencies": [], "times": []}
+
+    def on_in(pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            t_in[buffer.pts] = time.perf_counter()
+        return Gst.PadProbeReturn.OK
+
+    def on_out(pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            now = time.perf_counter()
+            t0 = t_in.pop(buffer.pts, None)
+            if t0 is not None:
+                out["latencies"].append((now, (now - t0) * 1000.0))
+            out["times"].append(now)
+        return Gst.PadProbeReturn.OK
+
+    pipeline.get_by_name("inference_rate").get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, on_in)
+    pipeline.get_by_name("hailo_display").get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_out)
+
+    start = time.perf_counter()
+    pipeline.set_state(Gst.State.PLAYING)
+    msg = pipeline.get_bus().timed_pop_filtered(int((warmup + seconds) * Gst.SECOND),
+                                                Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    pipeline.set_state(Gst.State.NULL)
+
+    if msg is not None and msg.type == Gst.MessageType.ERROR:
+        err, _ = msg.parse_error()
+        return {"ok": False, "error": str(err)}
+
+    # Steady state only: drop the warmup (device configuration, queues filling)
+    times = [t for t in out["times"] if t - start >= warmup]
+    latencies = [ms for t, ms in out["latencies"] if t - start >= warmup]
+    if len(times) < 2:
+        return {"ok": False, "error": f"only {len(out['times'])} frames (clip shorter than the warmup?)"}
+    return {
+        "ok": True,
+        "fps": (len(times) - 1) / (times[-1] - times[0]),
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "frames": len(times),
+    }
+
+
+def better(candidate, best, objective, min_fps=0.0):
+    """True if candidate metrics beat best for the objective"""
+    if not candidate.get("ok"):
+        return False
+    if not best.get("ok"):
+        return True
+    if objective == "throughput":
+        if candidate["fps"] > best["fps"] * 1.02:
+            return True
+        return candidate["fps"] >= best["fps"] * 0.98 and candidate["p95_ms"] < best["p95_ms"]
+    # latency: only configurations that keep up with the input rate count
+    keeps_up, best_keeps_up = candidate["fps"] >= min_fps, best["fps"] >= min_fps
+    if keeps_up != best_keeps_up:
+        return keeps_up
+    return candidate["p95_ms"] < best["p95_ms"]
+
+
+def coordinate_descent(evaluate, start, fields, objective, passes=3, min_fps=0.0, space=SPACE):
+    """Optimise one field at a time from start -> (best params, best metrics, {params: metrics})"""
+    tried = {}
+
+    def measure(params):
+        if params not in tried:
+            tried[params] = evaluate(params)
+        return tried[params]
+
+    best, best_m = start, measure(start)
+    for _ in range(passes):
+        improved = False
+        for field in fields:
+            for value in space[field]:
+                candidate = best.replace(**{field: value})
+                if candidate in tried or candidate == best:
+                    continue
+                m = measure(candidate)
+                if better(m, best_m, objective, min_fps):
+                    best, best_m, improved = candidate, m, True
+        if not improved:
+            break
+    return best, best_m, tried
+
+
+def format_metrics(m):
+    if not m.get("ok"):
+        return f"failed: {m.get('error', 'unknown')}"
+    return f"{m['fps']:6.1f} fps  p50 {m['p50_ms']:6.1f} ms  p95 {m['p95_ms']:6.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune queue depths, n-threads and batch size per host")
+    parser.add_argument("--pipeline", choices=list(PIPELINES), default="pose", help="Builder to tune (default: pose)")
+    parser.add_argument("--clip", required=True, help="Fixed video clip every candidate runs over")
+    parser.add_argument("--hef", required=True, help="HEF model file")
+    parser.add_argument("--post", required=True, help="Post-process .so")
+    parser.add_argument("--network", default="yolov8m", help="detection: hailofilter function-name")
+    parser.add_argument("--width", type=int, default=640, help="Frame width fed to the pipeline (default: 640)")
+    parser.add_argument("--height", type=int, default=480, help="Frame height (default: 480)")
+    parser.add_argument("--fps", type=int, default=30, help="Clip frame rate (default: 30)")
+    parser.add_argument("--inference-fps", type=int, default=None,
+                        help="videorate output during the runs (default: --fps, no frames dropped)")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="throughput",
+                        help="throughput: max fps; latency: min p95 latency in real time (default: throughput)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measured seconds per run (default: 10)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds ignored at the start (default: 2)")
+    parser.add_argument("--passes", type=int, default=3, help="Max coordinate descent passes (default: 3)")
+    parser.add_argument("--profile", default=PROFILE_PATH, help=f"Profile file (default: {PROFILE_PATH})")
+    parser.add_argument("--no-save", action="store_true", help="Print the result without writing the profile")
+    args = parser.parse_args()
+
+    try:
+        builder, defaults, fields = load_builder(args.pipeline)
+    except (ImportError, ValueError) as e:
+        print(f"❌ Cannot load the {args.pipeline} builder (GStreamer Python bindings?): {e}")
+        return 1
+    kwargs = builder_kwargs(args.pipeline, args)
+    paced = args.objective == "latency"
+    min_fps = 0.95 * (args.inference_fps or args.fps)
+
+    print(f"🎛️  Tuning {args.pipeline} for {args.objective} over {args.clip} "
+          f"({args.seconds:.0f} s per run, fields: {', '.join(fields)})")
+
+    def evaluate(params):
+        m = run_once(builder(params=params, **kwargs), args.seconds, args.warmup, paced)
+        print(f"  {format_metrics(m):<48} {params.describe()}")
+        return m
+
+    best, best_m, tried = coordinate_descent(evaluate, defaults, fields, args.objective, args.passes, min_fps)
+
+    print(f"\n✅ Best of {len(tried)} runs: {format_metrics(best_m)}")
+    print(f"   {best.describe()}")
+    start_m = tried[defaults]
+    if start_m.get("ok") and best_m.get("ok"):
+        print(f"   defaults: {format_metrics(start_m)}")
+    if not best_m.get("ok"):
+        print("❌ No configuration ran successfully")
+        return 1
+    if not args.no_save:
+        save_profile_entry(args.pipeline, args.objective, best,
+                           {k: round(v, 2) for k, v in best_m.items() if k in ("fps", "p50_ms", "p95_ms")},
+                           args.profile)
+        print(f"💾 Saved as {profile_key(args.pipeline, args.objective)} in {args.profile}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+bench_event_log.py - Cost of per-frame logging on the calling (streaming) thread
+Simulates the tracking callbacks (a few lines per frame plus one per object) and compares
+print(..., flush=True) with EventLog in verbose, summary and quiet modes.
+Output of the print/verbose runs goes to /dev/null so the terminal does not dominate.
+
+Usage: python bench_event_log.py --frames 2000 --objects 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from event_log import EventLog
+
+
+def frame_prints(frame, objects, out):
+    print(f"🔍 Processing buffer #{frame}: 24576 bytes, 1 SEI NAL(s)", file=out, flush=True)
+    print(f"[TRACK] Frame {frame}: {objects} objects", file=out, flush=True)
+    for i in range(objects):
+        print(f"  🏷️  id {i:4d}  class {1:2d}  conf {0.87:.2f}  box ({0.1:.3f},{0.2:.3f},{0.3:.3f},{0.4:.3f})",
+              file=out, flush=True)
+
+
+def frame_events(frame, objects, log):
+    log.log("probe", "🔍 Processing buffer #%s: %s bytes, %s SEI NAL(s)", frame, 24576, 1)
+    log.log("track", "[TRACK] Frame %d: %d objects", frame, objects)
+    for i in range(objects):
+        log.log("track", "  🏷️  id %4d  class %2d  conf %.2f  box (%.3f,%.3f,%.3f,%.3f)",
+                i, 1, 0.87, 0.1, 0.2, 0.3, 0.4)
+
+
+def run(name, frames, objects, fn):
+    start = time.perf_counter()
+    for frame in range(frames):
+        fn(frame, objects)
+    elapsed = time.perf_counter() - start
+    per_frame_us = elapsed / frames * 1e6
+    print(f"{name:<22} {per_frame_us:9.2f} µs/frame on caller  ({frames / elapsed:,.0f} frames/s)")
+    return per_frame_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-frame logging cost")
+    parser.add_argument("--frames", type=int, default=2000, help="Frames to simulate (default: 2000)")
+    parser.add_argument("--objects", type=int, default=5, help="Objects logged per frame (default: 5)")
+    parser.add_argument("--rate", type=int, default=30, help="Per-category rate limit for the rate-limited run")
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    print(f"Per-frame logging, {args.frames} frames x ({args.objects} objects + 2 lines)")
+    print("-" * 70)
+
+    base = run("print(flush=True)", args.frames, args.objects,
+               lambda f, n: frame_prints(f, n, devnull))
+
+    results = {}
+    for label, kwargs in (("EventLog verbose", {"mode": "verbose"}),
+                          (f"EventLog verbose/{args.rate}s", {"mode": "verbose", "default_rate": args.rate}),
+                          ("EventLog summary", {"mode": "summary"}),
+                          ("EventLog quiet", {"mode": "quiet"})):
+        log = EventLog(stream=devnull, **kwargs)
+        results[label] = run(label, args.frames, args.objects, lambda f, n: frame_events(f, n, log))
+        log.close()
+
+    print("-" * 70)
+    for label, us in results.items():
+        print(f"{label:<22} {base / us:6.1f}x less caller time than print(flush=True)")
+    devnull.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py - Headless benchmark of the pipeline builders (no camera, display or Hailo device)
+Takes the gst-launch description a builder produces and rewrites it for a CI box:
+  v4l2src                                   -> videotestsrc num-buffers=N (or the builder's filesrc with --clip)
+  xvimagesink / fpsdisplaysink video-sink   -> fakesink
+  tcpclientsink / splitmuxsink              -> fakesink (the encoder before it still runs)
+  hailonet                                  -> identity stand-in: fixed delay (sleep-time) or a small NumPy CPU model
+  hailofilter / hailotracker / hailooverlay -> identity (optional delay)
+  hailomuxer                                -> input-selector passing sink_0, each frame held until one sink_1
+                                               buffer arrived (MuxerPairing: one video + one metadata buffer ->
+                                               one output, as hailomuxer), dropped if unlinked
+Element names are kept, so the per-element tracer (stage_trace.py) reports the same stages as on the device.
+Runs N frames and writes throughput, per-stage latency and CPU usage to JSON; --baseline fails (exit 1)
+when fps or CPU per frame regressed by more than --tolerance.
+
+Usage:
+  python bench_pipeline.py --pipeline pose --frames 600 --standin delay --infer-delay-ms 25 --output pose.json
+  python bench_pipeline.py --pipeline detection --standin cpu --cpu-model-iters 20 --baseline ci/detection.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (demo directory, module, builder)
+BUILDERS = {
+    "pose": ("demo0_pose", "pose_pipe", "build_pipeline"),
+    "pose_profile": ("demo0_pose", "pose_pipe_profile", "build_pipeline"),
+    "detection": ("demo1_detec", "detection", "build_detection_pipeline"),
+    "detection_files": ("demo1_detec", "detection_files", "build_detection_pipeline"),
+}
+
+HAILO_ELEMENTS = ("hailonet", "hailofilter", "hailotracker", "hailooverlay")
+VIDEO_SINKS = ("xvimagesink", "ximagesink", "autovideosink", "glimagesink", "kmssink", "waylandsink")
+FILE_SINKS = ("tcpclientsink", "splitmuxsink", "filesink", "udpsink")
+
+
+# -------- pipeline rewrite --------
+
+def _chunks(segment):
+    """Split one '!'-separated segment into elements (unlinked elements share a segment)"""
+    chunks = []
+    for word in segment.split():
+        if not chunks or "=" not in word:
+            chunks.append([word])
+        else:
+            chunks[-1].append(word)
+    return chunks
+
+
+def _prop(words, key):
+    for w in words[1:]:
+        if w.startswith(key + "="):
+            return w
+    return None
+
+
+def _rewrite_element(words, source_buffers, live, infer_delay_ms, filter_delay_ms, linked):
+    factory = words[0]
+    name = _prop(words, "name")
+    named = f" {name}" if name else ""
+    if factory == "hailomuxer":
+        # input-selector forwards its active pad (sink_0 = frames) and drops the metadata branch;
+        # MuxerPairing holds every sink_0 frame until a sink_1 buffer arrived
+        return f"input-selector{named} sync-streams=false" if name and name[5:] in linked else None
+    if factory == "v4l2src":
+        return f"videotestsrc{named} pattern=ball num-buffers={source_buffers} is-live={str(live).lower()}"
+    if factory == "hailonet":
+        sleep = f" sleep-time={int(infer_delay_ms * 1000)}" if infer_delay_ms else ""
+        return f"identity{named}{sleep}"
+    if factory in HAILO_ELEMENTS:
+        sleep = f" sleep-time={int(filter_delay_ms * 1000)}" if filter_delay_ms and factory == "hailofilter" else ""
+        return f"identity{named}{sleep}"
+    if factory in VIDEO_SINKS or factory in FILE_SINKS:
+        return f"fakesink{named} sync=false async=false"
+    if factory == "fpsdisplaysink":
+        return " ".join("video-sink=fakesink" if w.startswith("video-sink=") else w for w in words)
+    return " ".join(words)
+
+
+def make_headless(pipeline_str, source_buffers=600, live=False, infer_delay_ms=0.0, filter_delay_ms=0.0):
+    """Rewrite a builder's pipeline description for a host-only run"""
+    linked = {w.split(".")[0] for w in pipeline_str.split() if "." in w and "=" not in w and "/" not in w}
+    segments = []
+    for segment in pipeline_str.split(" ! "):
+        elements = [_rewrite_element(words, source_buffers, live, infer_delay_ms, filter_delay_ms, linked)
+                    for words in _chunks(segment)]
+        segments.append(" ".join(e for e in elements if e))
+    return " ! ".join(segments)
+
+
+# -------- CPU model stand-in --------
+
+class CpuModel:
+    """A few dense layers over a SIZExSIZE sample of the frame, run in the streaming thread like hailonet"""
+
+    def __init__(self, iters=10, size=256, seed=0):
+        rng = np.random.default_rng(seed)
+        self.iters = iters
+        self.size = size
+        self.weights = rng.standard_normal((size, size)).astype(np.float32) / size
+
+    def run(self, data):
+        frame = np.frombuffer(data, dtype=np.uint8)
+        n = self.size * self.size
+        stride = max(1, frame.size // n)
+        x = frame[::stride][:n]
+        if x.size < n:
+            x = np.resize(x, n)
+        x = x.reshape(self.size, self.size).astype(np.float32) / 255.0
+        for _ in range(self.iters):
+            x = np.tanh(x @ self.weights)
+        return float(x[0, 0])
+
+    def attach(self, element):
+        from gi.repository import Gst
+
+        def on_buffer(pad, info):
+            buffer = info.get_buffer()
+            if buffer is not None:
+                ok, map_info = buffer.map(Gst.MapFlags.READ)
+                if ok:
+                    try:
+                        self.run(map_info.data)
+                    finally:
+                        buffer.unmap(map_info)
+            return Gst.PadProbeReturn.OK
+
+        element.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, on_buffer)
+
+
+# -------- hailomuxer stand-in --------
+
+class MuxerPairing:
+    """Synchronizing-muxer semantics on the input-selector stand-in: each sink_0 buffer waits for one sink_1
+    buffer, so a metadata branch that carries fewer buffers paces the output as it does on the device"""
+
+    def __init__(self, selector):
+        from gi.repository import Gst
+        self._ok = Gst.PadProbeReturn.OK
+        self._eos = Gst.EventType.EOS
+        self.tokens = threading.Semaphore(0)
+        self.closed = False
+        self.paired = 0
+        selector.get_static_pad("sink_0").add_probe(Gst.PadProbeType.BUFFER, self._on_frame)
+        selector.get_static_pad("sink_1").add_probe(
+            Gst.PadProbeType.BUFFER | Gst.PadProbeType.EVENT_DOWNSTREAM, self._on_metadata)
+
+    def _on_metadata(self, pad, info):
+        event = info.get_event()
+        if event is None:
+            self.tokens.release()
+        elif event.type == self._eos:
+            self.close()
+        return self._ok
+
+    def _on_frame(self, pad, info):
+        while not self.tokens.acquire(timeout=0.1):
+            if self.closed:
+                return self._ok
+        self.paired += 1
+        return self._ok
+
+    def close(self):
+        """Metadata branch ended or the pipeline is stopping: stop holding frames"""
+        self.closed = True
+        self.tokens.release()
+
+
+# -------- run --------
+
+def load_builder(pipeline):
+    directory, module_name, builder_name = BUILDERS[pipeline]
+    sys.path.insert(0, os.path.join(HERE, "..", directory))
+    return getattr(importlib.import_module(module_name), builder_name)
+
+
+def builder_kwargs(pipeline, args):
+    kwargs = dict(width=args.width, height=args.height)
+    if args.clip:
+        kwargs["input_source"] = args.clip
+    if pipeline in ("pose", "pose_profile"):
+        kwargs.update(topology=args.topology)
+    if pipeline == "pose_profile":
+        kwargs.update(sensor_fps=args.fps, process_fps=args.fps)
+    else:
+        kwargs.update(input_fps=args.fps, inference_fps=args.fps)
+    if pipeline == "detection_files":
+        kwargs.update(output_dir=tempfile.mkdtemp(prefix="bench_"), max_files=1)
+    return kwargs
+
+
+def run_benchmark(pipeline_str, frames, warmup, cpu_model=None, counter="inference_hailonet", timeout=None):
+    """Run until `frames` frames passed `counter` after `warmup` frames -> metrics dict"""
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst, GLib
+    Gst.init(None)
+
+    from stage_trace import StageTracer
+
+    pipeline = Gst.parse_launch(pipeline_str)
+    if cpu_model is not None:
+        cpu_model.attach(pipeline.get_by_name(counter))
+    hmux = pipeline.get_by_name("hmux")
+    pairing = MuxerPairing(hmux) if hmux is not None and hmux.get_static_pad("sink_1") is not None else None
+    tracer = StageTracer(pipeline, window=frames).attach()
+
+    state = {"n": 0, "t0": None, "cpu0": None, "t1": None, "cpu1": None}
+    loop = GLib.MainLoop()
+
+    def on_frame(pad, info):
+        state["n"] += 1
+        if state["n"] == warmup:
+            state["t0"], state["cpu0"] = time.perf_counter(), time.process_time()
+        elif state["n"] == warmup + frames:
+            state["t1"], state["cpu1"] = time.perf_counter(), time.process_time()
+            GLib.idle_add(loop.quit)
+        return Gst.PadProbeReturn.OK
+
+    pipeline.get_by_name(counter).get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, on_frame)
+
+    def on_message(bus, message):
+        if message.type == Gst.MessageType.ERROR:
+            err, _ = message.parse_error()
+            state["error"] = str(err)
+            loop.quit()
+        elif message.type == Gst.MessageType.EOS:
+            loop.quit()
+
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+    bus.connect("message", on_message)
+    def on_timeout():
+        state["error"] = f"timeout after {timeout:.0f} s ({state['n']} frames)"
+        loop.quit()
+        return False
+
+    if timeout:
+        GLib.timeout_add_seconds(int(timeout), on_timeout)
+
+    pipeline.set_state(Gst.State.PLAYING)
+    loop.run()
+    if state["t1"] is None and state["t0"] is not None:
+        state["t1"], state["cpu1"] = time.perf_counter(), time.process_time()  # EOS / error before N frames
+    if pairing is not None:
+        pairing.close()
+    pipeline.set_state(Gst.State.NULL)
+
+    measured = state["n"] - warmup
+    result = {"frames": max(measured, 0), "error": state.get("error")}
+    if state["t0"] is not None and measured > 0:
+        wall = state["t1"] - state["t0"]
+        cpu = state["cpu1"] - state["cpu0"]
+        result.update(wall_s=wall, fps=measured / wall, cpu_pct=cpu / wall * 100.0,
+                      cpu_ms_per_frame=cpu / measured * 1000.0)
+    result["stages"] = tracer.report()["elements"]
+    return result
+
+
+def compare(result, baseline, tolerance):
+    """Regression messages (empty list = pass)"""
+    problems = []
+    if baseline.get("fps") and result.get("fps", 0.0) < baseline["fps"] * (1.0 - tolerance):
+        problems.append(f"fps {result.get('fps', 0.0):.1f} < baseline {baseline['fps']:.1f} - {tolerance:.0%}")
+    if baseline.get("cpu_ms_per_frame") and \
+            result.get("cpu_ms_per_frame", 0.0) > baseline["cpu_ms_per_frame"] * (1.0 + tolerance):
+        problems.append(f"CPU {result['cpu_ms_per_frame']:.2f} ms/frame > baseline "
+                        f"{baseline['cpu_ms_per_frame']:.2f} + {tolerance:.0%}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless pipeline benchmark with a stand-in inference stage")
+    parser.add_argument("--pipeline", choices=list(BUILDERS), default="pose", help="Builder (default: pose)")
+    parser.add_argument("--frames", type=int, default=600, help="Measured frames (default: 600)")
+    parser.add_argument("--warmup", type=int, default=60, help="Frames before measuring (default: 60)")
+    parser.add_argument("--width", type=int, default=640, help="Source width (default: 640)")
+    parser.add_argument("--height", type=int, default=480, help="Source height (default: 480)")
+    parser.add_argument("--fps", type=int, default=30, help="Source / inference frame rate (default: 30)")
+    parser.add_argument("--topology", choices=["linear", "bypass"], default="linear",
+                        help="pose / pose_profile: linear or hailomuxer bypass topology (default: linear)")
+    parser.add_argument("--clip", default=None, help="Video file instead of videotestsrc")
+    parser.add_argument("--live", action="store_true",
+                        help="Live videotestsrc (paced at --fps) instead of as fast as possible")
+    parser.add_argument("--standin", choices=["delay", "cpu"], default="delay",
+                        help="hailonet stand-in: identity with a fixed delay or a NumPy CPU model (default: delay)")
+    parser.add_argument("--infer-delay-ms", type=float, default=20.0,
+                        help="--standin delay: per-frame delay of the hailonet stand-in (default: 20)")
+    parser.add_argument("--cpu-model-iters", type=int, default=10,
+                        help="--standin cpu: dense layers per frame (default: 10)")
+    parser.add_argument("--cpu-model-size", type=int, default=256,
+                        help="--standin cpu: layer width, the frame is sampled to SIZExSIZE (default: 256)")
+    parser.add_argument("--filter-delay-ms", type=float, default=0.0,
+                        help="Per-frame delay of the hailofilter stand-in (default: 0)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Abort after this many seconds (default: 300)")
+    parser.add_argument("--output", default=None, help="Write the JSON result here")
+    parser.add_argument("--baseline", default=None, help="Previous JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="--baseline: allowed fps drop / CPU increase (default: 0.10)")
+    parser.add_argument("--print", action="store_true", help="Print the rewritten pipeline and exit")
+    args = parser.parse_args()
+
+    try:
+        builder = load_builder(args.pipeline)
+    except (ImportError, ValueError) as e:
+        print(f"❌ Cannot load the {args.pipeline} builder (GStreamer Python bindings?): {e}")
+        return 1
+
+    pipeline_str = make_headless(
+        builder(**builder_kwargs(args.pipeline, args)),
+        source_buffers=args.warmup + args.frames + 30,
+        live=args.live,
+        infer_delay_ms=args.infer_delay_ms if args.standin == "delay" else 0.0,
+        filter_delay_ms=args.filter_delay_ms,
+    )
+    if args.print:
+        print(pipeline_str)
+        return 0
+
+    cpu_model = CpuModel(args.cpu_model_iters, args.cpu_model_size) if args.standin == "cpu" else None
+    print(f"🏁 {args.pipeline}: {args.frames} frames ({args.warmup} warmup), stand-in {args.standin}")
+    result = run_benchmark(pipeline_str, args.frames, args.warmup, cpu_model, timeout=args.timeout)
+    result.update(pipeline=args.pipeline, host=socket.gethostname(), time=time.time(),
+                  config={k: v for k, v in vars(args).items() if k not in ("output", "baseline", "print")})
+
+    if result.get("error"):
+        print(f"⚠️  {result['error']}")
+    if "fps" in result:
+        print(f"📊 {result['frames']} frames in {result['wall_s']:.2f} s: {result['fps']:.1f} fps, "
+              f"CPU {result['cpu_pct']:.0f}% ({result['cpu_ms_per_frame']:.2f} ms/frame)")
+    for stage in result["stages"]:
+        s = stage["stats"]
+        if s:
+            print(f"  {stage['name']:<30} p50 {s['p50']:7.2f}  p95 {s['p95']:7.2f}  p99 {s['p99']:7.2f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 {args.output}")
+
+    if "fps" not in result:
+        return 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(result, json.load(f), args.tolerance)
+        for p in problems:
+            print(f"❌ Regression: {p}")
+        if problems:
+            return 1
+        print(f"✅ Within {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+bench_postprocess.py - Parity and throughput of np_postprocess against the C++ hailofilter, no device needed
+  --capture FILE.npz  frames saved by `detection.py / pose_pipe.py --post-capture FILE.npz` (raw FLOAT32 tensors,
+                      the .so filter's detections and its per-frame time): the NumPy detections are matched to the
+                      C++ ones (same class, IoU >= 0.5) and ms/frame is compared with the hailofilter time
+  (default)           synthetic YOLOv8 / YOLOv8-pose heads with planted objects: the decoded boxes are checked
+                      against the planted ones, throughput only (no C++ reference)
+Throughput is measured per frame at each --batch size (frames decoded together in one call).
+Usage:
+  python bench_postprocess.py --capture pose.npz --batch 1 4 8
+  python bench_postprocess.py --kind yolov8 --objects 20 --frames 64
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from np_postprocess import KIND_DEFAULTS, YoloPostProcess, load_capture, parity
+from roi_arrays import object_dtype
+
+REG_MAX = 16
+STRIDES = (8, 16, 32)
+
+
+# -------- synthetic heads --------
+
+def synthetic_frame(rng, kind, objects, size=640, num_classes=None):
+    """{output name: (H, W, C)} with `objects` boxes planted at their centre cell -> (tensors, ground truth)"""
+    classes, keypoints = KIND_DEFAULTS[kind][:2]
+    classes = num_classes or classes
+    tensors, truth = {}, np.zeros(objects, dtype=object_dtype(keypoints))
+    truth["track_id"] = -1
+    heads = {}
+    for i, stride in enumerate(STRIDES):
+        g = size // stride
+        box = rng.normal(0.0, 1.0, (g, g, 4 * REG_MAX)).astype(np.float32)
+        cls = (rng.random((g, g, classes), dtype=np.float32) * 0.05)   # background well under any threshold
+        heads[stride] = [box, cls]
+        tensors[f"{kind}/conv_box{i}"] = box
+        tensors[f"{kind}/conv_cls{i}"] = cls
+        if keypoints:
+            kpt = rng.normal(0.0, 1.0, (g, g, 3 * keypoints)).astype(np.float32)
+            heads[stride].append(kpt)
+            tensors[f"{kind}/conv_kpt{i}"] = kpt
+
+    used = set()
+    for n in range(objects):
+        while True:
+            stride = STRIDES[rng.integers(len(STRIDES))]
+            g = size // stride
+            gx, gy = rng.integers(1, g - 1, 2)
+            if (stride, gx, gy) not in used:
+                used.add((stride, gx, gy))
+                break
+        # integer bin distances: a very peaked DFL decodes to the bin index exactly
+        dist = rng.integers(1, REG_MAX - 1, 4)
+        box, cls = heads[stride][:2]
+        logits = np.full((4, REG_MAX), -20.0, dtype=np.float32)
+        logits[np.arange(4), dist] = 20.0
+        box[gy, gx] = logits.ravel()
+        class_id = rng.integers(classes)
+        score = rng.uniform(0.6, 0.99)
+        cls[gy, gx, class_id] = score
+        cx, cy = (gx + 0.5) * stride, (gy + 0.5) * stride
+        x1, y1 = np.clip((cx - dist[0] * stride) / size, 0, 1), np.clip((cy - dist[1] * stride) / size, 0, 1)
+        x2, y2 = np.clip((cx + dist[2] * stride) / size, 0, 1), np.clip((cy + dist[3] * stride) / size, 0, 1)
+        truth[n]["class_id"] = class_id
+        truth[n]["confidence"] = score
+        truth[n]["bbox"] = (x1, y1, x2 - x1, y2 - y1)
+        if keypoints:
+            raw = heads[stride][2][gy, gx].reshape(keypoints, 3)
+            kp = truth[n]["keypoints"]
+            kp[:, 0] = (raw[:, 0] * 2.0 + gx) * stride / size
+            kp[:, 1] = (raw[:, 1] * 2.0 + gy) * stride / size
+            kp[:, 2] = 1.0 / (1.0 + np.exp(-raw[:, 2]))
+    return tensors, truth
+
+
+# -------- measurement --------
+
+def throughput(engine, frames, batch, repeats):
+    """ms per frame decoding `frames` in batches of `batch` (tensors stacked beforehand, as hailonet batches)"""
+    batches = []
+    for start in range(0, len(frames) - batch + 1, batch):
+        chunk = frames[start:start + batch]
+        batches.append({name: np.stack([f[name] for f in chunk]) for name in chunk[0]})
+    if not batches:
+        return None
+    engine.decode_batch(batches[0])  # warm-up (layout resolution)
+    samples = []
+    for _ in range(repeats):
+        for tensors in batches:
+            t0 = time.perf_counter()
+            engine.decode_batch(tensors)
+            samples.append((time.perf_counter() - t0) * 1000.0 / batch)
+    return {"p50": float(np.percentile(samples, 50)), "p95": float(np.percentile(samples, 95))}
+
+
+def fmt(value, spec=".3f"):
+    return "-" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy YOLO post-process vs the C++ hailofilter")
+    parser.add_argument("--capture", default=None, help="--post-capture .npz from a pipeline run")
+    parser.add_argument("--kind", choices=("auto", "yolov8", "yolov8pose", "nms"), default="auto",
+                        help="Output layout (default: auto; synthetic runs use yolov8pose for auto)")
+    parser.add_argument("--score", type=float, default=None, help="Score threshold (default: model default)")
+    parser.add_argument("--iou", type=float, default=None, help="NMS IoU threshold (default: model default)")
+    parser.add_argument("--sigmoid", action="store_true", help="Class outputs are logits")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4, 8], help="Batch sizes (default: 1 4 8)")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the frames per batch size")
+    parser.add_argument("--frames", type=int, default=32, help="Synthetic frames (default: 32)")
+    parser.add_argument("--objects", type=int, default=10, help="Synthetic objects per frame (default: 10)")
+    parser.add_argument("--output", default=None, help="Write the results as JSON here")
+    args = parser.parse_args()
+
+    def make_engine(kind):
+        return YoloPostProcess(kind, score_threshold=args.score, iou_threshold=args.iou,
+                               sigmoid_scores=args.sigmoid, reg_max=REG_MAX, strides=STRIDES)
+
+    if args.capture:
+        frames, reference, cpp_ms, _labels = load_capture(args.capture)
+        source = f"{args.capture} ({len(frames)} frames)"
+        reference_name = "C++ filter"
+    else:
+        kind = "yolov8pose" if args.kind == "auto" else args.kind
+        if kind == "nms":
+            print("Synthetic heads are raw YOLOv8 outputs; use --capture for on-chip NMS models", file=sys.stderr)
+            return 1
+        rng = np.random.default_rng(0)
+        pairs = [synthetic_frame(rng, kind, args.objects) for _ in range(args.frames)]
+        frames, reference = [p[0] for p in pairs], [p[1] for p in pairs]
+        cpp_ms = None
+        source = f"synthetic {kind}, {args.objects} objects x {args.frames} frames"
+        reference_name = "planted objects"
+
+    engine = make_engine(args.kind if args.capture or args.kind != "auto" else "yolov8pose")
+    decoded = [engine(frame)[0] for frame in frames]
+    result = {"source": source, "kind": engine.kind, "score_threshold": engine.score_threshold,
+              "iou_threshold": engine.iou_threshold, "parity": parity(reference, decoded), "throughput": {}}
+    if cpp_ms is not None and len(cpp_ms):
+        result["cpp_ms"] = {"p50": float(np.percentile(cpp_ms, 50)), "p95": float(np.percentile(cpp_ms, 95))}
+
+    print("=" * 70)
+    print(f"POST-PROCESS BENCHMARK: {source}")
+    print(f"  kind {engine.kind}, score >= {engine.score_threshold}, NMS IoU {engine.iou_threshold}")
+    print("=" * 70)
+    par = result["parity"]
+    print(f"Parity vs {reference_name}: {par['matched']}/{par['reference_objects']} matched "
+          f"(recall {par['recall']:.3f}, precision {par['precision']:.3f}), mean IoU {fmt(par['mean_iou'])}, "
+          f"score diff {fmt(par['mean_score_diff'], '.4f')}, keypoint error {fmt(par['mean_keypoint_error'], '.4f')}")
+    print("-" * 70)
+    print(f"{'batch':>5}  {'numpy p50':>10} {'p95':>8}   (ms/frame)")
+    for batch in args.batch:
+        stats = throughput(make_engine(engine.kind), frames, batch, args.repeats)
+        if stats is None:
+            continue
+        result["throughput"][batch] = stats
+        print(f"{batch:>5}  {stats['p50']:>10.3f} {stats['p95']:>8.3f}")
+    if "cpp_ms" in result:
+        c = result["cpp_ms"]
+        print(f"{'C++':>5}  {c['p50']:>10.3f} {c['p95']:>8.3f}   (hailofilter, measured in the pipeline)")
+    print("-" * 70)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+bench_tracker.py - Update cost of tracker.ByteTracker against the number of objects per frame
+Synthetic scene: N boxes of --classes classes moving at constant velocity (bouncing off the frame edges)
+with jitter, score noise, a share of low-score frames (occlusion) and missed detections. For every N the
+tracker runs --frames frames and reports update time (p50 / p95 / max) and per-object cost, plus
+identity quality against the ground truth: ID switches and the share of object-frames carrying the
+object's main track ID.
+Usage: python bench_tracker.py --objects 10 50 100 200 500 --frames 300
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+
+import numpy as np
+
+import tracker as tracker_module
+from roi_arrays import object_dtype
+from tracker import ByteTracker
+
+
+def scene(rng, objects, frames, classes, miss=0.05, occlusion=0.1):
+    """Generator of (object array, ground-truth index per row) per frame"""
+    size = rng.uniform(0.03, 0.1, (objects, 2)).astype(np.float32)
+    pos = rng.uniform(0, 1, (objects, 2)).astype(np.float32) * (1 - size)
+    vel = rng.normal(0, 0.002, (objects, 2)).astype(np.float32)
+    cls = rng.integers(0, classes, objects).astype(np.uint16)
+    for _ in range(frames):
+        pos += vel
+        bounce = (pos < 0) | (pos + size > 1)
+        vel[bounce] *= -1
+        pos = np.clip(pos, 0, 1 - size)
+        seen = np.flatnonzero(rng.random(objects) > miss)
+        out = np.zeros(len(seen), dtype=object_dtype())
+        jitter = rng.normal(0, 0.002, (len(seen), 4)).astype(np.float32)
+        out["bbox"] = np.concatenate([pos[seen], size[seen]], axis=1) + jitter
+        out["class_id"] = cls[seen]
+        score = rng.uniform(0.6, 0.95, len(seen))
+        occluded = rng.random(len(seen)) < occlusion
+        score[occluded] = rng.uniform(0.15, 0.45, occluded.sum())
+        out["confidence"] = score
+        out["track_id"] = -1
+        order = rng.permutation(len(seen))   # detectors give no stable order
+        yield out[order], seen[order]
+
+
+def identity_quality(assignments):
+    """assignments: {gt index: [track_id per frame it was reported]} -> (ID switches, main-ID share)"""
+    switches = frames = main = 0
+    for ids in assignments.values():
+        ids = [i for i in ids if i >= 0]
+        if not ids:
+            continue
+        switches += sum(1 for a, b in zip(ids, ids[1:]) if a != b)
+        frames += len(ids)
+        main += Counter(ids).most_common(1)[0][1]
+    return switches, main / frames if frames else 0.0
+
+
+def run(objects, frames, classes, seed, max_tracks, history):
+    rng = np.random.default_rng(seed)
+    tracker = ByteTracker(max_tracks=max_tracks, history=history)
+    assignments = {}
+    reported = total = 0
+    for dets, gt in scene(rng, objects, frames, classes):
+        tracked = tracker.update(dets)
+        total += len(dets)
+        reported += int((tracked["track_id"] >= 0).sum())
+        for g, tid in zip(gt.tolist(), tracked["track_id"].tolist()):
+            assignments.setdefault(g, []).append(tid)
+    # The first frames only open tracks (nothing to match yet); skip the first 5%
+    ms = np.array(list(tracker.update_ms))[max(1, frames // 20):]
+    switches, main_share = identity_quality(assignments)
+    return {
+        "objects": objects,
+        "update_ms_p50": float(np.percentile(ms, 50)),
+        "update_ms_p95": float(np.percentile(ms, 95)),
+        "update_ms_max": float(ms.max()),
+        "us_per_object": float(np.percentile(ms, 50)) * 1000.0 / objects,
+        "reported": reported / total if total else 0.0,
+        "id_switches": switches,
+        "main_id_share": main_share,
+        "created": tracker.created,
+        "overflow": tracker.overflow,
+        "state_bytes": tracker.nbytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ByteTracker update cost vs objects per frame")
+    parser.add_argument("--objects", type=int, nargs="+", default=[10, 50, 100, 200, 500],
+                        help="Objects per frame (default: 10 50 100 200 500)")
+    parser.add_argument("--frames", type=int, default=300, help="Frames per run (default: 300)")
+    parser.add_argument("--classes", type=int, default=5, help="Object classes (default: 5)")
+    parser.add_argument("--max-tracks", type=int, default=1024, help="Track slots (default: 1024)")
+    parser.add_argument("--history", type=int, default=32, help="Boxes per track (default: 32)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the results as JSON here")
+    args = parser.parse_args()
+
+    print("=" * 96)
+    print(f"TRACKER BENCHMARK ({args.frames} frames, {args.classes} classes, {args.max_tracks} slots x "
+          f"{args.history} history, {'Hungarian' if tracker_module.HAVE_SCIPY else 'greedy'} assignment)")
+    print("=" * 96)
+    print(f"{'objects':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'us/obj':>7} {'reported':>9} "
+          f"{'ID sw':>6} {'main ID':>8} {'created':>8} {'state KiB':>10}")
+    results = []
+    for count in args.objects:
+        r = run(count, args.frames, args.classes, args.seed, args.max_tracks, args.history)
+        results.append(r)
+        print(f"{count:>7} {r['update_ms_p50']:>8.2f} {r['update_ms_p95']:>8.2f} {r['update_ms_max']:>8.2f} "
+              f"{r['us_per_object']:>7.1f} {r['reported'] * 100:>8.1f}% {r['id_switches']:>6} "
+              f"{r['main_id_share'] * 100:>7.1f}% {r['created']:>8} {r['state_bytes'] / 1024:>10.0f}"
+              + (f"  ({r['overflow']} over slots)" if r["overflow"] else ""))
+    print("-" * 96)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+encoder_probe.py - Benchmark the local H.264 encoders and pick the fastest one that fits a budget
+Runs a short live videotestsrc -> encoder -> fakesink pipeline per candidate (x264enc presets,
+openh264enc, v4l2h264enc when present) at the sender's resolution / fps / bitrate and measures
+encode latency per frame (sink -> src pad), CPU (% of one core, minus a no-encoder baseline) and
+output bitrate. Results are cached per host and size / fps / bitrate / key-int, so senders started with
+--encoder auto only probe once per configuration.
+
+Usage:
+  python encoder_probe.py --width 1280 --height 720 --fps 30 --bitrate 2000
+  python encoder_probe.py --latency-budget-ms 15 --cpu-budget 60 --reprobe
+
+Senders:
+  from encoder_probe import add_encoder_arguments, resolve_encoder
+  add_encoder_arguments(parser)
+  enc = resolve_encoder(args, 1280, 720, 30, 2000, 30, default="x264enc tune=zerolatency ...")
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "hailo_demos", "encoder_probe.json")
+
+# name -> (element factory, gst-launch fragment template)
+CANDIDATES = {
+    "x264-ultrafast": ("x264enc", "x264enc tune=zerolatency speed-preset=ultrafast bitrate={kbps} "
+                                  "key-int-max={key_int} bframes=0"),
+    "x264-superfast": ("x264enc", "x264enc tune=zerolatency speed-preset=superfast bitrate={kbps} "
+                                  "key-int-max={key_int} bframes=0"),
+    "x264-veryfast": ("x264enc", "x264enc tune=zerolatency speed-preset=veryfast bitrate={kbps} "
+                                 "key-int-max={key_int} bframes=0"),
+    "openh264": ("openh264enc", "openh264enc usage-type=camera complexity=low rate-control=bitrate "
+                                "bitrate={bps} gop-size={key_int}"),
+    "v4l2": ("v4l2h264enc", "v4l2h264enc extra-controls=\"controls,video_bitrate={bps},"
+                            "h264_i_frame_period={key_int}\" ! video/x-h264,level=(string)4"),
+}
+
+
+def encoder_fragment(name, bitrate_kbps, key_int_max):
+    """gst-launch fragment for a candidate encoder (no trailing '!')"""
+    _, template = CANDIDATES[name]
+    return template.format(kbps=bitrate_kbps, bps=bitrate_kbps * 1000, key_int=key_int_max)
+
+
+def available_candidates():
+    """Candidates whose element factory is installed"""
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst
+    Gst.init(None)
+    return [name for name, (factory, _) in CANDIDATES.items() if Gst.ElementFactory.find(factory)]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_probe(encoder, width, height, fps, seconds=3.0, pattern="ball"):
+    """Run one live test pipeline; encoder=None measures the capture/convert baseline"""
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst
+    Gst.init(None)
+
+    frames = max(int(seconds * fps), 10)
+    enc = f"{encoder} ! h264parse ! " if encoder else ""
+    pipeline_str = (
+        f"videotestsrc is-live=true pattern={pattern} num-buffers={frames} ! "
+        f"video/x-raw,format=I420,width={width},height={height},framerate={fps}/1 ! "
+        f"identity name=enc_in ! {enc}identity name=enc_out ! fakesink sync=false"
+    )
+    pipeline = Gst.parse_launch(pipeline_str)
+
+    t_in = {}
+    latencies = []
+    out = {"bytes": 0, "frames": 0}
+
+    def on_in(pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            t_in[buffer.pts] = time.perf_counter()
+        return Gst.PadProbeReturn.OK
+
+    def on_out(pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            t0 = t_in.pop(buffer.pts, None)
+            if t0 is not None:
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            out["bytes"] += buffer.get_size()
+            out["frames"] += 1
+        return Gst.PadProbeReturn.OK
+
+    pipeline.get_by_name("enc_in").get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, on_in)
+    pipeline.get_by_name("enc_out").get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_out)
+
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    pipeline.set_state(Gst.State.PLAYING)
+    msg = pipeline.get_bus().timed_pop_filtered(
+        int((seconds * 3 + 10) * Gst.SECOND), Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    wall = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+    pipeline.set_state(Gst.State.NULL)
+
+    result = {
+        "frames": out["frames"],
+        "cpu_pct": cpu / wall * 100.0 if wall > 0 else 0.0,
+        "kbps": out["bytes"] * 8 / (out["frames"] / fps) / 1000.0 if out["frames"] else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "ok": msg is not None and msg.type == Gst.MessageType.EOS and out["frames"] > 0,
+    }
+    if msg is not None and msg.type == Gst.MessageType.ERROR:
+        err, _ = msg.parse_error()
+        result["error"] = str(err)
+    elif msg is None:
+        result["error"] = "timeout"
+    return result
+
+
+def probe_all(width, height, fps, bitrate_kbps, key_int_max, seconds=3.0, names=None, verbose=True):
+    """Benchmark every available candidate -> {name: result}"""
+    names = names or available_candidates()
+    baseline = run_probe(None, width, height, fps, seconds)
+    if verbose:
+        print(f"🔧 Baseline (source only): {baseline['cpu_pct']:.1f}% CPU")
+
+    results = {}
+    for name in names:
+        fragment = encoder_fragment(name, bitrate_kbps, key_int_max)
+        try:
+            r = run_probe(fragment, width, height, fps, seconds)
+        except Exception as e:
+            r = {"ok": False, "error": str(e)}
+        if r.get("ok"):
+            r["cpu_pct"] = max(0.0, r["cpu_pct"] - baseline["cpu_pct"])
+        results[name] = r
+        if verbose:
+            if r.get("ok"):
+                print(f"  {name:<16} p50 {r['p50_ms']:6.2f} ms  p95 {r['p95_ms']:6.2f} ms  "
+                      f"CPU {r['cpu_pct']:5.1f}%  {r['kbps']:7.0f} kbit/s")
+            else:
+                print(f"  {name:<16} failed: {r.get('error', 'unknown')}")
+    return results
+
+
+def choose(results, latency_budget_ms=None, cpu_budget=None):
+    """Fastest working candidate inside the budgets (or the fastest overall if none fits) -> (name, fits)"""
+    ok = {n: r for n, r in results.items() if r.get("ok")}
+    if not ok:
+        return None, False
+    fits = {n: r for n, r in ok.items()
+            if (latency_budget_ms is None or r["p95_ms"] <= latency_budget_ms)
+            and (cpu_budget is None or r["cpu_pct"] <= cpu_budget)}
+    pool = fits or ok
+    name = min(pool, key=lambda n: (pool[n]["p50_ms"], pool[n]["cpu_pct"]))
+    return name, bool(fits)
+
+
+def _cache_key(width, height, fps, bitrate_kbps, key_int_max):
+    return f"{width}x{height}@{fps}/{bitrate_kbps}k/gop{key_int_max}"
+
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def cached_results(width, height, fps, bitrate_kbps, key_int_max, seconds=3.0, reprobe=False, path=CACHE_PATH,
+                   verbose=True):
+    """Probe results for this host and configuration, from the cache unless missing or reprobe"""
+    cache = load_cache(path)
+    host = cache.setdefault(socket.gethostname(), {})
+    key = _cache_key(width, height, fps, bitrate_kbps, key_int_max)
+    if reprobe or key not in host:
+        print(f"🔍 Probing H.264 encoders at {key} (cached in {path})")
+        host[key] = {"time": time.time(),
+                     "results": probe_all(width, height, fps, bitrate_kbps, key_int_max, seconds,
+                                          verbose=verbose)}
+        save_cache(cache, path)
+    return host[key]["results"]
+
+
+def add_encoder_arguments(parser):
+    """Standard --encoder options for the senders"""
+    parser.add_argument("--encoder", default="default", choices=["default", "auto"] + list(CANDIDATES),
+                        help="H.264 encoder: default (script's x264enc settings), auto (fastest probed "
+                             "encoder within the budgets, cached per host) or a named candidate")
+    parser.add_argument("--encoder-latency-ms", type=float, default=None,
+                        help="--encoder auto: max p95 encode latency per frame in ms")
+    parser.add_argument("--encoder-cpu", type=float, default=None,
+                        help="--encoder auto: max CPU for encoding, percent of one core")
+    parser.add_argument("--encoder-reprobe", action="store_true",
+                        help="--encoder auto: ignore the cached probe results for this host")
+
+
+def resolve_encoder(args, width, height, fps, bitrate_kbps, key_int_max, default):
+    """Encoder fragment selected by the --encoder options (default: the sender's own fragment)"""
+    if args.encoder == "default":
+        return default
+    if args.encoder != "auto":
+        return encoder_fragment(args.encoder, bitrate_kbps, key_int_max)
+
+    results = cached_results(width, height, fps, bitrate_kbps, key_int_max, reprobe=args.encoder_reprobe)
+    name, fits = choose(results, args.encoder_latency_ms, args.encoder_cpu)
+    if name is None:
+        print("⚠️  No encoder passed the probe, using the default")
+        return default
+    r = results[name]
+    note = "" if fits else " (nothing fits the budget, using the fastest)"
+    print(f"🎞️  Encoder auto: {name} (p95 {r['p95_ms']:.2f} ms, CPU {r['cpu_pct']:.1f}%){note}")
+    return encoder_fragment(name, bitrate_kbps, key_int_max)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local H.264 encoders")
+    parser.add_argument("--width", type=int, default=1280, help="Frame width (default: 1280)")
+    parser.add_argument("--height", type=int, default=720, help="Frame height (default: 720)")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate (default: 30)")
+    parser.add_argument("--bitrate", type=int, default=2000, help="Target bitrate in kbit/s (default: 2000)")
+    parser.add_argument("--key-int-max", type=int, default=30, help="Keyframe interval (default: 30)")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Probe length per encoder (default: 3)")
+    parser.add_argument("--latency-budget-ms", type=float, default=None, help="Max p95 encode latency")
+    parser.add_argument("--cpu-budget", type=float, default=None, help="Max CPU, percent of one core")
+    parser.add_argument("--reprobe", action="store_true", help="Ignore cached results")
+    parser.add_argument("--no-cache", action="store_true", help="Probe without reading or writing the cache")
+    args = parser.parse_args()
+
+    try:
+        import gi
+        gi.require_version("Gst", "1.0")
+    except (ImportError, ValueError) as e:
+        print(f"❌ GStreamer Python bindings not available: {e}")
+        return 1
+
+    if args.no_cache:
+        results = probe_all(args.width, args.height, args.fps, args.bitrate, args.key_int_max, args.seconds,
+                            verbose=False)
+    else:
+        results = cached_results(args.width, args.height, args.fps, args.bitrate, args.key_int_max,
+                                 args.seconds, reprobe=args.reprobe, verbose=False)
+
+    print(f"\n{'encoder':<16} {'p50 ms':>8} {'p95 ms':>8} {'CPU %':>7} {'kbit/s':>8}")
+    for name, r in results.items():
+        if r.get("ok"):
+            print(f"{name:<16} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['cpu_pct']:7.1f} {r['kbps']:8.0f}")
+        else:
+            print(f"{name:<16} failed: {r.get('error', 'unknown')}")
+
+    name, fits = choose(results, args.latency_budget_ms, args.cpu_budget)
+    if name is None:
+        print("❌ No working H.264 encoder found")
+        return 1
+    print(f"\n✅ Selected: {name}{'' if fits else ' (nothing fits the budget, fastest overall)'}")
+    print(f"   {encoder_fragment(name, args.bitrate, args.key_int_max)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
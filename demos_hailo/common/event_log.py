@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+event_log.py - Asynchronous, rate-limited logging for the demo scripts' streaming-thread callbacks
+GStreamer callbacks only append a tuple to a deque (atomic under the GIL, no lock, no syscall);
+a background thread formats, prints and writes the events in batches.
+
+Modes:
+  verbose  - print every event that passes its category rate limit
+  summary  - print per-category counts every summary interval (errors still printed)
+  quiet    - print nothing per event (JSONL sink and final summary only)
+
+Usage:
+  from event_log import get_event_log
+  log = get_event_log()
+  log.configure(mode="summary", rate_limits={"nal": 5}, jsonl_path="events.jsonl")
+  log.log("frame", "Frame %d: %d objects", frame, count, pts=pts)
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+MODES = ("verbose", "summary", "quiet")
+
+
+class EventLog:
+    """Shared event sink: cheap log() on any thread, output from one background writer"""
+
+    def __init__(self, mode="verbose", default_rate=0, rate_limits=None, jsonl_path=None,
+                 summary_interval=5.0, flush_interval=0.05, max_queue=10000, stream=None):
+        self._queue = deque(maxlen=max_queue)
+        self._buckets = {}
+        self._counts = Counter()
+        self._window_counts = Counter()
+        self._suppressed = Counter()
+        self._dropped = 0
+        self._stream = stream or sys.stdout
+        self._jsonl = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_summary = time.monotonic()
+        self.always = {"error"}
+        self.configure(mode, default_rate, rate_limits, jsonl_path, summary_interval, flush_interval)
+
+    def configure(self, mode="verbose", default_rate=0, rate_limits=None, jsonl_path=None,
+                  summary_interval=5.0, flush_interval=0.05):
+        """(Re)configure in place so module-level references stay valid"""
+        if mode not in MODES:
+            raise ValueError(f"unknown log mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.default_rate = default_rate
+        self.rate_limits = dict(rate_limits or {})
+        self.summary_interval = summary_interval
+        self.flush_interval = flush_interval
+        if self._jsonl:
+            self._jsonl.close()
+            self._jsonl = None
+        if jsonl_path:
+            self._jsonl = open(jsonl_path, "a", buffering=1 << 16)
+        return self
+
+    # -------- producer side (streaming threads) --------
+
+    def _allow(self, category, now):
+        limit = self.rate_limits.get(category, self.default_rate)
+        if not limit:
+            return True
+        bucket = self._buckets.get(category)
+        if bucket is None or now - bucket[0] >= 1.0:
+            self._buckets[category] = [now, 1]
+            return True
+        if bucket[1] < limit:
+            bucket[1] += 1
+            return True
+        self._suppressed[category] += 1
+        return False
+
+    def log(self, category, msg, *args, **fields):
+        """Queue an event; msg % args is formatted later on the writer thread"""
+        now = time.monotonic()
+        self._counts[category] += 1
+        self._window_counts[category] += 1
+        if self._thread is None:
+            self.start()
+        if not self._allow(category, now):
+            return
+        if self._jsonl is None and self.mode != "verbose" and category not in self.always:
+            return  # counted only, nothing would be written
+        if len(self._queue) == self._queue.maxlen:
+            self._dropped += 1
+        self._queue.append((time.time(), category, msg, args, fields))
+
+    def error(self, msg, *args, **fields):
+        self.log("error", msg, *args, **fields)
+
+    # -------- writer side --------
+
+    def start(self):
+        """Start the background writer (called lazily on the first event)"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        lines = []
+        queue = self._queue
+        while queue:
+            t, category, msg, args, fields = queue.popleft()
+            try:
+                text = msg % args if args else msg
+            except (TypeError, ValueError):
+                text = f"{msg} {args}"
+            if self.mode == "verbose" or category in self.always:
+                lines.append(text)
+            if self._jsonl:
+                record = {"t": round(t, 6), "cat": category, "msg": text}
+                record.update(fields)
+                self._jsonl.write(json.dumps(record, default=str) + "\n")
+
+        now = time.monotonic()
+        if self.mode == "summary" and now - self._last_summary >= self.summary_interval:
+            if self._window_counts:
+                lines.append(self._summary_line(self._window_counts, now - self._last_summary))
+            self._window_counts = Counter()
+            self._last_summary = now
+
+        if lines:
+            self._stream.write("\n".join(lines) + "\n")
+            self._stream.flush()
+
+    def _summary_line(self, counts, window):
+        parts = " ".join(f"{cat}={n}" for cat, n in sorted(counts.items()))
+        line = f"[log] {window:.1f}s: {parts or 'no events'}"
+        if self._suppressed:
+            line += " | rate-limited " + " ".join(f"{c}={n}" for c, n in sorted(self._suppressed.items()))
+        return line
+
+    def summary(self):
+        """Totals since start (events per category, rate-limited and dropped counts)"""
+        line = "Log events: " + (" ".join(f"{c}={n}" for c, n in sorted(self._counts.items())) or "none")
+        if self._suppressed:
+            line += ", rate-limited " + " ".join(f"{c}={n}" for c, n in sorted(self._suppressed.items()))
+        if self._dropped:
+            line += f", dropped {self._dropped} (queue full)"
+        return line
+
+    def close(self):
+        """Flush everything and stop the writer thread"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        else:
+            self._drain()
+        if self._jsonl:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+_default_log = None
+
+
+def get_event_log():
+    """Process-wide EventLog shared by all modules of a script"""
+    global _default_log
+    if _default_log is None:
+        _default_log = EventLog()
+    return _default_log
+
+
+def add_log_arguments(parser):
+    """Standard --log-* options for the demo scripts"""
+    parser.add_argument("--log-mode", choices=MODES, default="verbose",
+                        help="Per-frame logging: verbose, summary (periodic counts) or quiet (default: verbose)")
+    parser.add_argument("--log-rate", type=int, default=0,
+                        help="Max events per second per category, 0 = unlimited (default: 0)")
+    parser.add_argument("--log-jsonl", default=None,
+                        help="Also write every event as JSON lines to this file")
+
+
+def configure_from_args(args, rate_limits=None):
+    """Apply the --log-* options to the shared EventLog"""
+    return get_event_log().configure(
+        mode=args.log_mode,
+        default_rate=args.log_rate,
+        rate_limits=rate_limits,
+        jsonl_path=args.log_jsonl,
+    )
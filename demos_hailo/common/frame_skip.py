@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+frame_skip.py - Run hailonet on a subset of frames and propagate boxes to the skipped ones
+All frames go downstream at the input rate. A probe on the hailonet sink pad decides per frame whether
+to infer (every Nth frame, or an adaptive interval) and sets hailonet pass-through for the others.
+An identity after hailofilter (propagate_callback) keeps one constant-velocity Kalman filter per
+object: inferred frames update the filters with the detections (greedy IoU association per class),
+skipped frames get the predicted boxes added to the ROI, so hailooverlay draws a box on every frame.
+With --skip-flow (OpenCV) the prediction is corrected by the median sparse optical flow inside each box.
+
+Adaptive schedule: on every inferred frame the boxes predicted for it are compared with the detections;
+the interval halves when the mean IoU drops below --skip-min-iou or objects appear/vanish, and grows
+by one frame otherwise (up to --max-skip).
+
+--skip-validate runs hailonet on every frame (the full-rate baseline) but still propagates through
+the frames the schedule would have skipped and scores the predictions against the real detections.
+
+Usage (in a pipeline script):
+  from frame_skip import FrameSkipper, add_frame_skip_arguments, skipper_from_args
+  pipe = "... ! hailonet name=inference_hailonet ! ... ! hailofilter ! identity name=propagate_callback ! hailooverlay ..."
+  skipper = FrameSkipper.from_pipeline(pipeline, every=3)
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from gi.repository import GLib, Gst
+
+try:
+    import hailo
+    HAVE_HAILO = True
+except ImportError:
+    HAVE_HAILO = False
+
+try:
+    import cv2
+    HAVE_CV2 = True
+except ImportError:
+    HAVE_CV2 = False
+
+
+def iou(a, b):
+    """IoU of two (xmin, ymin, w, h) boxes"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def greedy_match(boxes_a, boxes_b, threshold=0.3):
+    """[(i, j, iou)] pairs, highest IoU first, each index used once"""
+    pairs = [(iou(a, b), i, j) for i, a in enumerate(boxes_a) for j, b in enumerate(boxes_b)]
+    pairs.sort(reverse=True)
+    used_a, used_b, out = set(), set(), []
+    for score, i, j in pairs:
+        if score < threshold:
+            break
+        if i in used_a or j in used_b:
+            continue
+        used_a.add(i)
+        used_b.add(j)
+        out.append((i, j, score))
+    return out
+
+
+class KalmanBox:
+    """Constant-velocity Kalman filter on (cx, cy, w, h), one step = one frame"""
+
+    _F = np.eye(8)
+    _F[:4, 4:] = np.eye(4)
+    _H = np.eye(4, 8)
+
+    def __init__(self, box, track_id, class_id=0, label="", confidence=1.0, q=1e-4, r=1e-3):
+        x, y, w, h = box
+        self.x = np.array([x + w / 2, y + h / 2, w, h, 0, 0, 0, 0], dtype=np.float64)
+        self.P = np.diag([r, r, r, r, 1e-2, 1e-2, 1e-2, 1e-2])
+        self.Q = np.eye(8) * q
+        self.R = np.eye(4) * r
+        self.track_id = track_id
+        self.class_id = class_id
+        self.label = label
+        self.confidence = confidence
+        self.misses = 0
+
+    def predict(self):
+        self.x = self._F @ self.x
+        self.x[2:4] = np.maximum(self.x[2:4], 1e-3)
+        self.P = self._F @ self.P @ self._F.T + self.Q
+        return self.box()
+
+    def update(self, box, r_scale=1.0):
+        x, y, w, h = box
+        z = np.array([x + w / 2, y + h / 2, w, h])
+        S = self._H @ self.P @ self._H.T + self.R * r_scale
+        K = self.P @ self._H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - self._H @ self.x)
+        self.P = (np.eye(8) - K @ self._H) @ self.P
+
+    def shift(self, dx, dy):
+        """Optical-flow correction: observe the box moved by (dx, dy), trusted less than a detection"""
+        x, y, w, h = self.box()
+        self.update((x + dx, y + dy, w, h), r_scale=4.0)
+
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        return (cx - w / 2, cy - h / 2, w, h)
+
+
+class BoxPropagator:
+    """Kalman tracks fed by detections on inferred frames, predicted on skipped frames"""
+
+    def __init__(self, match_iou=0.3, max_misses=2):
+        self.match_iou = match_iou
+        self.max_misses = max_misses
+        self.tracks = []
+        self.next_id = 1
+
+    def predict(self):
+        """Advance every track one frame -> predicted boxes"""
+        return [t.predict() for t in self.tracks]
+
+    def update(self, detections):
+        """detections: [(box, class_id, label, confidence)] -> (mean IoU of the prediction, matched, new, lost)
+        Call after predict() for the same frame."""
+        matched_ious, matched_tracks, matched_dets = [], set(), set()
+        for class_id in {d[1] for d in detections} | {t.class_id for t in self.tracks}:
+            ti = [i for i, t in enumerate(self.tracks) if t.class_id == class_id]
+            di = [j for j, d in enumerate(detections) if d[1] == class_id]
+            pairs = greedy_match([self.tracks[i].box() for i in ti], [detections[j][0] for j in di],
+                                 self.match_iou)
+            for a, b, score in pairs:
+                track, det = self.tracks[ti[a]], detections[di[b]]
+                track.update(det[0])
+                track.confidence = det[3]
+                track.misses = 0
+                matched_ious.append(score)
+                matched_tracks.add(ti[a])
+                matched_dets.add(di[b])
+
+        lost = 0
+        survivors = []
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    lost += 1
+                    continue
+            survivors.append(track)
+        self.tracks = survivors
+
+        new = 0
+        for j, (box, class_id, label, confidence) in enumerate(detections):
+            if j not in matched_dets:
+                self.tracks.append(KalmanBox(box, self.next_id, class_id, label, confidence))
+                self.next_id += 1
+                new += 1
+        mean_iou = float(np.mean(matched_ious)) if matched_ious else (1.0 if not detections else 0.0)
+        return mean_iou, len(matched_ious), new, lost
+
+
+class InferenceSchedule:
+    """Every Nth frame, or an adaptive interval between 1 and max_skip + 1 frames"""
+
+    def __init__(self, every=3, adaptive=False, max_skip=8, min_iou=0.6):
+        self.interval = max(1, every)
+        self.adaptive = adaptive
+        self.max_interval = max_skip + 1
+        self.min_iou = min_iou
+        self.since = self.interval  # first frame is inferred
+
+    def infer_next(self):
+        """Decision for the next frame"""
+        if self.since + 1 >= self.interval:
+            self.since = 0
+            return True
+        self.since += 1
+        return False
+
+    def feedback(self, mean_iou, new, lost):
+        """Prediction quality at a resync point (inferred frame)"""
+        if not self.adaptive:
+            return
+        if mean_iou < self.min_iou or new or lost:
+            self.interval = max(1, self.interval // 2)
+        else:
+            self.interval = min(self.max_interval, self.interval + 1)
+
+
+class FrameSkipper:
+    """Schedules hailonet pass-through and fills skipped frames with propagated boxes"""
+
+    def __init__(self, hailonet, callback, every=3, adaptive=False, max_skip=8, min_iou=0.6, flow=False,
+                 validate=False, report_interval=10):
+        self.hailonet = hailonet
+        self.schedule = InferenceSchedule(every, adaptive, max_skip, min_iou)
+        self.propagator = BoxPropagator()
+        self.flow = flow and HAVE_CV2
+        self.validate = validate
+        self.report_interval = report_interval
+        self._decisions = OrderedDict()     # PTS -> inferred, written on hailonet's thread, read at the handoff
+        self._lock = threading.Lock()
+        self._prev_gray = None
+        self._report_id = None
+
+        self.frames = 0
+        self.scheduled = 0         # frames the schedule sends to hailonet
+        self.propagated_boxes = 0
+        self.objects = 0
+        self.cpu_s = 0.0
+        self.resync_ious = []      # prediction vs detection on inferred frames
+        self.validate_ious = []    # validate: prediction vs full-rate detection on would-be-skipped frames
+        self.validate_recall = []
+        self.start_time = time.time()
+
+        hailonet.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self._on_infer_in)
+        callback.set_property("signal-handoffs", True)
+        callback.connect("handoff", self._on_handoff)
+
+    @classmethod
+    def from_pipeline(cls, pipeline, hailonet="inference_hailonet", callback="propagate_callback", **kw):
+        return cls(pipeline.get_by_name(hailonet), pipeline.get_by_name(callback), **kw)
+
+    # -------- streaming threads --------
+
+    def _on_infer_in(self, pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            infer = self.schedule.infer_next()
+            with self._lock:
+                self._decisions[buffer.pts] = infer
+                if len(self._decisions) > 256:
+                    self._decisions.popitem(last=False)
+            if not self.validate:
+                # Read by hailonet's chain function right after this probe, on the same thread
+                self.hailonet.set_property("pass-through", not infer)
+        return Gst.PadProbeReturn.OK
+
+    def _on_handoff(self, identity, buffer):
+        t0 = time.thread_time()
+        with self._lock:
+            inferred = self._decisions.pop(buffer.pts, True)
+        self.frames += 1
+        self.scheduled += inferred
+        gray = self._gray(identity, buffer) if self.flow else None
+
+        if not HAVE_HAILO:
+            return
+        roi = hailo.get_roi_from_buffer(buffer)
+        if self.validate:
+            self._validate_frame(roi, inferred, gray)
+        elif inferred:
+            self._resync(read_detections(roi))
+        else:
+            self._propagate(roi, gray)
+        self._prev_gray = gray
+        self.cpu_s += time.thread_time() - t0
+
+    def _resync(self, detections):
+        self.propagator.predict()
+        mean_iou, matched, new, lost = self.propagator.update(detections)
+        if matched:
+            self.resync_ious.append(mean_iou)
+        self.schedule.feedback(mean_iou, new, lost)
+        self.objects = len(detections)
+
+    def _propagate(self, roi, gray):
+        self.propagator.predict()
+        if gray is not None and self._prev_gray is not None:
+            self._apply_flow(self._prev_gray, gray)
+        for track in self.propagator.tracks:
+            add_detection(roi, track)
+        self.propagated_boxes += len(self.propagator.tracks)
+        self.objects = len(self.propagator.tracks)
+
+    def _validate_frame(self, roi, inferred, gray):
+        """Full-rate detections are in the ROI; the live tracker only sees the scheduled frames"""
+        detections = read_detections(roi)
+        if inferred:
+            self._resync(detections)
+            return
+        self.propagator.predict()
+        if gray is not None and self._prev_gray is not None:
+            self._apply_flow(self._prev_gray, gray)
+        predicted = [t.box() for t in self.propagator.tracks]
+        pairs = greedy_match(predicted, [d[0] for d in detections], 0.0)
+        if detections:
+            self.validate_ious.append(sum(p[2] for p in pairs) / len(detections))
+            self.validate_recall.append(sum(p[2] >= 0.5 for p in pairs) / len(detections))
+        self.objects = len(detections)
+
+    # -------- optical flow --------
+
+    def _gray(self, identity, buffer):
+        caps = identity.get_static_pad("src").get_current_caps()
+        if caps is None:
+            return None
+        s = caps.get_structure(0)
+        width, height = s.get_value("width"), s.get_value("height")
+        ok, map_info = buffer.map(Gst.MapFlags.READ)
+        if not ok:
+            return None
+        try:
+            data = np.frombuffer(map_info.data, dtype=np.uint8)
+            stride = data.size // height
+            rgb = data[:stride * height].reshape(height, stride)[:, :width * 3].reshape(height, width, 3)
+            return cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        finally:
+            buffer.unmap(map_info)
+
+    def _apply_flow(self, prev, cur):
+        h, w = cur.shape
+        for track in self.propagator.tracks:
+            x, y, bw, bh = track.box()
+            x0, y0 = int(max(0, x * w)), int(max(0, y * h))
+            x1, y1 = int(min(w, (x + bw) * w)), int(min(h, (y + bh) * h))
+            if x1 - x0 < 8 or y1 - y0 < 8:
+                continue
+            pts = cv2.goodFeaturesToTrack(prev[y0:y1, x0:x1], maxCorners=20, qualityLevel=0.01, minDistance=4)
+            if pts is None:
+                continue
+            pts = (pts + np.array([x0, y0], dtype=np.float32)).astype(np.float32)
+            nxt, status, _ = cv2.calcOpticalFlowPyrLK(prev, cur, pts, None, winSize=(15, 15), maxLevel=2)
+            good = status.reshape(-1) == 1
+            if good.sum() < 3:
+                continue
+            d = np.median((nxt - pts).reshape(-1, 2)[good], axis=0)
+            track.shift(d[0] / w, d[1] / h)
+
+    # -------- output --------
+
+    def start_reports(self):
+        if self.report_interval:
+            self._report_id = GLib.timeout_add_seconds(self.report_interval, self.print_status)
+        return self
+
+    def stop(self):
+        if self._report_id is not None:
+            GLib.source_remove(self._report_id)
+            self._report_id = None
+
+    def report(self):
+        frames = max(self.frames, 1)
+        row = {
+            "mode": "validate" if self.validate else ("adaptive" if self.schedule.adaptive else "fixed"),
+            "frames": self.frames,
+            "scheduled": self.scheduled,
+            "hailonet_frames": self.frames if self.validate else self.scheduled,
+            "inference_ratio": self.scheduled / frames,
+            "load_reduction": frames / max(self.scheduled, 1),
+            "interval": self.schedule.interval,
+            "propagated_boxes": self.propagated_boxes,
+            "flow": self.flow,
+            "cpu_ms_per_frame": self.cpu_s / frames * 1000.0,
+            "resync_iou": float(np.mean(self.resync_ious)) if self.resync_ious else None,
+            "duration_s": round(time.time() - self.start_time, 3),
+        }
+        if self.validate:
+            row["validate_iou"] = float(np.mean(self.validate_ious)) if self.validate_ious else None
+            row["validate_recall"] = float(np.mean(self.validate_recall)) if self.validate_recall else None
+        return row
+
+    def print_status(self):
+        r = self.report()
+        line = (f"[SKIP] {r['mode']}: {r['frames']} frames, inferred {r['inference_ratio'] * 100:.0f}% "
+                f"(interval {r['interval']}), {r['cpu_ms_per_frame']:.2f} ms CPU/frame")
+        if r["resync_iou"] is not None:
+            line += f", resync IoU {r['resync_iou']:.2f}"
+        if self.validate and r["validate_iou"] is not None:
+            line += f", vs full rate: IoU {r['validate_iou']:.2f} recall@0.5 {r['validate_recall']:.2f}"
+        print(line)
+        return True
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"[SKIP] report written to {path}")
+
+
+# -------- Hailo ROI helpers --------
+
+def read_detections(roi):
+    """[(box, class_id, label, confidence)] of the HailoDetections in the ROI"""
+    out = []
+    for det in roi.get_objects_typed(hailo.HAILO_DETECTION):
+        b = det.get_bbox()
+        out.append(((b.xmin(), b.ymin(), b.width(), b.height()), det.get_class_id(), det.get_label(),
+                    det.get_confidence()))
+    return out
+
+
+def add_detection(roi, track):
+    """Propagated box as a HailoDetection with the track ID, so hailooverlay draws it"""
+    x, y, w, h = track.box()
+    det = hailo.HailoDetection(hailo.HailoBBox(x, y, w, h), int(track.class_id), track.label,
+                               track.confidence)
+    det.add_object(hailo.HailoUniqueID(track.track_id))
+    roi.add_object(det)
+
+
+# -------- CLI --------
+
+def add_frame_skip_arguments(parser):
+    """Standard --infer-every options"""
+    parser.add_argument("--infer-every", type=int, default=0,
+                        help="Pass every frame downstream but run hailonet on every Nth only; skipped frames get "
+                             "Kalman-propagated boxes (0 = off, videorate decimation as before)")
+    parser.add_argument("--infer-adaptive", action="store_true",
+                        help="--infer-every: adapt the interval to the prediction error at each inferred frame")
+    parser.add_argument("--max-skip", type=int, default=8,
+                        help="--infer-adaptive: most consecutive skipped frames (default: 8)")
+    parser.add_argument("--skip-min-iou", type=float, default=0.6,
+                        help="--infer-adaptive: halve the interval below this prediction IoU (default: 0.6)")
+    parser.add_argument("--skip-flow", action="store_true",
+                        help="--infer-every: correct predictions with sparse optical flow in each box (OpenCV)")
+    parser.add_argument("--skip-validate", action="store_true",
+                        help="--infer-every: infer every frame and score the propagated boxes against it")
+    parser.add_argument("--skip-report", default=None, help="--infer-every: write a JSON report here at shutdown")
+
+
+def skipper_from_args(args, pipeline):
+    if not args.infer_every:
+        return None
+    if not HAVE_HAILO:
+        print("⚠️  hailo Python module not available: frames are skipped but no boxes are propagated")
+    if args.skip_flow and not HAVE_CV2:
+        print("⚠️  --skip-flow needs OpenCV (cv2); using the Kalman prediction only")
+    return FrameSkipper.from_pipeline(
+        pipeline, every=args.infer_every, adaptive=args.infer_adaptive, max_skip=args.max_skip,
+        min_iou=args.skip_min_iou, flow=args.skip_flow, validate=args.skip_validate,
+    )
+
+
+def finish_skipper(skipper, args):
+    if skipper is None:
+        return
+    skipper.stop()
+    skipper.print_status()
+    if args.skip_report:
+        skipper.write_report(args.skip_report)
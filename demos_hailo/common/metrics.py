@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+metrics.py - Optional OpenMetrics HTTP endpoint for the demo scripts (headless units)
+A small registry of gauges/counters plus collectors that read pipeline state (queue levels, encoder
+bitrate, script counters) at scrape time, served as OpenMetrics text on /metrics by a daemon HTTP
+thread. Nothing runs on the streaming threads except the fpsdisplaysink signal handler storing
+three floats; counters the scripts already keep are read when Prometheus scrapes.
+
+Usage (in a script):
+  from metrics import add_metrics_arguments, start_metrics, collect_queues, watch_fps
+  add_metrics_arguments(parser)
+  metrics = start_metrics(args, "pose_pipe")          # None without --metrics-port
+  if metrics is not None:
+      watch_fps(metrics, pipeline.get_by_name("hailo_display"))
+      metrics.add_collector(collect_queues(pipeline))
+      metrics.add_collector(lambda m: m.set("frames", self.frame_counter))
+
+  curl -s localhost:9200/metrics
+"""
+
+import math
+import numbers
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# name -> (type, help) for the metrics the scripts share
+FAMILIES = {
+    "fps": ("gauge", "Current fps reported by fpsdisplaysink"),
+    "fps_drop_rate": ("gauge", "Drop rate reported by fpsdisplaysink"),
+    "fps_avg": ("gauge", "Average fps reported by fpsdisplaysink"),
+    "queue_level_buffers": ("gauge", "Buffers currently held by the queue"),
+    "queue_level_bytes": ("gauge", "Bytes currently held by the queue"),
+    "queue_level_seconds": ("gauge", "Time currently held by the queue"),
+    "queue_max_buffers": ("gauge", "max-size-buffers of the queue"),
+    "encoder_bitrate_kbps": ("gauge", "Configured encoder bitrate"),
+    "frames": ("counter", "Frames processed"),
+    "sei": ("counter", "SEI NAL units inserted or extracted"),
+    "sei_buffers": ("counter", "Buffers carrying SEI"),
+    "objects": ("gauge", "Objects in the last frame"),
+    "segments": ("counter", "Recording segments closed"),
+    "rtp_packets": ("counter", "RTP packets received"),
+    "rtp_lost": ("counter", "RTP packets lost (sequence gaps)"),
+    "inference_fps": ("gauge", "Inference rate set by the rate controller"),
+    "inference_ratio": ("gauge", "Fraction of frames sent to hailonet (frame skipping)"),
+    "analytics_frames": ("counter", "Frames processed by the analytics callback"),
+    "analytics_dropped": ("counter", "Frames dropped before the analytics callback (queue policy)"),
+    "analytics_errors": ("counter", "Analytics callback exceptions"),
+    "analytics_run_ms": ("gauge", "Analytics callback run time quantile"),
+    "post_frames": ("counter", "Frames through the NumPy post-process"),
+    "post_run_ms": ("gauge", "NumPy post-process time per frame quantile"),
+    "tracks": ("gauge", "Python tracker slots per state"),
+    "tracks_created": ("counter", "Tracks opened by the Python tracker"),
+    "tracker_update_ms": ("gauge", "Python tracker update time per frame quantile"),
+    "uptime_seconds": ("gauge", "Seconds since the script started"),
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value):
+    """Exact sample value: integers as integers, floats round-trip (no %g rounding of large counters)"""
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class MetricsRegistry:
+    """Thread-safe samples {family: {label tuple: value}} plus scrape-time collectors"""
+
+    def __init__(self, prefix="hailo", labels=None):
+        self.prefix = prefix
+        self.labels = dict(labels or {})
+        self.families = dict(FAMILIES)
+        self.samples = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.server = None
+
+    def declare(self, name, kind, help_text):
+        self.families[name] = (kind, help_text)
+
+    def set(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.samples.setdefault(name, {})[key] = value
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.samples.setdefault(name, {})
+            family[key] = family.get(key, 0) + amount
+
+    def add_collector(self, collector):
+        """collector(registry) is called on the HTTP thread before every scrape"""
+        self.collectors.append(collector)
+
+    def render(self):
+        for collector in self.collectors:
+            try:
+                collector(self)
+            except Exception as e:  # a failing collector must not break the endpoint
+                self.set("collector_errors", 1, error=type(e).__name__)
+        lines = []
+        with self.lock:
+            for name in sorted(self.samples):
+                kind, help_text = self.families.get(name, ("gauge", name.replace("_", " ")))
+                family = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {family} {kind}")
+                lines.append(f"# HELP {family} {help_text}")
+                suffix = "_total" if kind == "counter" else ""
+                for key, value in sorted(self.samples[name].items()):
+                    labels = dict(self.labels)
+                    labels.update(key)
+                    label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                    lines.append(f"{family}{suffix}{{{label_str}}} {_format_value(value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves registry.render() on GET /metrics from a daemon thread"""
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass  # no per-scrape prints
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# -------- pipeline helpers --------
+
+def watch_fps(registry, fpssink, sink=None):
+    """Mirror fpsdisplaysink's fps-measurements signal into fps / fps_drop_rate / fps_avg"""
+    if fpssink is None:
+        return False
+    name = sink or fpssink.get_name()
+
+    def on_fps(_sink, fps, droprate, avg_fps):
+        registry.set("fps", fps, sink=name)
+        registry.set("fps_drop_rate", droprate, sink=name)
+        registry.set("fps_avg", avg_fps, sink=name)
+
+    fpssink.set_property("signal-fps-measurements", True)
+    try:
+        fpssink.connect("fps-measurements", on_fps)
+    except TypeError:
+        return False
+    return True
+
+
+def collect_queues(pipeline, pipeline_label=None):
+    """Collector: level of every queue in the pipeline"""
+    queues = []
+    for element in pipeline.iterate_recurse():
+        factory = element.get_factory()
+        if factory is not None and factory.get_name() == "queue":
+            queues.append(element)
+    extra = {"pipeline": pipeline_label} if pipeline_label else {}
+
+    def collect(registry):
+        for q in queues:
+            name = q.get_name()
+            registry.set("queue_level_buffers", q.get_property("current-level-buffers"), queue=name, **extra)
+            registry.set("queue_level_bytes", q.get_property("current-level-bytes"), queue=name, **extra)
+            registry.set("queue_level_seconds", q.get_property("current-level-time") / 1e9, queue=name, **extra)
+            registry.set("queue_max_buffers", q.get_property("max-size-buffers"), queue=name, **extra)
+    return collect
+
+
+def encoder_bitrate_kbps(encoder):
+    """Configured bitrate of x264enc / openh264enc (None for encoders without a bitrate property)"""
+    factory = encoder.get_factory().get_name()
+    if factory == "x264enc":
+        return encoder.get_property("bitrate")
+    if factory == "openh264enc":
+        return encoder.get_property("bitrate") / 1000.0
+    return None
+
+
+def collect_encoder(encoder):
+    """Collector: encoder bitrate (follows runtime changes, e.g. RTCP ABR)"""
+    def collect(registry):
+        kbps = encoder_bitrate_kbps(encoder)
+        if kbps is not None:
+            registry.set("encoder_bitrate_kbps", kbps, encoder=encoder.get_factory().get_name())
+    return collect
+
+
+def collect_analytics(dispatcher):
+    """Collector: analytics.AnalyticsDispatcher counters and callback run time"""
+    def collect(registry):
+        registry.set("analytics_frames", dispatcher.processed)
+        for reason, n in dispatcher.dropped.items():
+            registry.set("analytics_dropped", n, reason=reason)
+        registry.set("analytics_errors", dispatcher.errors)
+        stats = dispatcher.run.stats()
+        if stats:
+            for q in ("p50", "p95", "p99"):
+                registry.set("analytics_run_ms", stats[q], quantile=q)
+    return collect
+
+
+def collect_postprocess(stage):
+    """Collector: np_postprocess.PostProcessStage frames and run time"""
+    def collect(registry):
+        registry.set("post_frames", stage.frames)
+        registry.set("objects", stage.objects)
+        run = stage.report()["run_ms"]
+        if run:
+            for q in ("p50", "p95"):
+                registry.set("post_run_ms", run[q], quantile=q)
+    return collect
+
+
+def collect_tracker(tracker):
+    """Collector: tracker.ByteTracker track counts and update time"""
+    def collect(registry):
+        report = tracker.report()
+        for state, n in report["tracks"].items():
+            registry.set("tracks", n, state=state)
+        registry.set("tracks_created", report["created"])
+        if report["update_ms"]:
+            for q in ("p50", "p95"):
+                registry.set("tracker_update_ms", report["update_ms"][q], quantile=q)
+    return collect
+
+
+# -------- CLI --------
+
+def add_metrics_arguments(parser):
+    """Standard --metrics-port options"""
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Serve OpenMetrics text on http://HOST:PORT/metrics, 0 = off (default: 0)")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="--metrics-port: bind address (default: 127.0.0.1)")
+
+
+def start_metrics(args, script):
+    """Registry with its HTTP endpoint running, or None without --metrics-port"""
+    if not getattr(args, "metrics_port", 0):
+        return None
+    registry = MetricsRegistry(labels={"script": script})
+    started = time.monotonic()
+    registry.add_collector(lambda m: m.set("uptime_seconds", time.monotonic() - started))
+    server = MetricsServer(registry, args.metrics_port, args.metrics_host).start()
+    registry.server = server
+    print(f"📈 Metrics: http://{args.metrics_host}:{server.address[1]}/metrics")
+    return registry
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+np_postprocess.py - YOLO post-process in NumPy, an alternative to the hailofilter .so filters
+hailonet outputs FLOAT32 tensors (output-format-type=HAILO_FORMAT_TYPE_FLOAT32, quantized outputs are
+dequantized in Python at extra cost); an identity in place of
+hailofilter (post_callback) reads them from the ROI, decodes boxes / keypoints and runs class-aware NMS,
+then adds HailoDetections (with landmarks) so hailotracker and hailooverlay work unchanged.
+Thresholds are plain attributes read on every frame, so they can be changed while the pipeline runs.
+
+Model outputs (kind, "auto" picks from the tensor shapes):
+  yolov8      raw heads per stride: box DFL (H, W, 4*reg_max), class scores (H, W, classes)
+  yolov8pose  same plus keypoints (H, W, 3*K); the pose HEFs have a single class
+  nms         on-chip NMS (HAILO_NMS_BY_CLASS, float32): per class [count, count x (ymin, xmin, ymax, xmax, score)]
+
+Everything is batched: tensors carry a leading frame axis, candidates of all frames and classes go through
+one score threshold, one DFL decode and one NMS pass (boxes offset per frame and class, so they never
+suppress each other). Only anchors above the threshold are decoded. Results are roi_arrays.object_dtype
+arrays (normalized xmin, ymin, w, h; frame-relative keypoints), the layout RoiExtractor gives for the
+C++ filter's detections.
+
+--post-capture FILE.npz (with the .so filter) saves the raw tensors, the C++ detections and the
+hailofilter time of N frames; bench_postprocess.py replays them through this module without a device.
+
+Usage:
+  from np_postprocess import YoloPostProcess
+  post = YoloPostProcess("yolov8pose", score_threshold=0.5, iou_threshold=0.7)
+  (objects,) = post({"conv1": p3, "conv2": p4, ...})       # one frame's {output name: (H, W, C)}
+  batch = post.decode_batch({"conv1": p3_batch, ...})      # {output name: (B, H, W, C)} -> B arrays
+"""
+
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from roi_arrays import HAVE_HAILO, RoiExtractor, object_dtype
+
+if HAVE_HAILO:
+    import hailo
+
+try:
+    from gi.repository import GLib, Gst
+    HAVE_GST = True
+except ImportError:
+    HAVE_GST = False
+
+KINDS = ("auto", "yolov8", "yolov8pose", "nms")
+ENGINES = ("so", "numpy")
+
+COCO_LABELS = (
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat", "traffic light",
+    "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog", "horse", "sheep", "cow",
+    "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella", "handbag", "tie", "suitcase", "frisbee",
+    "skis", "snowboard", "sports ball", "kite", "baseball bat", "baseball glove", "skateboard", "surfboard",
+    "tennis racket", "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch",
+    "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase", "scissors", "teddy bear",
+    "hair drier", "toothbrush",
+)
+
+# kind -> (classes, keypoints, score threshold, IoU threshold) of the TAPPAS filters they replace
+KIND_DEFAULTS = {
+    "yolov8": (80, 0, 0.3, 0.45),
+    "yolov8pose": (1, 17, 0.5, 0.7),
+    "nms": (80, 0, 0.3, 0.45),
+}
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def box_iou(a, b):
+    """IoU matrix of (N, 4) and (M, 4) xmin, ymin, w, h boxes -> (N, M)"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+    w = np.minimum(ax2[:, None], bx2) - np.maximum(a[:, 0, None], b[:, 0])
+    h = np.minimum(ay2[:, None], by2) - np.maximum(a[:, 1, None], b[:, 1])
+    inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + b[:, 2] * b[:, 3] - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy NMS on (N, 4) x1, y1, x2, y2 boxes -> kept indices, highest score first
+
+    One vectorized IoU row per kept box: the loop runs once per surviving detection, not per candidate."""
+    x1, y1, x2, y2 = (np.ascontiguousarray(boxes[:, i]) for i in range(4))
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])
+        h = np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])
+        inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def _rank_within(groups):
+    """Position of each element inside its group, for arrays already sorted by group"""
+    n = len(groups)
+    if not n:
+        return np.zeros(0, dtype=np.intp)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    return np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+
+
+class YoloPostProcess:
+    """Batched YOLOv8 / YOLOv8-pose decode + class-aware NMS on FLOAT32 output tensors"""
+
+    def __init__(self, kind="auto", num_classes=None, num_keypoints=None, score_threshold=None,
+                 iou_threshold=None, max_detections=300, pre_nms_topk=1000, reg_max=16, strides=(8, 16, 32),
+                 input_size=None, sigmoid_scores=False, sigmoid_keypoints=True, labels=None):
+        if kind not in KINDS:
+            raise ValueError(f"unknown kind {kind!r}, expected one of {KINDS}")
+        self.kind = kind
+        self.reg_max = reg_max
+        self.strides = tuple(sorted(strides))
+        self.input_size = input_size            # (height, width), None = largest feature map x smallest stride
+        self.sigmoid_scores = sigmoid_scores    # class outputs are logits (the Model Zoo heads apply it on-chip)
+        self.sigmoid_keypoints = sigmoid_keypoints
+        self.max_detections = max_detections
+        self.pre_nms_topk = pre_nms_topk
+        self._explicit = (num_classes, num_keypoints, score_threshold, iou_threshold)
+        self._labels = labels
+        self._bins = np.arange(reg_max, dtype=np.float32)
+        self._layout = None
+        self.last_ms = {}                       # stage -> ms of the last call (decode, nms)
+        if kind != "auto":
+            self._set_kind(kind)
+
+    def _set_kind(self, kind):
+        self.kind = kind
+        classes, keypoints, score, iou = KIND_DEFAULTS[kind]
+        num_classes, num_keypoints, score_threshold, iou_threshold = self._explicit
+        self.num_classes = num_classes or classes
+        self.num_keypoints = keypoints if num_keypoints is None else num_keypoints
+        self.score_threshold = score if score_threshold is None else score_threshold
+        self.iou_threshold = iou if iou_threshold is None else iou_threshold
+        if self._labels is not None:
+            self.labels = tuple(self._labels)
+        elif self.num_classes <= len(COCO_LABELS):
+            self.labels = COCO_LABELS[:self.num_classes]
+        else:
+            self.labels = tuple(str(c) for c in range(self.num_classes))
+        self.dtype = object_dtype(self.num_keypoints)
+
+    def set_thresholds(self, score=None, iou=None):
+        """Change the thresholds from another thread; the next frame uses them"""
+        if score is not None:
+            self.score_threshold = float(score)
+        if iou is not None:
+            self.iou_threshold = float(iou)
+
+    # -------- tensor layout --------
+
+    def _resolve(self, tensors):
+        """Output name -> role (box / cls / kpt) and stride, from the channel counts and map sizes"""
+        shapes = {name: t.shape[1:] for name, t in tensors.items() if t.ndim == 4}
+        if self.kind == "auto":
+            raw = any(s[-1] == 4 * self.reg_max for s in shapes.values())
+            pose_channels = 3 * (self._explicit[1] or KIND_DEFAULTS["yolov8pose"][1])
+            pose = any(s[-1] == pose_channels for s in shapes.values())
+            self._set_kind(("yolov8pose" if pose else "yolov8") if raw else "nms")
+            print(f"🔎 [POST] model outputs look like {self.kind}")
+        if self.kind == "nms":
+            self._layout = {}
+            return
+
+        roles = {4 * self.reg_max: "box", self.num_classes: "cls"}
+        if self.num_keypoints:
+            roles[3 * self.num_keypoints] = "kpt"
+        if len(roles) != 2 + bool(self.num_keypoints):
+            raise ValueError("box, class and keypoint outputs have the same channel count; pass num_classes")
+
+        largest = max(s[0] for s in shapes.values())
+        if self.input_size is None:
+            largest_w = max(s[1] for s in shapes.values())
+            self.input_size = (largest * self.strides[0], largest_w * self.strides[0])
+        heads = {}
+        for name, (h, w, c) in shapes.items():
+            role = roles.get(c)
+            if role is None:
+                raise ValueError(f"output {name} {(h, w, c)} matches no {self.kind} head")
+            stride = self.input_size[0] // h
+            heads.setdefault(stride, {})[role] = name
+
+        layout = {}
+        for stride, head in sorted(heads.items()):
+            missing = {"box", "cls"} - head.keys() | ({"kpt"} - head.keys() if self.num_keypoints else set())
+            if missing:
+                raise ValueError(f"stride {stride}: missing {sorted(missing)} output")
+            h, w = shapes[head["box"]][:2]
+            gy, gx = np.divmod(np.arange(h * w, dtype=np.float32), w)
+            layout[stride] = (head, gx, gy)
+        self._layout = layout
+
+    # -------- decode --------
+
+    def __call__(self, frames):
+        """One frame's {output name: array} or a list of them -> list of object arrays, one per frame"""
+        if isinstance(frames, dict):
+            return self.decode_batch({name: np.asarray(t)[None] for name, t in frames.items()})
+        return self.decode_batch({name: np.stack([frame[name] for frame in frames]) for name in frames[0]})
+
+    def decode_batch(self, tensors):
+        """{output name: array with a leading frame axis} -> list of object arrays, one per frame"""
+        if self._layout is None:
+            self._resolve(tensors)
+        if self.kind == "nms":
+            return self._decode_nms(tensors)
+        return self._decode_raw(tensors)
+
+    def _decode_raw(self, tensors):
+        t0 = time.perf_counter()
+        batch = next(iter(tensors.values())).shape[0]
+        score_thr = self.score_threshold
+        if self.sigmoid_scores:
+            # threshold the logits: sigmoid only runs on the candidates
+            score_thr = float(np.log(score_thr / (1.0 - score_thr)))
+
+        frames, classes, scores, boxes, kpts = [], [], [], [], []
+        in_h, in_w = self.input_size
+        for stride, (head, gx, gy) in self._layout.items():
+            cls = tensors[head["cls"]]
+            b, y, x, c = np.nonzero(cls > score_thr)
+            if not b.size:
+                continue
+            cell = y * cls.shape[2] + x
+            frames.append(b)
+            classes.append(c)
+            scores.append(cls[b, y, x, c])
+
+            # DFL: expected distance over reg_max bins for each side, candidates only
+            dist = tensors[head["box"]][b, y, x].reshape(-1, 4, self.reg_max).astype(np.float32)
+            dist -= dist.max(-1, keepdims=True)
+            np.exp(dist, out=dist)
+            dist = (dist @ self._bins) / dist.sum(-1) * stride
+            cx, cy = (gx[cell] + 0.5) * stride, (gy[cell] + 0.5) * stride
+            boxes.append(np.stack([(cx - dist[:, 0]) / in_w, (cy - dist[:, 1]) / in_h,
+                                   (cx + dist[:, 2]) / in_w, (cy + dist[:, 3]) / in_h], axis=1))
+            if self.num_keypoints:
+                k = tensors[head["kpt"]][b, y, x].reshape(-1, self.num_keypoints, 3).astype(np.float32)
+                k[:, :, 0] = (k[:, :, 0] * 2.0 + gx[cell, None]) * stride / in_w
+                k[:, :, 1] = (k[:, :, 1] * 2.0 + gy[cell, None]) * stride / in_h
+                if self.sigmoid_keypoints:
+                    k[:, :, 2] = _sigmoid(k[:, :, 2])
+                kpts.append(k)
+
+        if not frames:
+            self.last_ms = {"decode": (time.perf_counter() - t0) * 1000.0, "nms": 0.0}
+            return [np.zeros(0, dtype=self.dtype) for _ in range(batch)]
+        frames, classes = np.concatenate(frames), np.concatenate(classes)
+        scores = np.concatenate(scores).astype(np.float32)
+        if self.sigmoid_scores:
+            scores = _sigmoid(scores)
+        boxes = np.concatenate(boxes)
+        kpts = np.concatenate(kpts) if kpts else None
+        t1 = time.perf_counter()
+
+        keep = self._batched_nms(frames, classes, scores, boxes)
+        out = self._split(frames[keep], classes[keep], scores[keep], boxes[keep],
+                          kpts[keep] if kpts is not None else None, batch)
+        self.last_ms = {"decode": (t1 - t0) * 1000.0, "nms": (time.perf_counter() - t1) * 1000.0}
+        return out
+
+    def _batched_nms(self, frames, classes, scores, boxes):
+        """Class-aware NMS over every frame at once -> kept indices (frame, then score order)"""
+        # pre-NMS top-k per frame
+        order = np.lexsort((-scores, frames))
+        order = order[_rank_within(frames[order]) < self.pre_nms_topk]
+        # Boxes of different (frame, class) pairs are moved apart so a single pass never mixes them
+        group = frames[order].astype(np.float64) * self.num_classes + classes[order]
+        shifted = boxes[order] + (group * 4.0)[:, None]
+        keep = order[nms(shifted, scores[order], self.iou_threshold)]
+        keep = keep[np.lexsort((-scores[keep], frames[keep]))]
+        return keep[_rank_within(frames[keep]) < self.max_detections]
+
+    def _split(self, frames, classes, scores, xyxy, kpts, batch):
+        """Flat survivors -> one object_dtype array per frame"""
+        objects = np.zeros(len(frames), dtype=self.dtype)
+        objects["track_id"] = -1
+        objects["class_id"] = classes
+        objects["confidence"] = scores
+        xyxy = np.clip(xyxy, 0.0, 1.0)
+        objects["bbox"] = np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+        if kpts is not None:
+            objects["keypoints"] = kpts
+        bounds = np.searchsorted(frames, np.arange(batch + 1))
+        return [objects[bounds[i]:bounds[i + 1]] for i in range(batch)]
+
+    def _decode_nms(self, tensors):
+        """On-chip NMS output: parse the per-class lists (already thresholded and suppressed on the device)"""
+        t0 = time.perf_counter()
+        (flat,) = tensors.values()
+        out = []
+        for row in flat.reshape(len(flat), -1):
+            parts, pos = [], 0
+            for class_id in range(self.num_classes):
+                count = int(row[pos])
+                pos += 1
+                if count:
+                    dets = row[pos:pos + 5 * count].reshape(count, 5)
+                    parts.append((class_id, dets))
+                    pos += 5 * count
+            out.append(self._nms_objects(parts))
+        self.last_ms = {"decode": (time.perf_counter() - t0) * 1000.0, "nms": 0.0}
+        return out
+
+    def _nms_objects(self, parts):
+        if not parts:
+            return np.zeros(0, dtype=self.dtype)
+        classes = np.concatenate([np.full(len(d), c, dtype=np.int16) for c, d in parts])
+        dets = np.concatenate([d for _, d in parts])
+        # The device threshold is fixed in the HEF / hailonet properties; a higher one applies here
+        keep = dets[:, 4] >= self.score_threshold
+        dets, classes = dets[keep], classes[keep]
+        order = np.argsort(-dets[:, 4], kind="stable")[:self.max_detections]
+        dets, classes = dets[order], classes[order]
+        objects = np.zeros(len(dets), dtype=self.dtype)
+        objects["track_id"] = -1
+        objects["class_id"] = classes
+        objects["confidence"] = dets[:, 4]
+        ymin, xmin, ymax, xmax = (np.clip(dets[:, i], 0.0, 1.0) for i in range(4))
+        objects["bbox"] = np.stack([xmin, ymin, xmax - xmin, ymax - ymin], axis=1)
+        return objects
+
+
+# -------- parity --------
+
+def match_objects(reference, candidate, iou_threshold=0.5):
+    """Greedy same-class matching, highest IoU first -> [(i_reference, j_candidate, iou)]"""
+    if not len(reference) or not len(candidate):
+        return []
+    ious = box_iou(reference["bbox"], candidate["bbox"])
+    ious[reference["class_id"][:, None] != candidate["class_id"][None, :]] = 0.0
+    pairs = []
+    flat = np.argsort(-ious, axis=None)
+    used_r, used_c = set(), set()
+    for idx in flat:
+        i, j = divmod(int(idx), ious.shape[1])
+        if ious[i, j] < iou_threshold:
+            break
+        if i in used_r or j in used_c:
+            continue
+        used_r.add(i)
+        used_c.add(j)
+        pairs.append((i, j, float(ious[i, j])))
+    return pairs
+
+
+def parity(reference_frames, candidate_frames, iou_threshold=0.5):
+    """Agreement of two detectors' outputs, the reference (C++ filter) taken as ground truth"""
+    matched = ref_total = cand_total = 0
+    ious, score_diff, kpt_err = [], [], []
+    for ref, cand in zip(reference_frames, candidate_frames):
+        pairs = match_objects(ref, cand, iou_threshold)
+        matched += len(pairs)
+        ref_total += len(ref)
+        cand_total += len(cand)
+        for i, j, value in pairs:
+            ious.append(value)
+            score_diff.append(abs(float(ref["confidence"][i]) - float(cand["confidence"][j])))
+            if "keypoints" in ref.dtype.names and "keypoints" in cand.dtype.names:
+                kpt_err.append(float(np.abs(ref["keypoints"][i, :, :2] - cand["keypoints"][j, :, :2]).mean()))
+    return {
+        "reference_objects": ref_total,
+        "candidate_objects": cand_total,
+        "matched": matched,
+        "recall": matched / ref_total if ref_total else 1.0,
+        "precision": matched / cand_total if cand_total else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else None,
+        "mean_score_diff": float(np.mean(score_diff)) if score_diff else None,
+        "mean_keypoint_error": float(np.mean(kpt_err)) if kpt_err else None,
+    }
+
+
+def load_capture(path):
+    """--post-capture file -> (list of per-frame tensor dicts, list of C++ object arrays, C++ ms, labels)"""
+    data = np.load(path)
+    names = [str(n) for n in data["tensor_names"]]
+    stacks = [data[f"t{i}"] for i in range(len(names))]
+    frames = [{name: stack[f] for name, stack in zip(names, stacks)} for f in range(len(stacks[0]))]
+    objects, offsets = data["cpp_objects"], data["cpp_offsets"]
+    cpp = [objects[offsets[f]:offsets[f + 1]] for f in range(len(frames))]
+    labels = {int(k): v for k, v in json.loads(str(data["labels"])).items()}
+    return frames, cpp, data["cpp_ms"], labels
+
+
+# -------- pipeline stage --------
+
+def read_tensors(roi):
+    """{output name: float32 array} of the raw tensors hailonet attached to the ROI
+    (FLOAT32 outputs as views; quantized ones dequantized with the stream's scale / zero point)"""
+    out = {}
+    for t in roi.get_tensors():
+        data = np.asarray(t)
+        if data.dtype != np.float32:
+            q = t.vstream_info().quant_info
+            data = (data.astype(np.float32) - q.qp_zp) * q.qp_scale
+        out[t.name()] = data
+    return out
+
+
+def add_objects(roi, objects, labels, landmarks_name="yolov8pose"):
+    """object_dtype rows -> HailoDetections (keypoints as box-relative HailoLandmarks) on the ROI"""
+    has_kpt = "keypoints" in objects.dtype.names
+    for obj in objects:
+        x, y, w, h = (float(v) for v in obj["bbox"])
+        class_id = int(obj["class_id"])
+        label = labels[class_id] if 0 <= class_id < len(labels) else str(class_id)
+        det = hailo.HailoDetection(hailo.HailoBBox(x, y, w, h), class_id, label, float(obj["confidence"]))
+        if has_kpt and w > 0 and h > 0:
+            points = [hailo.HailoPoint(float((kx - x) / w), float((ky - y) / h), float(kc))
+                      for kx, ky, kc in obj["keypoints"]]
+            det.add_object(hailo.HailoLandmarks(landmarks_name, points, 0.0))
+        roi.add_object(det)
+
+
+class PostProcessStage:
+    """identity (post_callback) running YoloPostProcess on every buffer in place of hailofilter"""
+
+    def __init__(self, engine, report_interval=10, window=1000):
+        self.engine = engine
+        self.report_interval = report_interval
+        self.frames = 0
+        self.objects = 0
+        self.errors = 0
+        self.run_ms = deque(maxlen=window)
+        self.stage_ms = {"decode": deque(maxlen=window), "nms": deque(maxlen=window)}
+        self._report_id = None
+
+    @classmethod
+    def from_pipeline(cls, pipeline, identity="post_callback", **kw):
+        stage = cls(**kw)
+        element = pipeline.get_by_name(identity)
+        element.set_property("signal-handoffs", True)
+        element.connect("handoff", stage._on_handoff)
+        return stage
+
+    def _on_handoff(self, identity, buffer):
+        roi = hailo.get_roi_from_buffer(buffer)
+        if roi is None:
+            return
+        t0 = time.perf_counter()
+        try:
+            tensors = read_tensors(roi)
+            if not tensors:
+                return  # hailonet pass-through (frame_skip.py): no inference on this frame
+            (objects,) = self.engine(tensors)
+            add_objects(roi, objects, self.engine.labels)
+        except Exception as e:
+            self.errors += 1
+            if self.errors == 1:
+                print(f"⚠️  [POST] post-process failed: {type(e).__name__}: {e}")
+            return
+        self.run_ms.append((time.perf_counter() - t0) * 1000.0)
+        for stage, ms in self.engine.last_ms.items():
+            self.stage_ms[stage].append(ms)
+        self.frames += 1
+        self.objects = len(objects)
+
+    def start_reports(self):
+        if self.report_interval:
+            self._report_id = GLib.timeout_add_seconds(self.report_interval, self.print_status)
+
+    def stop(self):
+        if self._report_id is not None:
+            GLib.source_remove(self._report_id)
+            self._report_id = None
+
+    @staticmethod
+    def _p50(samples):
+        return float(np.percentile(np.fromiter(samples, dtype=np.float64), 50)) if samples else None
+
+    def report(self):
+        run = np.fromiter(self.run_ms, dtype=np.float64) if self.run_ms else None
+        return {
+            "kind": self.engine.kind,
+            "frames": self.frames,
+            "errors": self.errors,
+            "score_threshold": getattr(self.engine, "score_threshold", None),
+            "iou_threshold": getattr(self.engine, "iou_threshold", None),
+            "run_ms": None if run is None else {
+                "p50": float(np.percentile(run, 50)), "p95": float(np.percentile(run, 95)), "max": float(run.max())},
+            "decode_ms_p50": self._p50(self.stage_ms["decode"]),
+            "nms_ms_p50": self._p50(self.stage_ms["nms"]),
+        }
+
+    def print_status(self):
+        r = self.report()
+        line = f"[POST] {r['kind']}: {r['frames']} frames, {self.objects} objects"
+        if r["run_ms"]:
+            line += (f", run p50 {r['run_ms']['p50']:.2f} p95 {r['run_ms']['p95']:.2f} ms "
+                     f"(decode {r['decode_ms_p50']:.2f}, nms {r['nms_ms_p50']:.2f})")
+        if r["errors"]:
+            line += f", errors {r['errors']}"
+        print(line)
+        return True
+
+
+class TensorCapture:
+    """Probes around hailofilter saving raw tensors, the C++ detections and the filter time of N frames"""
+
+    def __init__(self, hailofilter, path, frames=300):
+        self.path = path
+        self.frames = frames
+        self.extractor = RoiExtractor()
+        self.tensors = []
+        self.objects = []
+        self.filter_ms = []
+        self._enter = {}
+        self._done = False
+        hailofilter.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self._on_enter)
+        hailofilter.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_leave)
+
+    def _on_enter(self, pad, info):
+        if self._done:
+            return Gst.PadProbeReturn.REMOVE
+        self._enter[info.get_buffer().pts] = time.perf_counter()
+        return Gst.PadProbeReturn.OK
+
+    def _on_leave(self, pad, info):
+        if self._done:
+            return Gst.PadProbeReturn.REMOVE
+        buffer = info.get_buffer()
+        t_enter = self._enter.pop(buffer.pts, None)
+        roi = hailo.get_roi_from_buffer(buffer)
+        if t_enter is None or roi is None:
+            return Gst.PadProbeReturn.OK
+        self.filter_ms.append((time.perf_counter() - t_enter) * 1000.0)
+        self.tensors.append({name: t.copy() for name, t in read_tensors(roi).items()})
+        self.objects.append(self.extractor.extract(roi, copy=True))
+        if len(self.tensors) >= self.frames:
+            self.save()
+            return Gst.PadProbeReturn.REMOVE
+        return Gst.PadProbeReturn.OK
+
+    def save(self):
+        if self._done or not self.tensors:
+            return
+        self._done = True
+        names = sorted(self.tensors[0])
+        # Frames before the first landmarks were extracted without the keypoints field
+        dtype = object_dtype(self.extractor.num_keypoints or 0)
+        objects = np.zeros(sum(len(a) for a in self.objects), dtype=dtype)
+        pos = 0
+        for a in self.objects:
+            for name in a.dtype.names:
+                objects[name][pos:pos + len(a)] = a[name]
+            pos += len(a)
+        arrays = {f"t{i}": np.stack([frame[name] for frame in self.tensors]) for i, name in enumerate(names)}
+        np.savez_compressed(
+            self.path, tensor_names=np.array(names), cpp_objects=objects,
+            cpp_offsets=np.cumsum([0] + [len(a) for a in self.objects]), cpp_ms=np.array(self.filter_ms),
+            labels=json.dumps({str(k): v for k, v in self.extractor.labels.items()}), **arrays,
+        )
+        print(f"💾 [POST] {len(self.tensors)} frames of tensors + C++ detections written to {self.path}")
+
+
+# -------- CLI --------
+
+def add_postprocess_arguments(parser):
+    """Standard --post-engine options"""
+    parser.add_argument("--post-engine", choices=ENGINES, default="so",
+                        help="so: hailofilter with the --post library; numpy: this module on FLOAT32 tensors "
+                             "in an identity (default: so)")
+    parser.add_argument("--post-kind", choices=KINDS, default="auto",
+                        help="--post-engine numpy: output layout (default: auto from the tensor shapes)")
+    parser.add_argument("--post-score", type=float, default=None,
+                        help="--post-engine numpy: score threshold (default: the model's .so default)")
+    parser.add_argument("--post-iou", type=float, default=None,
+                        help="--post-engine numpy: NMS IoU threshold (default: the model's .so default)")
+    parser.add_argument("--post-classes", type=int, default=None,
+                        help="--post-engine numpy: number of classes (default: 80, 1 for pose)")
+    parser.add_argument("--post-max-det", type=int, default=300,
+                        help="--post-engine numpy: detections kept per frame (default: 300)")
+    parser.add_argument("--post-sigmoid", action="store_true",
+                        help="--post-engine numpy: class outputs are logits (no sigmoid in the HEF)")
+    parser.add_argument("--post-interval", type=int, default=10,
+                        help="--post-engine numpy: seconds between status lines, 0 = final only (default: 10)")
+    parser.add_argument("--post-capture", default=None,
+                        help="--post-engine so: save raw tensors (dequantized) + C++ detections to this .npz "
+                             "for bench_postprocess.py")
+    parser.add_argument("--post-capture-frames", type=int, default=300,
+                        help="--post-capture: frames to save (default: 300)")
+
+
+def postprocess_from_args(args, pipeline, kind="auto", score=None, iou=None):
+    """(PostProcessStage or None, TensorCapture or None) for the parsed options"""
+    stage = capture = None
+    if args.post_engine == "numpy":
+        if not HAVE_HAILO:
+            print("⚠️  hailo Python module not available: the NumPy post-process cannot read tensors")
+            return None, None
+        engine = YoloPostProcess(
+            kind if args.post_kind == "auto" else args.post_kind, num_classes=args.post_classes,
+            score_threshold=args.post_score if args.post_score is not None else score,
+            iou_threshold=args.post_iou if args.post_iou is not None else iou,
+            max_detections=args.post_max_det, sigmoid_scores=args.post_sigmoid,
+        )
+        stage = PostProcessStage.from_pipeline(pipeline, engine=engine, report_interval=args.post_interval)
+    elif args.post_capture:
+        if not HAVE_HAILO:
+            print("⚠️  hailo Python module not available: --post-capture ignored")
+        else:
+            capture = TensorCapture(pipeline.get_by_name("inference_hailofilter"), args.post_capture,
+                                    frames=args.post_capture_frames)
+    return stage, capture
+
+
+def finish_postprocess(stage, capture):
+    if stage is not None:
+        stage.stop()
+        stage.print_status()
+    if capture is not None:
+        capture.save()
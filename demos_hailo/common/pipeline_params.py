@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+pipeline_params.py - Tunable pipeline parameters (queue depths, n-threads, batch size) and per-host profiles
+The builders in demo0_pose / demo1_detec take a PipelineParams instead of hardcoding max-size-buffers,
+n-threads and batch-size. autotune.py searches these per host and stores the best set in a profile file:
+
+  {hostname: {"pose/throughput": {"params": {...}, "fps": ..., "p95_ms": ..., "time": ...}, ...}}
+
+Usage (in a pipeline script):
+  from pipeline_params import PipelineParams, add_params_arguments, params_from_args
+  add_params_arguments(parser)
+  params = params_from_args(args, "pose", DEFAULT_PARAMS)
+  pipe = f"... {params.queue('inference_hailonet_q', hailonet=True)} ! hailonet batch-size={params.batch_size} ..."
+"""
+
+import json
+import os
+import socket
+import time
+
+PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "hailo_demos", "pipeline_profile.json")
+OBJECTIVES = ("throughput", "latency")
+
+
+class PipelineParams:
+    """Queue depths, element thread counts and hailonet batch size for one pipeline"""
+
+    FIELDS = ("queue_buffers", "hailonet_queue_buffers", "scale_threads", "convert_threads",
+              "source_convert_threads", "batch_size")
+
+    def __init__(self, queue_buffers=3, hailonet_queue_buffers=None, scale_threads=2, convert_threads=2,
+                 source_convert_threads=None, batch_size=1):
+        self.queue_buffers = queue_buffers
+        # None = same depth as the other queues / threads as the other videoconverts
+        self.hailonet_queue_buffers = hailonet_queue_buffers
+        self.scale_threads = scale_threads
+        self.convert_threads = convert_threads
+        self.source_convert_threads = source_convert_threads
+        self.batch_size = batch_size
+
+    def queue(self, name=None, hailonet=False, leaky="no"):
+        """queue element (no trailing '!'); hailonet=True uses the depth in front of hailonet"""
+        buffers = self.hailonet_queue_buffers if hailonet and self.hailonet_queue_buffers else self.queue_buffers
+        named = f"name={name} " if name else ""
+        return f"queue {named}leaky={leaky} max-size-buffers={buffers} max-size-bytes=0 max-size-time=0"
+
+    @property
+    def source_threads(self):
+        return self.source_convert_threads or self.convert_threads
+
+    def replace(self, **changes):
+        values = self.to_dict()
+        values.update(changes)
+        return PipelineParams(**values)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**{k: v for k, v in values.items() if k in cls.FIELDS})
+
+    def key(self):
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, PipelineParams) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return "PipelineParams(" + ", ".join(f"{k}={v}" for k, v in self.to_dict().items()) + ")"
+
+    def describe(self):
+        hq = self.hailonet_queue_buffers or self.queue_buffers
+        return (f"queues {self.queue_buffers} (hailonet {hq}), scale threads {self.scale_threads}, "
+                f"convert threads {self.convert_threads} (source {self.source_threads}), batch {self.batch_size}")
+
+
+# -------- profile file --------
+
+def profile_key(pipeline, objective):
+    return f"{pipeline}/{objective}"
+
+
+def load_profile(path=PROFILE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_profile_entry(pipeline, objective, params, metrics, path=PROFILE_PATH, host=None):
+    """Store the best params (plus the metrics they scored) for this host"""
+    profile = load_profile(path)
+    entry = {"params": params.to_dict(), "time": time.time()}
+    entry.update(metrics)
+    profile.setdefault(host or socket.gethostname(), {})[profile_key(pipeline, objective)] = entry
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2, sort_keys=True)
+
+
+def profile_params(pipeline, objective, defaults, path=PROFILE_PATH, host=None):
+    """Tuned params for this host, or None if the profile has no entry"""
+    entry = load_profile(path).get(host or socket.gethostname(), {}).get(profile_key(pipeline, objective))
+    if entry is None:
+        return None
+    return defaults.replace(**PipelineParams.from_dict(entry["params"]).to_dict())
+
+
+# -------- CLI --------
+
+def add_params_arguments(parser):
+    """Standard pipeline parameter options (None = builder default / profile value)"""
+    parser.add_argument("--profile", nargs="?", const=PROFILE_PATH, default=None,
+                        help=f"Load tuned queue/thread/batch params for this host (autotune.py) "
+                             f"from a profile file (default: {PROFILE_PATH})")
+    parser.add_argument("--profile-objective", choices=OBJECTIVES, default="throughput",
+                        help="--profile: which tuned entry to load (default: throughput)")
+    parser.add_argument("--queue-buffers", type=int, default=None, help="max-size-buffers of the pipeline queues")
+    parser.add_argument("--hailonet-queue-buffers", type=int, default=None,
+                        help="max-size-buffers of the queue in front of hailonet")
+    parser.add_argument("--scale-threads", type=int, default=None, help="videoscale n-threads")
+    parser.add_argument("--convert-threads", type=int, default=None, help="videoconvert n-threads")
+    parser.add_argument("--batch-size", type=int, default=None, help="Hailonet batch size")
+
+
+def params_from_args(args, pipeline, defaults):
+    """defaults <- profile entry (--profile) <- explicit command line values"""
+    params = defaults
+    if getattr(args, "profile", None):
+        tuned = profile_params(pipeline, args.profile_objective, defaults, args.profile)
+        if tuned is None:
+            print(f"⚠️  No '{profile_key(pipeline, args.profile_objective)}' entry for "
+                  f"{socket.gethostname()} in {args.profile}, using defaults")
+        else:
+            print(f"🎛️  Profile {profile_key(pipeline, args.profile_objective)}: {tuned.describe()}")
+            params = tuned
+    overrides = {field: getattr(args, field) for field in PipelineParams.FIELDS
+                 if getattr(args, field, None) is not None}
+    return params.replace(**overrides) if overrides else params
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+queue_monitor.py - Per-queue occupancy sampler and bottleneck detector for a running pipeline
+Polls current-level-buffers/bytes/time of every queue in the pipeline at a fixed interval, keeps a
+time series, and maps each queue to the stage behind it (the elements up to the next queue(s)).
+The bottleneck is the first stage, in data-flow order, whose upstream queue stays full over the
+window while every queue after it stays drained (or it ends in a sink):
+
+  source_convert_q [##] -> inference_hailonet_q [###] -> hailonet -> inference_hailofilter_q [ ]
+                                                         ^ bottleneck
+
+Usage (in a pipeline script):
+  from queue_monitor import QueueMonitor, add_queue_monitor_arguments
+  monitor = QueueMonitor(pipeline, interval_ms=200, report_interval=5).start()
+  ...
+  monitor.stop(); monitor.write_report("queues.json")
+"""
+
+import json
+import time
+from collections import deque
+
+from gi.repository import GLib
+
+
+def _is_queue(element):
+    factory = element.get_factory()
+    return factory is not None and factory.get_name() == "queue"
+
+
+def _downstream(element):
+    """Elements linked to the src pads of element"""
+    out = []
+    for pad in element.iterate_src_pads():
+        peer = pad.get_peer()
+        parent = peer.get_parent_element() if peer is not None else None
+        if parent is not None:
+            out.append(parent)
+    return out
+
+
+class QueueStage:
+    """One queue, the elements it feeds and the next queue(s) downstream"""
+
+    def __init__(self, queue, order):
+        self.queue = queue
+        self.name = queue.get_name()
+        self.order = order
+        self.elements = []
+        self.next_queues = []
+        self.max_buffers = queue.get_property("max-size-buffers")
+        self.max_bytes = queue.get_property("max-size-bytes")
+        self.max_time = queue.get_property("max-size-time")
+
+    def resolve(self):
+        """Walk downstream until the next queue(s) or a sink"""
+        frontier = _downstream(self.queue)
+        seen = set()
+        while frontier:
+            element = frontier.pop(0)
+            name = element.get_name()
+            if name in seen:
+                continue
+            seen.add(name)
+            if _is_queue(element):
+                self.next_queues.append(name)
+                continue
+            self.elements.append(name)
+            frontier.extend(_downstream(element))
+
+    def sample(self):
+        """(buffers, bytes, time ns, fill 0..1); fill uses whichever limit is set"""
+        buffers = self.queue.get_property("current-level-buffers")
+        nbytes = self.queue.get_property("current-level-bytes")
+        ntime = self.queue.get_property("current-level-time")
+        if self.max_buffers:
+            fill = buffers / self.max_buffers
+        elif self.max_bytes:
+            fill = nbytes / self.max_bytes
+        elif self.max_time:
+            fill = ntime / self.max_time
+        else:
+            fill = 0.0
+        return buffers, nbytes, ntime, min(fill, 1.0)
+
+    def label(self):
+        return f"{self.name} -> {', '.join(self.elements) or '-'}"
+
+
+class QueueMonitor:
+    """Samples every queue on the main loop and names the bottleneck stage"""
+
+    def __init__(self, pipeline, interval_ms=200, window_s=5.0, report_interval=5, full=0.8, drained=0.2,
+                 max_samples=3000):
+        self.pipeline = pipeline
+        self.interval_ms = interval_ms
+        self.report_interval = report_interval
+        self.full = full
+        self.drained = drained
+        self.window = max(1, int(window_s * 1000 / interval_ms))
+        self.start_time = time.time()
+
+        # Data-flow order: iterate_sorted() yields sinks first
+        sorted_names = [e.get_name() for e in pipeline.iterate_sorted()][::-1]
+        order = {name: i for i, name in enumerate(sorted_names)}
+        queues = [e for e in pipeline.iterate_recurse() if _is_queue(e)]
+        self.stages = sorted((QueueStage(q, order.get(q.get_name(), len(order))) for q in queues),
+                             key=lambda s: s.order)
+        for stage in self.stages:
+            stage.resolve()
+        self.by_name = {s.name: s for s in self.stages}
+
+        # Time series: (t, {queue: (buffers, bytes, time, fill)}); recent fills per queue for the window
+        self.series = deque(maxlen=max_samples)
+        self.recent = {s.name: deque(maxlen=self.window) for s in self.stages}
+        self.bottleneck = None
+        self.bottleneck_history = []  # (t, stage label or None)
+        self._sample_id = None
+        self._report_id = None
+
+    # -------- sampling --------
+
+    def start(self):
+        self._sample_id = GLib.timeout_add(self.interval_ms, self.sample)
+        if self.report_interval:
+            self._report_id = GLib.timeout_add_seconds(self.report_interval, self.print_summary)
+        return self
+
+    def stop(self):
+        for source_id in (self._sample_id, self._report_id):
+            if source_id is not None:
+                GLib.source_remove(source_id)
+        self._sample_id = self._report_id = None
+
+    def sample(self):
+        t = time.time() - self.start_time
+        row = {}
+        for stage in self.stages:
+            row[stage.name] = stage.sample()
+            self.recent[stage.name].append(row[stage.name][3])
+        self.series.append((t, row))
+
+        current = self.detect()
+        if current is not self.bottleneck:
+            self.bottleneck = current
+            self.bottleneck_history.append((round(t, 3), current.label() if current else None))
+        return True
+
+    def mean_fill(self, name):
+        fills = self.recent[name]
+        return sum(fills) / len(fills) if fills else 0.0
+
+    def detect(self):
+        """First stage whose queue stays full while everything it feeds stays drained"""
+        for stage in self.stages:
+            if len(self.recent[stage.name]) < self.window or self.mean_fill(stage.name) < self.full:
+                continue
+            if all(self.mean_fill(n) <= self.drained for n in stage.next_queues if n in self.recent):
+                return stage
+        return None
+
+    # -------- output --------
+
+    def summary_lines(self):
+        lines = []
+        for stage in self.stages:
+            fill = self.mean_fill(stage.name)
+            bar = "#" * int(round(fill * 10))
+            marker = "  <- bottleneck" if stage is self.bottleneck else ""
+            lines.append(f"  {stage.name:<32} [{bar:<10}] {fill * 100:5.1f}%  -> "
+                         f"{', '.join(stage.elements) or '-'}{marker}")
+        return lines
+
+    def print_summary(self):
+        bottleneck = self.bottleneck.label() if self.bottleneck else "none"
+        print(f"[QUEUES] mean fill over {self.window * self.interval_ms / 1000:.1f} s, bottleneck: {bottleneck}")
+        for line in self.summary_lines():
+            print(line)
+        return True
+
+    def report(self):
+        """Per-queue statistics, topology, bottleneck history and the raw time series"""
+        queues = {}
+        for stage in self.stages:
+            fills = [row[stage.name][3] for _, row in self.series]
+            levels = [row[stage.name][0] for _, row in self.series]
+            queues[stage.name] = {
+                "order": stage.order,
+                "feeds": stage.elements,
+                "next_queues": stage.next_queues,
+                "max_size_buffers": stage.max_buffers,
+                "mean_fill": sum(fills) / len(fills) if fills else 0.0,
+                "full_fraction": sum(f >= self.full for f in fills) / len(fills) if fills else 0.0,
+                "max_level_buffers": max(levels) if levels else 0,
+            }
+        return {
+            "interval_ms": self.interval_ms,
+            "window_samples": self.window,
+            "thresholds": {"full": self.full, "drained": self.drained},
+            "duration_s": round(time.time() - self.start_time, 3),
+            "bottleneck": self.bottleneck.label() if self.bottleneck else None,
+            "bottleneck_history": self.bottleneck_history,
+            "queues": queues,
+            "series": [{"t": round(t, 3), "levels": {n: list(v[:3]) for n, v in row.items()}}
+                       for t, row in self.series],
+        }
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"[QUEUES] report written to {path} ({len(self.series)} samples)")
+
+
+def add_queue_monitor_arguments(parser):
+    """Standard --queue-monitor options"""
+    parser.add_argument("--queue-monitor", action="store_true",
+                        help="Sample every queue's level and report the bottleneck stage")
+    parser.add_argument("--queue-interval-ms", type=int, default=200,
+                        help="--queue-monitor: sampling interval (default: 200)")
+    parser.add_argument("--queue-summary", type=int, default=5,
+                        help="--queue-monitor: seconds between live summaries, 0 = off (default: 5)")
+    parser.add_argument("--queue-report", default=None,
+                        help="--queue-monitor: write a JSON report (time series + bottleneck) here at shutdown")
+
+
+def monitor_from_args(args, pipeline):
+    if not args.queue_monitor:
+        return None
+    return QueueMonitor(pipeline, interval_ms=args.queue_interval_ms, report_interval=args.queue_summary)
+
+
+def finish_monitor(monitor, args):
+    """Stop sampling, print the last summary and write the report if requested"""
+    if monitor is None:
+        return
+    monitor.stop()
+    monitor.print_summary()
+    if args.queue_report:
+        monitor.write_report(args.queue_report)
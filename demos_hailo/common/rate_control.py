@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+rate_control.py - Closed-loop inference rate: retune videorate max-rate from queue level and inference time
+Replaces the static "videorate drop-only=true ! video/x-raw,framerate=N/1" stage. Every interval the
+controller reads current-level-buffers of the queue in front of hailonet and the per-frame inference
+time (hailonet sink -> src pad probes), estimates the latency added in front of and inside hailonet,
+and moves max-rate down quickly when over the target, up slowly when there is headroom.
+
+  latency ~ (queue level + 1) x inference time
+
+Branches that must keep every frame (the hailomuxer bypass topology: one video frame + one metadata
+buffer -> one output) cannot be decimated by videorate. InferenceGate limits the rate instead by
+setting hailonet pass-through on the frames above it (as frame_skip.py does) and, at an identity after
+the post-process (inference_hold), puts the last inferred frame's detections on the passed-through ones.
+
+Usage (in a pipeline script):
+  from rate_control import videorate_section, InferenceRateController, add_rate_control_arguments
+  pipe = "... ! " + videorate_section(15, controlled=True) + " ! queue name=inference_hailonet_q ..."
+  ctl = InferenceRateController.from_pipeline(pipeline, target_latency_ms=150, start_fps=15).start()
+
+  gate = InferenceGate.from_pipeline(pipeline, fps=15)     # bypass: "... ! hailofilter ! identity name=inference_hold ..."
+  ctl = InferenceRateController.from_pipeline(pipeline, gate=gate, start_fps=15).start()
+"""
+
+import threading
+from collections import OrderedDict
+
+from gi.repository import GLib, Gst
+
+from np_postprocess import add_objects
+from roi_arrays import HAVE_HAILO, RoiExtractor
+
+if HAVE_HAILO:
+    import hailo
+
+
+def videorate_section(inference_fps, controlled=False, name="inference_rate"):
+    """Static: fixed framerate caps. Controlled: max-rate only, retuned at runtime"""
+    if controlled:
+        return f"videorate name={name} drop-only=true max-rate={inference_fps}"
+    return f"videorate name={name} drop-only=true ! video/x-raw,framerate={inference_fps}/1"
+
+
+class InferenceGate:
+    """hailonet pass-through above `fps` (by PTS); the hold identity repeats the last detections on skipped frames"""
+
+    def __init__(self, hailonet, fps, hold=None):
+        self.hailonet = hailonet
+        self.fps = fps              # read on every frame, so InferenceRateController can retune it
+        self.infer = True           # decision for the buffer currently entering hailonet
+        self.ratio = 1.0            # EWMA share of inferred frames
+        self.frames = 0
+        self.inferred = 0
+        self._next_pts = None
+        self._decisions = OrderedDict()
+        self._lock = threading.Lock()
+        self._extractor = RoiExtractor()
+        self._last = None
+        self._labels = ()
+
+        hailonet.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self._on_infer_in)
+        if hold is not None:
+            hold.set_property("signal-handoffs", True)
+            hold.connect("handoff", self._on_hold)
+
+    @classmethod
+    def from_pipeline(cls, pipeline, fps, hailonet="inference_hailonet", hold="inference_hold"):
+        return cls(pipeline.get_by_name(hailonet), fps, pipeline.get_by_name(hold))
+
+    # -------- streaming threads --------
+
+    def _due(self, pts):
+        if pts == Gst.CLOCK_TIME_NONE:
+            return True
+        interval = Gst.SECOND // max(1, int(self.fps))
+        if self._next_pts is None or pts >= self._next_pts or pts + 2 * interval < self._next_pts:
+            # Keep the cadence; restart it after a stall or a PTS jump backwards
+            nxt = (self._next_pts or pts) + interval
+            self._next_pts = nxt if pts < nxt <= pts + interval else pts + interval
+            return True
+        return False
+
+    def _on_infer_in(self, pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            infer = self._due(buffer.pts)
+            self.infer = infer
+            self.frames += 1
+            self.inferred += infer
+            self.ratio = 0.95 * self.ratio + 0.05 * infer
+            with self._lock:
+                self._decisions[buffer.pts] = infer
+                if len(self._decisions) > 256:
+                    self._decisions.popitem(last=False)
+            # Read by hailonet's chain function right after this probe, on the same thread
+            self.hailonet.set_property("pass-through", not infer)
+        return Gst.PadProbeReturn.OK
+
+    def _on_hold(self, identity, buffer):
+        with self._lock:
+            inferred = self._decisions.pop(buffer.pts, True)
+        if not HAVE_HAILO:
+            return
+        roi = hailo.get_roi_from_buffer(buffer)
+        if roi is None:
+            return
+        if inferred:
+            self._last = self._extractor.extract(roi, copy=True)
+            labels = self._extractor.labels
+            if len(self._labels) != len(labels):
+                self._labels = tuple(labels.get(c, str(c)) for c in range(max(labels, default=-1) + 1))
+        elif self._last is not None and len(self._last):
+            add_objects(roi, self._last, self._labels)
+
+    def summary(self):
+        share = self.inferred / self.frames if self.frames else 0.0
+        return f"Inference gate: {self.inferred}/{self.frames} frames inferred ({share:.0%}), limit {self.fps} fps"
+
+
+class InferenceRateController:
+    """Holds a latency target in front of/inside hailonet while pushing the inference fps as high as it allows"""
+
+    def __init__(self, videorate, queue, hailonet, target_latency_ms=150.0, start_fps=15, min_fps=2,
+                 max_fps=30, interval_ms=500, on_update=None, gate=None):
+        self.videorate = videorate
+        self.gate = gate            # InferenceGate in place of videorate (bypass topology)
+        self.queue = queue
+        self.target_ms = target_latency_ms
+        self.fps = start_fps
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.interval_ms = interval_ms
+        self.on_update = on_update
+
+        # Inference time from hailonet pad probes (EWMA)
+        self._t_in = {}
+        self.infer_ms = 0.0
+        self.frames = 0
+
+        # Last sample (exposed through state())
+        self.level = 0
+        self.capacity = queue.get_property("max-size-buffers") if queue is not None else 0
+        self.latency_ms = 0.0
+        self.action = "hold"
+        self.adjustments = 0
+        self._source_id = None
+
+        # Added after the gate's probe, so self.gate.infer is already decided for the buffer
+        sink = hailonet.get_static_pad("sink")
+        src = hailonet.get_static_pad("src")
+        sink.add_probe(Gst.PadProbeType.BUFFER, self._on_infer_in)
+        src.add_probe(Gst.PadProbeType.BUFFER, self._on_infer_out)
+
+    @classmethod
+    def from_pipeline(cls, pipeline, videorate="inference_rate", queue="inference_hailonet_q",
+                      hailonet="inference_hailonet", **kwargs):
+        return cls(pipeline.get_by_name(videorate), pipeline.get_by_name(queue),
+                   pipeline.get_by_name(hailonet), **kwargs)
+
+    # -------- inference time (streaming threads) --------
+
+    def _on_infer_in(self, pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None and (self.gate is None or self.gate.infer):
+            self._t_in[buffer.pts] = GLib.get_monotonic_time()
+        return Gst.PadProbeReturn.OK
+
+    def _on_infer_out(self, pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            t0 = self._t_in.pop(buffer.pts, None)
+            if t0 is not None:
+                ms = (GLib.get_monotonic_time() - t0) / 1000.0
+                self.infer_ms = ms if self.frames == 0 else 0.8 * self.infer_ms + 0.2 * ms
+                self.frames += 1
+            if len(self._t_in) > 64:
+                self._t_in.clear()  # frames dropped inside hailonet
+        return Gst.PadProbeReturn.OK
+
+    # -------- control loop (main loop) --------
+
+    def start(self):
+        self.apply(self.fps)
+        self._source_id = GLib.timeout_add(self.interval_ms, self.step)
+        return self
+
+    def stop(self):
+        if self._source_id is not None:
+            GLib.source_remove(self._source_id)
+            self._source_id = None
+
+    def apply(self, fps):
+        self.fps = int(max(self.min_fps, min(self.max_fps, fps)))
+        if self.gate is not None:
+            self.gate.fps = self.fps
+        else:
+            self.videorate.set_property("max-rate", self.fps)
+
+    def step(self):
+        """One control update; returns True to stay scheduled"""
+        if self.frames == 0:
+            return True
+        self.level = self.queue.get_property("current-level-buffers")
+        # Behind a gate most queued frames are passed through; only the inferred share costs infer_ms
+        queued = self.level * (self.gate.ratio if self.gate is not None else 1.0)
+        self.latency_ms = (queued + 1) * self.infer_ms
+        sustainable = 1000.0 / self.infer_ms if self.infer_ms > 0 else self.max_fps
+        old = self.fps
+
+        if self.latency_ms > self.target_ms or (self.capacity and self.level >= self.capacity - 1):
+            # Backlog: drop below what hailonet sustains so the queue drains
+            self.apply(min(self.fps * 0.8, sustainable * 0.9))
+            self.action = "decrease"
+        elif self.level == 0 and self.latency_ms < 0.7 * self.target_ms and self.fps < sustainable * 0.95:
+            self.apply(self.fps + 1)
+            self.action = "increase"
+        else:
+            self.action = "hold"
+
+        if self.fps != old:
+            self.adjustments += 1
+        else:
+            self.action = "hold"
+        if self.on_update is not None:
+            self.on_update(self.state(), self.fps != old)
+        return True
+
+    def state(self):
+        return {
+            "fps": self.fps,
+            "queue_level": self.level,
+            "infer_ms": round(self.infer_ms, 2),
+            "latency_ms": round(self.latency_ms, 1),
+            "target_ms": self.target_ms,
+            "action": self.action,
+            "adjustments": self.adjustments,
+        }
+
+    def summary(self):
+        return (f"Rate control: {self.fps} fps (range {self.min_fps}-{self.max_fps}), "
+                f"inference {self.infer_ms:.1f} ms, est. latency {self.latency_ms:.0f}/{self.target_ms:.0f} ms, "
+                f"{self.adjustments} adjustments")
+
+
+def add_rate_control_arguments(parser):
+    """Standard --rate-control options"""
+    parser.add_argument("--rate-control", action="store_true",
+                        help="Retune the inference rate at runtime (videorate max-rate) to hold --target-latency-ms")
+    parser.add_argument("--target-latency-ms", type=float, default=150.0,
+                        help="--rate-control: latency target in front of and inside hailonet (default: 150)")
+    parser.add_argument("--min-inference-fps", type=int, default=2,
+                        help="--rate-control: lowest inference rate (default: 2)")
+    parser.add_argument("--max-inference-fps", type=int, default=None,
+                        help="--rate-control: highest inference rate (default: the input fps)")
+
+
+def print_rate_update(state, changed):
+    """Default on_update: one line per max-rate change"""
+    if changed:
+        print(f"[RATE] queue {state['queue_level']}, inference {state['infer_ms']:.1f} ms, "
+              f"latency ~{state['latency_ms']:.0f}/{state['target_ms']:.0f} ms -> "
+              f"{state['action']} to {state['fps']} fps")
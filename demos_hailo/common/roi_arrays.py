@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+roi_arrays.py - One frame's Hailo ROI as a NumPy structured array (boxes, class, confidence, track ID, keypoints)
+The per-object pybind calls are unavoidable, but they only fill flat Python lists; each field is then
+written into a preallocated structured array with one assignment, and landmark points are moved from
+box-relative to frame-relative coordinates for all objects at once. Analytics then run vectorized over
+the whole frame (e.g. joint_angles for every person in one call) instead of walking HailoDetections.
+
+  object: track_id i4 | class_id i2 | confidence f4 | bbox f4[4] (xmin, ymin, w, h) | [keypoints f4[K][3] (x, y, conf)]
+
+Same field order and names as sei_schema.track_dtype(wire=False), so the arrays go straight into the SEI payload.
+class_id is signed: detections built without a class report -1 ("no class").
+
+Usage:
+  from roi_arrays import RoiExtractor, joint_angles, COCO_ANGLES
+  extractor = RoiExtractor()
+  objects = extractor.extract(hailo.get_roi_from_buffer(buffer))      # view, valid until the next call
+  angles = joint_angles(objects["keypoints"], COCO_ANGLES)            # (people, angles) in degrees
+"""
+
+import numpy as np
+
+try:
+    import hailo
+    HAVE_HAILO = True
+    DETECTION, UNIQUE_ID, LANDMARKS = hailo.HAILO_DETECTION, hailo.HAILO_UNIQUE_ID, hailo.HAILO_LANDMARKS
+except ImportError:
+    HAVE_HAILO = False
+    # Type tags understood by the synthetic ROIs of bench_roi_arrays.py
+    DETECTION, UNIQUE_ID, LANDMARKS = "detection", "unique_id", "landmarks"
+
+# COCO-17 joints: angle at the middle keypoint of each triplet
+COCO_ANGLES = {
+    "left_elbow": (5, 7, 9),
+    "right_elbow": (6, 8, 10),
+    "left_shoulder": (11, 5, 7),
+    "right_shoulder": (12, 6, 8),
+    "left_hip": (5, 11, 13),
+    "right_hip": (6, 12, 14),
+    "left_knee": (11, 13, 15),
+    "right_knee": (12, 14, 16),
+}
+
+
+def object_dtype(num_keypoints=0):
+    """Structured dtype of one detection (layout of sei_schema.track_dtype(wire=False))"""
+    fields = [
+        ("track_id", "<i4"),
+        ("class_id", "<i2"),
+        ("confidence", "<f4"),
+        ("bbox", "<f4", (4,)),
+    ]
+    if num_keypoints:
+        fields.append(("keypoints", "<f4", (num_keypoints, 3)))
+    return np.dtype(fields)
+
+
+class RoiExtractor:
+    """Reusable ROI -> structured array converter; the array grows (x2) and is never shrunk"""
+
+    def __init__(self, num_keypoints=None, capacity=16):
+        # None = taken from the first frame with landmarks (0 until then)
+        self.num_keypoints = num_keypoints
+        self.labels = {}  # class_id -> label, for reports
+        self._alloc(capacity, num_keypoints or 0)
+
+    def _alloc(self, capacity, num_keypoints):
+        self._array = np.zeros(capacity, dtype=object_dtype(num_keypoints))
+        self._k = num_keypoints
+
+    def extract(self, roi_or_objects, copy=False):
+        """ROI (HailoROI) or a list of its objects -> structured array of the detections
+
+        The result is a view of the internal buffer unless copy=True (needed when it outlives the call)."""
+        if hasattr(roi_or_objects, "get_objects_typed"):
+            dets = roi_or_objects.get_objects_typed(DETECTION)
+        else:
+            dets = [obj for obj in roi_or_objects if hasattr(obj, "get_bbox")]
+        n = len(dets)
+
+        boxes, classes, confidences, ids, points, counts = [], [], [], [], [], []
+        for det in dets:
+            b = det.get_bbox()
+            boxes.append((b.xmin(), b.ymin(), b.width(), b.height()))
+            class_id = det.get_class_id()
+            classes.append(class_id)
+            if class_id not in self.labels:
+                self.labels[class_id] = det.get_label()
+            confidences.append(det.get_confidence())
+            unique = det.get_objects_typed(UNIQUE_ID)
+            ids.append(unique[0].get_id() if unique else -1)
+            landmarks = det.get_objects_typed(LANDMARKS)
+            if landmarks:
+                pts = landmarks[0].get_points()
+                counts.append(len(pts))
+                for p in pts:
+                    points += (p.x(), p.y(), p.confidence())
+            else:
+                counts.append(0)
+
+        k = self._k
+        if self.num_keypoints is None:
+            seen = max(counts, default=0)
+            if seen > k:
+                self.num_keypoints = k = seen
+        if n > len(self._array) or k != self._k:
+            self._alloc(max(n, 2 * len(self._array)), k)
+
+        out = self._array[:n]
+        if n:
+            out["track_id"] = ids
+            out["class_id"] = classes
+            out["confidence"] = confidences
+            out["bbox"] = boxes
+            if k:
+                self._fill_keypoints(out, points, counts, k)
+        return out.copy() if copy else out
+
+    @staticmethod
+    def _fill_keypoints(out, points, counts, k):
+        """Flat box-relative (x, y, conf) list -> frame-relative keypoints for every object in one pass"""
+        kp = out["keypoints"]
+        flat = np.asarray(points, dtype=np.float32)
+        if all(c == k for c in counts):
+            kp[:] = flat.reshape(len(counts), k, 3)
+        else:
+            kp[:] = 0.0
+            offset = 0
+            for i, c in enumerate(counts):
+                used = min(c, k)
+                kp[i, :used] = flat[offset:offset + 3 * used].reshape(used, 3)
+                offset += 3 * c
+        bbox = out["bbox"]
+        kp[:, :, 0] *= bbox[:, 2, None]
+        kp[:, :, 0] += bbox[:, 0, None]
+        kp[:, :, 1] *= bbox[:, 3, None]
+        kp[:, :, 1] += bbox[:, 1, None]
+
+
+def extract_roi(buffer, extractor, copy=True):
+    """Structured array of the detections on a buffer (empty without the hailo module)"""
+    if not HAVE_HAILO:
+        return extractor.extract([], copy=copy)
+    roi = hailo.get_roi_from_buffer(buffer)
+    return extractor.extract(roi if roi is not None else [], copy=copy)
+
+
+# -------- vectorized analytics --------
+
+def joint_angles(keypoints, triplets=COCO_ANGLES, min_confidence=0.0):
+    """Angle (degrees) at b of every (a, b, c) triplet for all objects -> (objects, triplets) array
+    NaN where one of the three keypoints is below min_confidence."""
+    idx = _triplet_index(triplets)
+    p = keypoints[:, idx, :]                  # (objects, triplets, 3 points, x/y/conf)
+    v1 = p[:, :, 0, :2] - p[:, :, 1, :2]
+    v2 = p[:, :, 2, :2] - p[:, :, 1, :2]
+    dot = np.einsum("ntk,ntk->nt", v1, v2)
+    norm = np.sqrt(np.einsum("ntk,ntk->nt", v1, v1) * np.einsum("ntk,ntk->nt", v2, v2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        angles = np.degrees(np.arccos(np.clip(dot / norm, -1.0, 1.0)))
+    if min_confidence > 0:
+        angles[(p[..., 2] < min_confidence).any(-1)] = np.nan
+    return angles
+
+
+_TRIPLET_CACHE = {}
+
+
+def _triplet_index(triplets):
+    key = tuple(triplets.values()) if isinstance(triplets, dict) else tuple(map(tuple, triplets))
+    idx = _TRIPLET_CACHE.get(key)
+    if idx is None:
+        idx = _TRIPLET_CACHE[key] = np.array(key, dtype=np.intp)
+    return idx
+
+
+def count_by_class(objects, num_classes=None):
+    """Objects per class_id -> array indexed by class_id (class -1, no class, is not counted)"""
+    classes = objects["class_id"]
+    return np.bincount(classes[classes >= 0], minlength=num_classes or 0)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+rtcp_abr.py - Adaptive encoder bitrate from RTCP receiver reports (rtpbin mode of the senders)
+The sender's RTP goes through rtpbin, the receiver's rtpbin returns RTCP receiver reports, and the
+report blocks (fraction lost, jitter, RTT) drive a loss-based AIMD controller that sets the encoder
+bitrate (and optionally shortens key-int-max while the link is lossy) at runtime. Encoders whose
+keyframe interval is not mutable in PLAYING (x264enc key-int-max, openh264enc gop-size) get an
+upstream force-key-unit event instead when the link turns lossy.
+
+Ports (GStreamer rtpbin convention): RTP -> port, RTCP SR -> port+1, RTCP RR back <- port+5.
+A local "identity drop-probability=P" stage in front of the RTP udpsink simulates packet loss
+on loopback.
+
+Usage (in a sender):
+  from rtcp_abr import BitrateController, RtcpAbr, rtpbin_send_section, add_abr_arguments
+  pipeline_str = "... ! rtph264pay pt=96 ! " + rtpbin_send_section(host, port, drop_probability=0.05)
+  abr = RtcpAbr(pipeline.get_by_name("rtpbin"), pipeline.get_by_name("encoder"),
+                BitrateController(2000, min_kbps=300, max_kbps=4000)).start()
+"""
+
+import threading
+
+
+class BitrateController:
+    """Loss-based AIMD: cut on loss, probe upward slowly on clean reports"""
+
+    def __init__(self, start_kbps, min_kbps=300, max_kbps=None, loss_high=0.05, loss_low=0.01,
+                 decrease=0.7, increase=0.08, jitter_high_ms=50.0, key_int=None, min_key_int=None):
+        self.bitrate_kbps = start_kbps
+        self.min_kbps = min_kbps
+        self.max_kbps = max_kbps or start_kbps
+        self.loss_high = loss_high
+        self.loss_low = loss_low
+        self.decrease = decrease
+        self.increase = increase
+        self.jitter_high_ms = jitter_high_ms
+
+        # Optional keyframe interval adaptation: shorter GOP while lossy, back to key_int when clean
+        self.key_int = key_int
+        self.min_key_int = min_key_int
+        self.current_key_int = key_int      # wanted by the controller
+        self.applied_key_int = key_int      # actually set on the encoder (RtcpAbr)
+        self.forced_keyframes = 0
+
+        # Last report and counters (exposed through state())
+        self.loss = 0.0
+        self.jitter_ms = 0.0
+        self.rtt_ms = 0.0
+        self.reports = 0
+        self.decreases = 0
+        self.increases = 0
+        self.action = "hold"
+
+    def update(self, loss, jitter_ms, rtt_ms=0.0):
+        """Feed one receiver report; returns True if bitrate or key-int changed"""
+        self.loss, self.jitter_ms, self.rtt_ms = loss, jitter_ms, rtt_ms
+        self.reports += 1
+        old = (self.bitrate_kbps, self.current_key_int)
+
+        if loss > self.loss_high:
+            # Scale the cut with the loss itself, never below decrease
+            factor = max(self.decrease, 1.0 - loss)
+            self.bitrate_kbps = max(self.min_kbps, int(self.bitrate_kbps * factor))
+            self.action = "decrease"
+            self.decreases += 1
+            if self.min_key_int:
+                self.current_key_int = self.min_key_int
+        elif loss < self.loss_low and jitter_ms < self.jitter_high_ms:
+            step = max(50, int(self.bitrate_kbps * self.increase))
+            self.bitrate_kbps = min(self.max_kbps, self.bitrate_kbps + step)
+            self.action = "increase" if self.bitrate_kbps != old[0] else "hold"
+            self.increases += int(self.bitrate_kbps != old[0])
+            if self.key_int:
+                self.current_key_int = self.key_int
+        else:
+            self.action = "hold"
+
+        return (self.bitrate_kbps, self.current_key_int) != old
+
+    def state(self):
+        """Controller state for logging"""
+        return {
+            "bitrate_kbps": self.bitrate_kbps,
+            "key_int": self.applied_key_int,
+            "forced_keyframes": self.forced_keyframes,
+            "loss": round(self.loss, 4),
+            "jitter_ms": round(self.jitter_ms, 2),
+            "rtt_ms": round(self.rtt_ms, 2),
+            "action": self.action,
+            "reports": self.reports,
+            "decreases": self.decreases,
+            "increases": self.increases,
+        }
+
+    def summary(self):
+        return (f"ABR: {self.bitrate_kbps} kbit/s (range {self.min_kbps}-{self.max_kbps}), "
+                f"{self.reports} reports, {self.decreases} decreases, {self.increases} increases, "
+                f"last loss {self.loss * 100:.1f}%, jitter {self.jitter_ms:.1f} ms, RTT {self.rtt_ms:.1f} ms")
+
+
+def set_encoder_bitrate(encoder, kbps):
+    """Apply a bitrate to the common H.264 encoders while PLAYING"""
+    factory = encoder.get_factory().get_name()
+    if factory == "x264enc":
+        encoder.set_property("bitrate", int(kbps))
+    elif factory == "openh264enc":
+        encoder.set_property("bitrate", int(kbps) * 1000)
+    elif factory == "v4l2h264enc":
+        from gi.repository import Gst
+        controls = Gst.Structure.new_from_string(f"controls,video_bitrate={int(kbps) * 1000}")
+        encoder.set_property("extra-controls", controls)
+    else:
+        return False
+    return True
+
+
+KEY_INT_PROPERTIES = {"x264enc": "key-int-max", "openh264enc": "gop-size"}
+
+
+def set_encoder_key_int(encoder, key_int):
+    """Keyframe interval, only where the property is mutable while PLAYING; False if nothing was set"""
+    from gi.repository import Gst
+    name = KEY_INT_PROPERTIES.get(encoder.get_factory().get_name())
+    spec = encoder.find_property(name) if name else None
+    if spec is None or not spec.flags & Gst.PARAM_MUTABLE_PLAYING:
+        return False
+    encoder.set_property(name, int(key_int))
+    return True
+
+
+def force_key_unit(encoder):
+    """Ask the encoder for a keyframe now (upstream force-key-unit event on its src pad)"""
+    import gi
+    gi.require_version("GstVideo", "1.0")
+    from gi.repository import Gst, GstVideo
+    event = GstVideo.video_event_new_upstream_force_key_unit(Gst.CLOCK_TIME_NONE, True, 0)
+    return encoder.get_static_pad("src").send_event(event)
+
+
+def named_encoder(fragment, name="encoder"):
+    """Give the first element of an encoder fragment a name (for get_by_name)"""
+    factory, _, rest = fragment.strip().partition(" ")
+    return f"{factory} name={name} {rest}".strip()
+
+
+def rtpbin_send_section(host, port, rtcp_port=None, rtcp_return_port=None, drop_probability=0.0):
+    """Tail of a sender pipeline after the RTP payloader: rtpbin session 0 with RTCP both ways"""
+    rtcp_port = rtcp_port or port + 1
+    rtcp_return_port = rtcp_return_port or port + 5
+    netsim = ""
+    if drop_probability > 0:
+        netsim = f"identity name=netsim drop-probability={drop_probability} ! "
+    return f"""
+        rtpbin.send_rtp_sink_0
+        rtpbin name=rtpbin
+        rtpbin.send_rtp_src_0 ! {netsim}udpsink host={host} port={port} sync=false
+        rtpbin.send_rtcp_src_0 ! udpsink host={host} port={rtcp_port} sync=false async=false
+        udpsrc port={rtcp_return_port} ! rtpbin.recv_rtcp_sink_0
+        """
+
+
+class RtcpAbr:
+    """Reads the report blocks received for our sender SSRC and applies the controller's decisions"""
+
+    def __init__(self, rtpbin, encoder, controller, session_id=0, clock_rate=90000, on_update=None):
+        self.rtpbin = rtpbin
+        self.encoder = encoder
+        self.controller = controller
+        self.session_id = session_id
+        self.clock_rate = clock_rate
+        self.on_update = on_update
+        self.session = None
+        self._last_rb = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.session = self.rtpbin.emit("get-internal-session", self.session_id)
+        # Emitted after an RTCP packet from the receiver was processed (report blocks are in the stats)
+        self.rtpbin.connect("on-ssrc-active", self.on_ssrc_active)
+        return self
+
+    def on_ssrc_active(self, rtpbin, session_id, ssrc):
+        """Called on the RTCP thread whenever the receiver's RTCP arrives"""
+        if session_id != self.session_id:
+            return
+        report = self.read_report()
+        if report is None:
+            return
+        with self._lock:
+            previous_key_int = self.controller.current_key_int
+            changed = self.controller.update(*report)
+            if changed:
+                set_encoder_bitrate(self.encoder, self.controller.bitrate_kbps)
+                self.apply_key_int(previous_key_int)
+            if self.on_update is not None:
+                self.on_update(self.controller.state(), changed)
+
+    def apply_key_int(self, previous):
+        """Set the controller's keyframe interval, or force one keyframe when entering the lossy state"""
+        target = self.controller.current_key_int
+        if not target or target == previous:
+            return
+        if set_encoder_key_int(self.encoder, target):
+            self.controller.applied_key_int = target
+        elif previous and target < previous and force_key_unit(self.encoder):
+            self.controller.forced_keyframes += 1
+
+    def read_report(self):
+        """(fraction lost, jitter ms, RTT ms) from a new report block for our SSRC, else None"""
+        for source in self.session.get_property("sources"):
+            stats = source.get_property("stats")
+            if stats is None:
+                continue
+            ok_internal, internal = stats.get_boolean("internal")
+            ok_rb, have_rb = stats.get_boolean("have-rb")
+            if not (ok_internal and internal and ok_rb and have_rb):
+                continue
+            _, fraction = stats.get_uint("rb-fractionlost")
+            _, jitter = stats.get_uint("rb-jitter")
+            _, rtt = stats.get_uint("rb-round-trip")
+            _, packets_lost = stats.get_int("rb-packetslost")
+            _, exthighestseq = stats.get_uint("rb-exthighestseq")
+
+            rb = (fraction, jitter, packets_lost, exthighestseq)
+            if rb == self._last_rb:
+                return None  # RTCP packet without a new report block for us (e.g. SDES only)
+            self._last_rb = rb
+            return (fraction / 256.0,
+                    jitter / self.clock_rate * 1000.0,
+                    rtt / 65536.0 * 1000.0)
+        return None
+
+
+def add_abr_arguments(parser):
+    """Standard --rtcp options for the senders"""
+    parser.add_argument("--rtcp", action="store_true",
+                        help="Send through rtpbin and adapt the encoder bitrate to RTCP receiver reports "
+                             "(RTCP to port+1, reports back on port+5)")
+    parser.add_argument("--abr-min-kbps", type=int, default=300, help="--rtcp: lowest bitrate (default: 300)")
+    parser.add_argument("--abr-max-kbps", type=int, default=None,
+                        help="--rtcp: highest bitrate (default: the configured bitrate)")
+    parser.add_argument("--abr-min-key-int", type=int, default=None,
+                        help="--rtcp: keyframe interval while the link is lossy; encoders that cannot change it "
+                             "while playing get one forced keyframe instead (default: unchanged)")
+    parser.add_argument("--netsim-drop", type=float, default=0.0,
+                        help="--rtcp: drop this fraction of RTP packets before udpsink (loopback testing)")
+
+
+def controller_from_args(args, start_kbps, key_int=None):
+    return BitrateController(start_kbps, min_kbps=args.abr_min_kbps,
+                             max_kbps=args.abr_max_kbps or start_kbps,
+                             key_int=key_int if args.abr_min_key_int else None,
+                             min_key_int=args.abr_min_key_int)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+stage_trace.py - Per-element latency tracing with timestamping pad probes, matched by PTS
+Every top-level element with sink and src pads gets a probe on both sides; the time between a
+buffer entering (sink pad) and leaving (src pad) with the same PTS is that element's latency,
+including asynchronous ones like hailonet. Queues are traced too (their time is waiting time).
+tee and videorate are skipped: videorate rewrites PTS, so its buffers could never be matched.
+Sinks have no src pad: when the queue in front of a sink already holds the next buffer, the time
+until that queue pushes it is the sink's processing time for the current one (idle gaps are skipped).
+
+Per element: rolling p50/p95/p99/max and a log-bucket histogram, printed live and at shutdown,
+optionally as JSON.
+
+Usage (in a pipeline script):
+  from stage_trace import StageTracer, add_trace_arguments
+  tracer = StageTracer(pipeline).attach()
+  GLib.timeout_add_seconds(5, tracer.print_table)
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from gi.repository import GLib, Gst
+
+BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+MAX_PENDING = 256
+SKIP_FACTORIES = ("tee", "videorate")
+
+
+def _factory_name(element):
+    factory = element.get_factory()
+    return factory.get_name() if factory is not None else ""
+
+
+class ElementTrace:
+    """Pending entry times and the latency window for one element"""
+
+    def __init__(self, element, order, window):
+        self.element = element
+        self.name = element.get_name()
+        self.factory = _factory_name(element)
+        self.order = order
+        # Entered and left on different streaming threads for queues and hailonet
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.samples.append(ms)
+        self.count += 1
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.histogram[i] += 1
+
+    def stats(self, percentiles=(50, 95, 99)):
+        if not self.samples:
+            return None
+        arr = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        row = {f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(arr, percentiles))}
+        row["mean"] = float(arr.mean())
+        row["max"] = float(arr.max())
+        row["n"] = self.count
+        return row
+
+
+class StageTracer:
+    """Attaches the probes and aggregates per-element latencies"""
+
+    def __init__(self, pipeline, window=1000, include_queues=True, elements=None):
+        self.pipeline = pipeline
+        self.window = window
+        self.include_queues = include_queues
+        self.only = set(elements) if elements else None
+        self.traces = []
+        self.start_time = time.time()
+        self._report_id = None
+
+    def attach(self):
+        # Data-flow order: iterate_sorted() yields sinks first
+        elements = [e for e in self.pipeline.iterate_sorted()][::-1]
+        for order, element in enumerate(elements):
+            name, factory = element.get_name(), _factory_name(element)
+            if self.only is not None and name not in self.only:
+                continue
+            if factory in SKIP_FACTORIES or (factory == "queue" and not self.include_queues):
+                continue
+            sink_pads = list(element.iterate_sink_pads())
+            src_pads = list(element.iterate_src_pads())
+            if not sink_pads:
+                continue  # sources
+            trace = ElementTrace(element, order, self.window)
+            if src_pads:
+                for pad in sink_pads:
+                    pad.add_probe(Gst.PadProbeType.BUFFER, self._on_enter, trace)
+                for pad in src_pads:
+                    pad.add_probe(Gst.PadProbeType.BUFFER, self._on_leave, trace)
+            elif not self._attach_sink(trace, sink_pads[0]):
+                continue
+            self.traces.append(trace)
+        return self
+
+    # -------- probes (streaming threads) --------
+
+    @staticmethod
+    def _on_enter(pad, info, trace):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            with trace.lock:
+                trace.pending[buffer.pts] = time.perf_counter()
+                if len(trace.pending) > MAX_PENDING:
+                    # Buffers dropped inside the element (leaky paths)
+                    trace.pending.popitem(last=False)
+        return Gst.PadProbeReturn.OK
+
+    @staticmethod
+    def _on_leave(pad, info, trace):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            with trace.lock:
+                t0 = trace.pending.pop(buffer.pts, None)
+            if t0 is not None:
+                trace.add((time.perf_counter() - t0) * 1000.0)
+        return Gst.PadProbeReturn.OK
+
+    def _attach_sink(self, trace, sink_pad):
+        """Sink time = arrival of a buffer -> its upstream queue pushing the next one (if already queued)"""
+        peer = sink_pad.get_peer()
+        upstream = peer.get_parent_element() if peer is not None else None
+        if upstream is None or _factory_name(upstream) != "queue":
+            return False
+        state = {"t": None}
+
+        def on_arrive(pad, info):
+            # Only time this buffer if the next one is already waiting in the queue
+            backlog = upstream.get_property("current-level-buffers") > 0
+            state["t"] = time.perf_counter() if backlog else None
+            return Gst.PadProbeReturn.OK
+
+        def on_next_push(pad, info):
+            if state["t"] is not None:
+                trace.add((time.perf_counter() - state["t"]) * 1000.0)
+                state["t"] = None
+            return Gst.PadProbeReturn.OK
+
+        sink_pad.add_probe(Gst.PadProbeType.BUFFER, on_arrive)
+        peer.add_probe(Gst.PadProbeType.BUFFER, on_next_push)
+        return True
+
+    # -------- output --------
+
+    def start_reports(self, interval_s):
+        if interval_s:
+            self._report_id = GLib.timeout_add_seconds(interval_s, self.print_table)
+        return self
+
+    def stop(self):
+        if self._report_id is not None:
+            GLib.source_remove(self._report_id)
+            self._report_id = None
+
+    def table_lines(self):
+        lines = [f"  {'element':<30} {'type':<14} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>8}  {'n':>6}  (ms)"]
+        for trace in self.traces:
+            row = trace.stats()
+            if row is None:
+                continue
+            lines.append(f"  {trace.name:<30} {trace.factory:<14} {row['p50']:7.2f} {row['p95']:7.2f} "
+                         f"{row['p99']:7.2f} {row['max']:8.2f}  {row['n']:>6}")
+        return lines
+
+    def histogram_lines(self, width=40):
+        lines = []
+        edges = [f"<={b:g}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]:g}"]
+        for trace in self.traces:
+            total = sum(trace.histogram)
+            if not total:
+                continue
+            lines.append(f"  {trace.name} ({trace.factory}), {total} buffers:")
+            for edge, n in zip(edges, trace.histogram):
+                if n:
+                    lines.append(f"    {edge:>7} ms {'#' * max(1, int(n / total * width)):<{width}} {n}")
+        return lines
+
+    def print_table(self):
+        print(f"[TRACE] per-element latency over the last {self.window} buffers")
+        for line in self.table_lines():
+            print(line)
+        return True
+
+    def print_final(self, histograms=True):
+        print("\n" + "=" * 70)
+        print(f"⏱️  PER-ELEMENT LATENCY ({time.time() - self.start_time:.1f} s)")
+        print("=" * 70)
+        for line in self.table_lines():
+            print(line)
+        if histograms:
+            print("-" * 70)
+            for line in self.histogram_lines():
+                print(line)
+        print("=" * 70)
+
+    def report(self):
+        return {
+            "buckets_ms": list(BUCKETS_MS),
+            "elements": [
+                {"name": t.name, "factory": t.factory, "order": t.order, "stats": t.stats(),
+                 "histogram": t.histogram}
+                for t in self.traces
+            ],
+        }
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"[TRACE] report written to {path}")
+
+
+def add_trace_arguments(parser):
+    """Standard --trace options"""
+    parser.add_argument("--trace", action="store_true",
+                        help="Per-element latency tracing (pad probes matched by PTS) with p50/p95/p99")
+    parser.add_argument("--trace-interval", type=int, default=5,
+                        help="--trace: seconds between live tables, 0 = final only (default: 5)")
+    parser.add_argument("--trace-no-queues", action="store_true",
+                        help="--trace: skip queues (waiting time) and report processing elements only")
+    parser.add_argument("--trace-report", default=None, help="--trace: write a JSON report here at shutdown")
+
+
+def tracer_from_args(args, pipeline):
+    if not args.trace:
+        return None
+    return StageTracer(pipeline, include_queues=not args.trace_no_queues).attach()
+
+
+def finish_tracer(tracer, args):
+    if tracer is None:
+        return
+    tracer.stop()
+    tracer.print_final()
+    if args.trace_report:
+        tracer.write_report(args.trace_report)
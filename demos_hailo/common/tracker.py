@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+tracker.py - Multi-class ByteTrack-style tracker on roi_arrays object arrays, all tracks in fixed arrays
+Every track lives in a slot of preallocated NumPy arrays (state, Kalman mean / covariance, counters and a
+ring buffer of its last --track-history boxes), so memory is fixed by --max-tracks x --track-history no
+matter how long the pipeline runs. Kalman predict / update run on all slots at once; association builds
+one IoU matrix per stage and class (tracks x detections of that class) and solves it with the Hungarian
+algorithm (scipy) or a greedy highest-IoU-first pass.
+
+ByteTrack association per frame:
+  1. tracked + lost tracks   vs high-score detections (>= --track-high)
+  2. still unmatched tracked vs low-score detections  (>= --track-low), so occluded objects keep their ID
+  3. tentative tracks        vs the remaining high-score detections
+  unmatched high-score detections (>= --track-new) open tentative tracks, confirmed after --track-min-hits
+  matches; tracks lost for more than --track-buffer frames free their slot.
+
+Usage:
+  from tracker import ByteTracker
+  tracker = ByteTracker(max_tracks=512, history=32)
+  objects = tracker.update(objects)          # same rows, track_id set (-1 = not confirmed)
+  track = tracker.track(objects["track_id"][0]); frames, boxes = track.history()
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+from np_postprocess import box_iou
+from roi_arrays import HAVE_HAILO, RoiExtractor, object_dtype
+
+if HAVE_HAILO:
+    import hailo
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    HAVE_SCIPY = True
+except ImportError:
+    HAVE_SCIPY = False
+
+try:
+    from gi.repository import GLib
+    HAVE_GLIB = True
+except ImportError:
+    HAVE_GLIB = False
+
+# --tracker choices: none (no tracking), hailo (hailotracker element), python (this module)
+TRACKERS = ("none", "hailo", "python")
+
+# slot states
+FREE, TENTATIVE, TRACKED, LOST = 0, 1, 2, 3
+STATE_NAMES = {TENTATIVE: "tentative", TRACKED: "tracked", LOST: "lost"}
+
+# Kalman noise relative to the box size (w for x / w, h for y / h), as in ByteTrack / BoT-SORT
+STD_POSITION = 1.0 / 20
+STD_VELOCITY = 1.0 / 160
+
+
+def assign(iou, min_iou):
+    """Rows / columns of the matched pairs with IoU >= min_iou (Hungarian with scipy, greedy otherwise)"""
+    if not iou.size:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    if HAVE_SCIPY:
+        rows, cols = linear_sum_assignment(-iou)
+        ok = iou[rows, cols] >= min_iou
+        return rows[ok], cols[ok]
+    rows, cols = np.nonzero(iou >= min_iou)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_r = np.zeros(iou.shape[0], dtype=bool)
+    used_c = np.zeros(iou.shape[1], dtype=bool)
+    out_r, out_c = [], []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if used_r[r] or used_c[c]:
+            continue
+        used_r[r] = used_c[c] = True
+        out_r.append(r)
+        out_c.append(c)
+    return np.array(out_r, dtype=np.intp), np.array(out_c, dtype=np.intp)
+
+
+class TrackView:
+    """Read-only handle on one slot (valid until the slot is freed)"""
+
+    __slots__ = ("_tracker", "slot")
+
+    def __init__(self, tracker, slot):
+        self._tracker = tracker
+        self.slot = slot
+
+    @property
+    def track_id(self):
+        return int(self._tracker.track_id[self.slot])
+
+    @property
+    def class_id(self):
+        return int(self._tracker.class_id[self.slot])
+
+    @property
+    def state(self):
+        return STATE_NAMES.get(int(self._tracker.state[self.slot]), "free")
+
+    @property
+    def box(self):
+        """Current (xmin, ymin, w, h) from the Kalman state"""
+        cx, cy, w, h = self._tracker.mean[self.slot, :4]
+        return (float(cx - w / 2), float(cy - h / 2), float(w), float(h))
+
+    @property
+    def hits(self):
+        return int(self._tracker.hits[self.slot])
+
+    def history(self):
+        """(frames, boxes) of the last matched detections, oldest first"""
+        return self._tracker.history_of(self.slot)
+
+
+class ByteTracker:
+    """ByteTrack association over every class at once; fixed-capacity array-backed track state"""
+
+    __slots__ = (
+        "max_tracks", "history_len", "high", "low", "new", "match_iou", "low_iou", "tentative_iou",
+        "min_hits", "buffer", "frame", "next_id", "created", "overflow",
+        "state", "track_id", "class_id", "score", "mean", "cov", "hits", "misses", "start",
+        "hist_box", "hist_frame", "hist_count", "update_ms",
+    )
+
+    def __init__(self, max_tracks=512, history=32, high=0.5, low=0.1, new=0.6, match_iou=0.2, low_iou=0.5,
+                 tentative_iou=0.3, min_hits=2, buffer=30, window=1000):
+        self.max_tracks = max_tracks
+        self.history_len = history
+        self.high = high                    # first-stage / new-track detection scores
+        self.low = low
+        self.new = new
+        self.match_iou = match_iou          # minimum IoU per association stage
+        self.low_iou = low_iou
+        self.tentative_iou = tentative_iou
+        self.min_hits = min_hits            # matches before a track gets reported
+        self.buffer = buffer                # frames a lost track is kept for re-identification
+
+        self.frame = 0
+        self.next_id = 1
+        self.created = 0
+        self.overflow = 0                   # detections that found no free slot
+
+        n = max_tracks
+        self.state = np.zeros(n, dtype=np.uint8)
+        self.track_id = np.full(n, -1, dtype=np.int32)
+        self.class_id = np.zeros(n, dtype=np.int16)
+        self.score = np.zeros(n, dtype=np.float32)
+        self.mean = np.zeros((n, 8), dtype=np.float32)      # cx, cy, w, h and their velocities
+        self.cov = np.zeros((n, 4, 3), dtype=np.float32)    # per coordinate: var(pos), cov(pos, vel), var(vel)
+        self.hits = np.zeros(n, dtype=np.int32)
+        self.misses = np.zeros(n, dtype=np.int32)
+        self.start = np.zeros(n, dtype=np.int32)
+        self.hist_box = np.zeros((n, history, 4), dtype=np.float32)
+        self.hist_frame = np.zeros((n, history), dtype=np.int32)
+        self.hist_count = np.zeros(n, dtype=np.int32)
+        self.update_ms = deque(maxlen=window)
+
+    @property
+    def nbytes(self):
+        """Memory held by the track state (fixed at construction)"""
+        return sum(getattr(self, name).nbytes for name in (
+            "state", "track_id", "class_id", "score", "mean", "cov", "hits", "misses", "start",
+            "hist_box", "hist_frame", "hist_count"))
+
+    # -------- Kalman (all slots in one go) --------
+
+    @staticmethod
+    def _scale(wh):
+        """Noise scale per coordinate: w for x / w, h for y / h"""
+        return np.concatenate([wh, wh], axis=1)
+
+    def _predict(self, slots):
+        m, c = self.mean[slots], self.cov[slots]
+        s = self._scale(np.abs(m[:, 2:4]))
+        q_pos, q_vel = (STD_POSITION * s) ** 2, (STD_VELOCITY * s) ** 2
+        pp, pv, vv = c[:, :, 0], c[:, :, 1], c[:, :, 2]
+        m[:, :4] += m[:, 4:]
+        c[:, :, 0] = pp + 2 * pv + vv + q_pos
+        c[:, :, 1] = pv + vv
+        c[:, :, 2] = vv + q_vel
+        self.mean[slots], self.cov[slots] = m, c
+
+    def _update(self, slots, boxes):
+        """Measurement (cx, cy, w, h) for each slot"""
+        m, c = self.mean[slots], self.cov[slots]
+        r = (STD_POSITION * self._scale(boxes[:, 2:4])) ** 2
+        pp, pv, vv = c[:, :, 0], c[:, :, 1], c[:, :, 2]
+        innov = boxes - m[:, :4]
+        denom = pp + r
+        k_pos, k_vel = pp / denom, pv / denom
+        m[:, :4] += k_pos * innov
+        m[:, 4:] += k_vel * innov
+        c[:, :, 2] = vv - k_vel * pv
+        c[:, :, 1] = (1 - k_pos) * pv
+        c[:, :, 0] = (1 - k_pos) * pp
+        self.mean[slots], self.cov[slots] = m, c
+
+    def _init(self, slots, boxes):
+        s = self._scale(boxes[:, 2:4])
+        self.mean[slots, :4] = boxes
+        self.mean[slots, 4:] = 0.0
+        self.cov[slots, :, 0] = (2 * STD_POSITION * s) ** 2
+        self.cov[slots, :, 1] = 0.0
+        self.cov[slots, :, 2] = (10 * STD_VELOCITY * s) ** 2
+
+    # -------- update --------
+
+    def _predicted_boxes(self, slots):
+        """xmin, ymin, w, h of the predicted state"""
+        m = self.mean[slots, :4]
+        return np.concatenate([m[:, :2] - m[:, 2:] / 2, m[:, 2:]], axis=1)
+
+    def _match(self, slots, det_idx, det_xywh, det_class, min_iou):
+        """Matched (slots, detection indices); one IoU block per class, pairs across classes never match"""
+        if not len(slots) or not len(det_idx):
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        boxes = self._predicted_boxes(slots)
+        track_class, cls = self.class_id[slots], det_class[det_idx]
+        matched_t, matched_d = [], []
+        for c in np.intersect1d(track_class, cls):
+            t = np.flatnonzero(track_class == c)
+            d = np.flatnonzero(cls == c)
+            rows, cols = assign(box_iou(boxes[t], det_xywh[det_idx[d]]), min_iou)
+            matched_t.append(slots[t[rows]])
+            matched_d.append(det_idx[d[cols]])
+        if not matched_t:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(matched_t), np.concatenate(matched_d)
+
+    def update(self, objects):
+        """One frame of detections (roi_arrays.object_dtype) -> copy with track_id set (-1 = not confirmed)"""
+        t0 = time.perf_counter()
+        self.frame += 1
+        out = objects.copy()
+        out["track_id"] = -1
+        n = len(objects)
+        xywh = objects["bbox"].astype(np.float32).reshape(n, 4)
+        centre = np.concatenate([xywh[:, :2] + xywh[:, 2:] / 2, xywh[:, 2:]], axis=1)
+        classes = objects["class_id"]
+        scores = objects["confidence"]
+
+        live = np.flatnonzero(self.state != FREE)
+        self._predict(live)
+
+        high = np.flatnonzero(scores >= self.high)
+        low = np.flatnonzero((scores >= self.low) & (scores < self.high))
+
+        # 1. confirmed (tracked or lost) tracks vs high-score detections
+        confirmed = live[self.state[live] >= TRACKED]
+        t1, d1 = self._match(confirmed, high, xywh, classes, self.match_iou)
+        # 2. tracked tracks left over vs low-score detections
+        rest = np.setdiff1d(confirmed, t1, assume_unique=True)
+        rest = rest[self.state[rest] == TRACKED]
+        t2, d2 = self._match(rest, low, xywh, classes, self.low_iou)
+        # 3. tentative tracks vs high-score detections left over
+        tentative = live[self.state[live] == TENTATIVE]
+        high_left = np.setdiff1d(high, d1, assume_unique=True)
+        t3, d3 = self._match(tentative, high_left, xywh, classes, self.tentative_iou)
+
+        matched_t = np.concatenate([t1, t2, t3])
+        matched_d = np.concatenate([d1, d2, d3])
+        self._update(matched_t, centre[matched_d])
+        self.hits[matched_t] += 1
+        self.misses[matched_t] = 0
+        self.score[matched_t] = scores[matched_d]
+        confirm = self.hits[matched_t] >= self.min_hits
+        self.state[matched_t[confirm]] = TRACKED
+        self.state[matched_t[~confirm]] = TENTATIVE
+        self._record(matched_t, xywh[matched_d])
+        reported = self.state[matched_t] == TRACKED
+        out["track_id"][matched_d[reported]] = self.track_id[matched_t[reported]]
+
+        # Unmatched: tracked -> lost, tentative -> removed, lost beyond the buffer -> removed
+        unmatched = np.setdiff1d(live, matched_t, assume_unique=True)
+        self.misses[unmatched] += 1
+        states = self.state[unmatched]
+        self.state[unmatched[states == TRACKED]] = LOST
+        self._free(unmatched[states == TENTATIVE])
+        self._free(unmatched[(states >= TRACKED) & (self.misses[unmatched] > self.buffer)])
+
+        # New tentative tracks (confirmed at once on the first frame, as ByteTrack does)
+        new = np.setdiff1d(high_left, d3, assume_unique=True)
+        new = new[scores[new] >= self.new]
+        if len(new):
+            self._open(new, centre, xywh, classes, scores, out)
+
+        self.update_ms.append((time.perf_counter() - t0) * 1000.0)
+        return out
+
+    def _open(self, det, centre, xywh, classes, scores, out):
+        free = np.flatnonzero(self.state == FREE)
+        if len(free) < len(det):
+            # Out of slots: recycle the longest-lost tracks, then give up on the lowest scores
+            lost = np.flatnonzero(self.state == LOST)
+            lost = lost[np.argsort(-self.misses[lost], kind="stable")][:len(det) - len(free)]
+            self._free(lost)
+            free = np.flatnonzero(self.state == FREE)
+            if len(free) < len(det):
+                self.overflow += len(det) - len(free)
+                det = det[np.argsort(-scores[det], kind="stable")][:len(free)]
+        slots = free[:len(det)]
+        ids = np.arange(self.next_id, self.next_id + len(slots), dtype=np.int32)
+        self.next_id += len(slots)
+        self.created += len(slots)
+        first = self.frame == 1 or self.min_hits <= 1
+        self.state[slots] = TRACKED if first else TENTATIVE
+        self.track_id[slots] = ids
+        self.class_id[slots] = classes[det]
+        self.score[slots] = scores[det]
+        self.hits[slots] = 1
+        self.misses[slots] = 0
+        self.start[slots] = self.frame
+        self.hist_count[slots] = 0
+        self._init(slots, centre[det])
+        self._record(slots, xywh[det])
+        if first:
+            out["track_id"][det] = ids
+
+    def _free(self, slots):
+        self.state[slots] = FREE
+        self.track_id[slots] = -1
+
+    def _record(self, slots, boxes):
+        """Append to each slot's ring buffer of matched boxes"""
+        pos = self.hist_count[slots] % self.history_len
+        self.hist_box[slots, pos] = boxes
+        self.hist_frame[slots, pos] = self.frame
+        self.hist_count[slots] += 1
+
+    # -------- queries --------
+
+    def history_of(self, slot):
+        count = int(self.hist_count[slot])
+        n = min(count, self.history_len)
+        order = (np.arange(count - n, count) % self.history_len)
+        return self.hist_frame[slot, order].copy(), self.hist_box[slot, order].copy()
+
+    def track(self, track_id):
+        """TrackView of a live track, or None"""
+        slots = np.flatnonzero((self.track_id == track_id) & (self.state != FREE))
+        return TrackView(self, int(slots[0])) if len(slots) else None
+
+    def tracks(self, include_lost=False):
+        """Current tracks as an object_dtype array (Kalman boxes)"""
+        wanted = (self.state == TRACKED) | (include_lost & (self.state == LOST))
+        slots = np.flatnonzero(wanted)
+        out = np.zeros(len(slots), dtype=object_dtype())
+        out["track_id"] = self.track_id[slots]
+        out["class_id"] = self.class_id[slots]
+        out["confidence"] = self.score[slots]
+        out["bbox"] = self._predicted_boxes(slots)
+        return out
+
+    def counts(self):
+        """Slots per state"""
+        states = np.bincount(self.state, minlength=4)
+        return {name: int(states[code]) for code, name in STATE_NAMES.items()}
+
+    def report(self):
+        run = np.fromiter(self.update_ms, dtype=np.float64) if self.update_ms else None
+        return {
+            "frames": self.frame,
+            "tracks": self.counts(),
+            "created": self.created,
+            "overflow": self.overflow,
+            "max_tracks": self.max_tracks,
+            "history": self.history_len,
+            "state_bytes": self.nbytes,
+            "assignment": "hungarian" if HAVE_SCIPY else "greedy",
+            "update_ms": None if run is None else {
+                "p50": float(np.percentile(run, 50)), "p95": float(np.percentile(run, 95)), "max": float(run.max())},
+        }
+
+    def status_line(self):
+        r = self.report()
+        t = r["tracks"]
+        line = (f"[TRACK] {t['tracked']} tracked, {t['lost']} lost, {t['tentative']} tentative, "
+                f"{r['created']} created")
+        if r["update_ms"]:
+            line += f", update p50 {r['update_ms']['p50']:.2f} p95 {r['update_ms']['p95']:.2f} ms"
+        if r["overflow"]:
+            line += f", {r['overflow']} detections over --max-tracks"
+        return line
+
+
+# -------- pipeline stage --------
+
+class TrackerStage:
+    """identity (tracker_callback) in place of hailotracker: tracks every class, IDs as HailoUniqueID"""
+
+    def __init__(self, tracker, report_interval=10):
+        self.tracker = tracker
+        self.extractor = RoiExtractor(num_keypoints=0)
+        self.report_interval = report_interval
+        self._report_id = None
+
+    @classmethod
+    def from_pipeline(cls, pipeline, identity="tracker_callback", **kw):
+        stage = cls(**kw)
+        element = pipeline.get_by_name(identity)
+        element.set_property("signal-handoffs", True)
+        element.connect("handoff", stage._on_handoff)
+        return stage
+
+    def _on_handoff(self, identity, buffer):
+        roi = hailo.get_roi_from_buffer(buffer)
+        if roi is None:
+            return
+        detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
+        tracked = self.tracker.update(self.extractor.extract(detections))
+        attach_ids(detections, tracked["track_id"])
+
+    def start_reports(self):
+        if self.report_interval and HAVE_GLIB:
+            self._report_id = GLib.timeout_add_seconds(self.report_interval, self.print_status)
+
+    def stop(self):
+        if self._report_id is not None:
+            GLib.source_remove(self._report_id)
+            self._report_id = None
+
+    def print_status(self):
+        print(self.tracker.status_line())
+        return True
+
+
+def attach_ids(detections, track_ids):
+    """HailoUniqueID on each detection with a confirmed track (same order as the extracted array)"""
+    for det, track_id in zip(detections, track_ids.tolist()):
+        if track_id >= 0:
+            det.add_object(hailo.HailoUniqueID(track_id))
+
+
+# -------- CLI --------
+
+def add_tracker_arguments(parser, choices=("hailo", "python"), default="hailo"):
+    """Standard --tracker options (choices: the TRACKERS the pipeline can build)"""
+    described = {"none": "none: no tracking", "hailo": "hailo: hailotracker (one class)",
+                 "python": "python: multi-class ByteTrack (tracker.py)"}
+    parser.add_argument("--tracker", choices=choices, default=default,
+                        help="; ".join(described[c] for c in choices) + f" (default: {default})")
+    parser.add_argument("--max-tracks", type=int, default=512,
+                        help="--tracker python: track slots, fixes the memory bound (default: 512)")
+    parser.add_argument("--track-history", type=int, default=32,
+                        help="--tracker python: boxes kept per track (default: 32)")
+    parser.add_argument("--track-high", type=float, default=0.5,
+                        help="--tracker python: first-stage detection score (default: 0.5)")
+    parser.add_argument("--track-low", type=float, default=0.1,
+                        help="--tracker python: lowest score used in the second stage (default: 0.1)")
+    parser.add_argument("--track-new", type=float, default=0.6,
+                        help="--tracker python: score that opens a new track (default: 0.6)")
+    parser.add_argument("--track-buffer", type=int, default=30,
+                        help="--tracker python: frames a lost track keeps its ID (default: 30)")
+    parser.add_argument("--track-min-hits", type=int, default=2,
+                        help="--tracker python: matches before a track is reported (default: 2)")
+    parser.add_argument("--track-interval", type=int, default=10,
+                        help="--tracker python: seconds between status lines, 0 = final only (default: 10)")
+
+
+def tracker_from_args(args):
+    """ByteTracker for --tracker python, else None"""
+    if args.tracker != "python":
+        return None
+    tracker = ByteTracker(max_tracks=args.max_tracks, history=args.track_history, high=args.track_high,
+                          low=args.track_low, new=args.track_new, buffer=args.track_buffer,
+                          min_hits=args.track_min_hits)
+    print(f"🧭 Python tracker: {args.max_tracks} slots x {args.track_history} history "
+          f"({tracker.nbytes / 1024:.0f} KiB), {'Hungarian' if HAVE_SCIPY else 'greedy'} assignment")
+    return tracker
+
+
+def stage_from_args(args, pipeline):
+    """Attached TrackerStage for --tracker python, else None"""
+    tracker = tracker_from_args(args)
+    if tracker is None:
+        return None
+    if not HAVE_HAILO:
+        print("⚠️  hailo Python module not available: no detections to track")
+        return None
+    return TrackerStage.from_pipeline(pipeline, tracker=tracker, report_interval=args.track_interval)
+
+
+def finish_tracker(stage):
+    if stage is None:
+        return
+    stage.stop()
+    stage.print_status()
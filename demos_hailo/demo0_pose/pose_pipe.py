@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import argparse
+import os
 import sys
 import gi
 
@@ -7,64 +8,152 @@ gi.require_version("Gst", "1.0")
 gi.require_version("GObject", "2.0")
 from gi.repository import Gst, GObject
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from rate_control import (InferenceGate, InferenceRateController, add_rate_control_arguments, print_rate_update,
+                          videorate_section)
+from pipeline_params import PipelineParams, add_params_arguments, params_from_args
+from metrics import (add_metrics_arguments, collect_analytics, collect_postprocess, collect_queues, start_metrics,
+                     watch_fps)
+from queue_monitor import add_queue_monitor_arguments, finish_monitor, monitor_from_args
+from stage_trace import add_trace_arguments, finish_tracer, tracer_from_args
+from analytics import add_analytics_arguments, analytics_from_args, finish_analytics
+from np_postprocess import add_postprocess_arguments, finish_postprocess, postprocess_from_args
+
 Gst.init(None)
 
+DEFAULT_PARAMS = PipelineParams(queue_buffers=3, scale_threads=2, convert_threads=2, source_convert_threads=3,
+                                batch_size=1)
+TOPOLOGIES = ("linear", "bypass")
 
-def build_pipeline(
-    device="/dev/video0",
-    width=640,
-    height=480,
-    input_fps=30,
-    inference_fps=8,
-    hef_path="./yolov8m_pose.hef",
-    post_so="./libyolov8pose_postprocess.so",
-    video_sink="xvimagesink",
-):
-    pipe = f"""
-        hailomuxer name=hmux
 
-        v4l2src device={device} name=source !
-        video/x-raw,format=UYVY,width={width},height={height},framerate={input_fps}/1 !
-        videorate drop-only=true !
-        video/x-raw,framerate={inference_fps}/1 !
+def source_section(device, input_source=None):
+    """Camera (default) or a video file decoded to raw frames (headless runs, autotune.py);
+    source_pace sync=true plays the file in real time instead of as fast as possible"""
+    if input_source and not input_source.startswith("/dev/video"):
+        return (f"filesrc location={input_source} name=source ! decodebin ! videoconvert ! videoscale ! "
+                f"videorate ! identity name=source_pace sync=false")
+    return f"v4l2src device={input_source or device} name=source"
 
-        queue name=source_scale_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        videoscale name=source_videoscale n-threads=2 !
-        queue name=source_convert_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        videoconvert n-threads=3 name=source_convert qos=false !
-        video/x-raw,format=RGB,pixel-aspect-ratio=1/1 !
 
-        queue name=inference_scale_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        videoscale name=inference_videoscale n-threads=2 qos=false !
-        queue name=inference_convert_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+def inference_section(p, hef_path, post_so, post_engine="so", hold=False):
+    """Scale/convert to the model input, hailonet -> hailofilter -> hailotracker (no trailing '!')
+    post_engine="numpy": FLOAT32 hailonet outputs and an identity (post_callback) in place of hailofilter
+    hold: identity inference_hold after the post-process (rate_control.InferenceGate, bypass topology)"""
+    if post_engine == "numpy":
+        output_format = "output-format-type=HAILO_FORMAT_TYPE_FLOAT32"
+        post = "identity name=post_callback"
+    else:
+        output_format = ""
+        post = f"hailofilter name=inference_hailofilter so-path={post_so} function-name=filter qos=false"
+    if hold:
+        post += " ! identity name=inference_hold"
+    return f"""
+        {p.queue("inference_scale_q")} !
+        videoscale name=inference_videoscale n-threads={p.scale_threads} qos=false !
+        {p.queue("inference_convert_q")} !
         video/x-raw,pixel-aspect-ratio=1/1 !
-        videoconvert name=inference_videoconvert n-threads=2 !
+        videoconvert name=inference_videoconvert n-threads={p.convert_threads} !
 
-        queue name=inference_hailonet_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        hailonet name=inference_hailonet hef-path={hef_path} batch-size=1 force-writable=true !
+        {p.queue("inference_hailonet_q", hailonet=True)} !
+        hailonet name=inference_hailonet hef-path={hef_path} batch-size={p.batch_size} force-writable=true
+            {output_format} !
 
-        queue name=inference_hailofilter_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        hailofilter name=inference_hailofilter so-path={post_so} function-name=filter qos=false !
+        {p.queue("inference_hailofilter_q")} !
+        {post} !
 
-        queue name=inference_hailotracker_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        hailotracker name=hailo_tracker class-id=0 !
+        {p.queue("inference_hailotracker_q")} !
+        hailotracker name=hailo_tracker class-id=0
+    """
 
-        queue name=identity_callback_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+
+def display_section(p, video_sink):
+    """Callback identity -> hailooverlay -> display (starts with a queue)"""
+    return f"""
+        {p.queue("identity_callback_q")} !
         identity name=identity_callback !
 
-        queue name=hailo_display_hailooverlay_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+        {p.queue("hailo_display_hailooverlay_q")} !
         hailooverlay name=hailo_display_hailooverlay !
 
-        queue name=hailo_display_videoconvert_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        videoconvert name=hailo_display_videoconvert n-threads=2 qos=false !
+        {p.queue("hailo_display_videoconvert_q")} !
+        videoconvert name=hailo_display_videoconvert n-threads={p.convert_threads} qos=false !
 
-        queue name=hailo_display_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+        {p.queue("hailo_display_q")} !
         fpsdisplaysink name=hailo_display
             video-sink={video_sink}
             sync=false
             text-overlay=false
             signal-fps-measurements=true
     """
+
+
+def build_pipeline(
+    device="/dev/video0",
+    width=640,
+    height=480,
+    input_fps=30,
+    inference_fps=8,
+    hef_path="./yolov8m_pose.hef",
+    post_so="./libyolov8pose_postprocess.so",
+    video_sink="xvimagesink",
+    rate_control=False,
+    params=None,
+    input_source=None,
+    topology="linear",
+    post_engine="so",
+):
+    """
+    linear: every stage runs at inference_fps (videorate right after the camera), display included.
+    bypass: the converted frames are split by bypass_tee into hmux.sink_0 and a branch through
+            hailonet/hailofilter/hailotracker into hmux.sink_1. hailomuxer outputs one frame per video +
+            metadata pair, so both branches carry every frame: instead of videorate, InferenceGate sets
+            hailonet pass-through above inference_fps and inference_hold repeats the last detections on
+            the skipped frames. Overlay and display run at input_fps. bypass_q does not leak: a dropped
+            video frame would pair every later frame with another frame's detections.
+    post_engine="numpy" replaces the .so filter with np_postprocess (decode + NMS in Python).
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"unknown topology {topology!r}, expected one of {TOPOLOGIES}")
+    p = params or DEFAULT_PARAMS
+    rate = videorate_section(inference_fps, controlled=rate_control)
+    source = f"""
+        {source_section(device, input_source)} !
+        video/x-raw,format=UYVY,width={width},height={height},framerate={input_fps}/1 !
+    """
+    convert = f"""
+        {p.queue("source_scale_q")} !
+        videoscale name=source_videoscale n-threads={p.scale_threads} !
+        {p.queue("source_convert_q")} !
+        videoconvert n-threads={p.source_threads} name=source_convert qos=false !
+        video/x-raw,format=RGB,pixel-aspect-ratio=1/1 !
+    """
+
+    if topology == "linear":
+        pipe = f"""
+            {source}
+            {rate} !
+            {convert}
+            {inference_section(p, hef_path, post_so, post_engine)} !
+            {display_section(p, video_sink)}
+        """
+    else:
+        pipe = f"""
+            {source}
+            {convert}
+            tee name=bypass_tee
+
+            bypass_tee. !
+            {p.queue("bypass_q")} !
+            hmux.sink_0
+
+            bypass_tee. !
+            {inference_section(p, hef_path, post_so, post_engine, hold=True)} !
+            {p.queue("inference_hmux_q")} !
+            hmux.sink_1
+
+            hailomuxer name=hmux !
+            {display_section(p, video_sink)}
+        """
     return " ".join(pipe.split())
 
 
@@ -90,6 +179,11 @@ def run_pipeline(args):
         hef_path=args.hef,
         post_so=args.post,
         video_sink=args.sink,
+        rate_control=args.rate_control,
+        params=params_from_args(args, "pose", DEFAULT_PARAMS),
+        input_source=args.input,
+        topology=args.topology,
+        post_engine=args.post_engine,
     )
 
     if args.print:
@@ -132,8 +226,62 @@ def run_pipeline(args):
 
     bus.connect("message", on_message)
 
+    # bypass: hailonet pass-through above the inference rate (the muxer needs every frame on both branches)
+    gate = None
+    if args.topology == "bypass":
+        gate = InferenceGate.from_pipeline(pipeline, fps=args.inference_fps)
+
+    # Closed-loop inference rate (videorate max-rate / gate rate from hailonet queue level and inference time)
+    rate_ctl = None
+    if args.rate_control:
+        rate_ctl = InferenceRateController.from_pipeline(
+            pipeline,
+            gate=gate,
+            target_latency_ms=args.target_latency_ms,
+            start_fps=args.inference_fps,
+            min_fps=args.min_inference_fps,
+            max_fps=args.max_inference_fps or args.input_fps,
+            on_update=print_rate_update,
+        )
+
+    # Queue occupancy sampler / bottleneck detector
+    monitor = monitor_from_args(args, pipeline)
+
+    # Optional OpenMetrics endpoint: display fps, queue levels, controlled inference rate
+    metrics = start_metrics(args, "pose_pipe")
+    if metrics is not None:
+        watch_fps(metrics, pipeline.get_by_name("hailo_display"))
+        metrics.add_collector(collect_queues(pipeline))
+        if rate_ctl is not None:
+            metrics.add_collector(lambda m: m.set("inference_fps", rate_ctl.fps))
+        if gate is not None:
+            metrics.add_collector(lambda m: m.set("inference_ratio", gate.ratio))
+
+    # Per-element latency (pad probes on every element, matched by PTS)
+    tracer = tracer_from_args(args, pipeline)
+
+    # NumPy decode + NMS in place of hailofilter, or tensor capture around the .so filter
+    post, capture = postprocess_from_args(args, pipeline, kind="yolov8pose")
+    if post is not None and metrics is not None:
+        metrics.add_collector(collect_postprocess(post))
+
+    # User analytics on identity_callback: metadata copied on the streaming thread, callback on workers
+    analytics = analytics_from_args(args)
+    if analytics is not None:
+        analytics.attach(pipeline.get_by_name("identity_callback"))
+        if metrics is not None:
+            metrics.add_collector(collect_analytics(analytics))
+
     # Start pipeline
     pipeline.set_state(Gst.State.PLAYING)
+    if rate_ctl is not None:
+        rate_ctl.start()
+    if monitor is not None:
+        monitor.start()
+    if tracer is not None:
+        tracer.start_reports(args.trace_interval)
+    if post is not None:
+        post.start_reports()
     print("Pipeline running. Ctrl+C to stop.")
 
     try:
@@ -142,6 +290,15 @@ def run_pipeline(args):
         print("\nStopping pipeline...")
     finally:
         pipeline.set_state(Gst.State.NULL)
+        if rate_ctl is not None:
+            rate_ctl.stop()
+            print(rate_ctl.summary())
+        if gate is not None:
+            print(gate.summary())
+        finish_monitor(monitor, args)
+        finish_tracer(tracer, args)
+        finish_analytics(analytics)
+        finish_postprocess(post, capture)
 
     return 0
 
@@ -152,6 +309,7 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Hailo Pose Pipeline with FPS print")
     parser.add_argument("--device", default="/dev/video0")
+    parser.add_argument("--input", "-i", default=None, help="Video file instead of the camera")
     parser.add_argument("--width", type=int, default=640)
     parser.add_argument("--height", type=int, default=480)
     parser.add_argument("--input-fps", type=int, default=30)
@@ -159,7 +317,17 @@ if __name__ == "__main__":
     parser.add_argument("--hef", default="./yolov8m_pose.hef")
     parser.add_argument("--post", default="./libyolov8pose_postprocess.so")
     parser.add_argument("--sink", default="xvimagesink")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="linear",
+                        help="linear: display at the inference rate; bypass: full-rate display through "
+                             "hailomuxer with the latest metadata (default: linear)")
     parser.add_argument("--print", action="store_true", help="Print pipeline and exit")
+    add_rate_control_arguments(parser)
+    add_params_arguments(parser)
+    add_queue_monitor_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+    add_analytics_arguments(parser)
+    add_postprocess_arguments(parser)
 
     args = parser.parse_args()
     sys.exit(run_pipeline(args))
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
+import os
 import sys
+import time
 import argparse
 import gi
 
@@ -7,6 +9,14 @@ gi.require_version("Gst", "1.0")
 gi.require_version("GObject", "2.0")
 from gi.repository import Gst, GObject, GLib
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from pipeline_params import add_params_arguments, params_from_args
+from queue_monitor import add_queue_monitor_arguments, finish_monitor, monitor_from_args
+from stage_trace import add_trace_arguments, finish_tracer, tracer_from_args
+from rate_control import InferenceGate, videorate_section
+
+from pose_pipe import DEFAULT_PARAMS, TOPOLOGIES, display_section, source_section
+
 Gst.init(None)
 
 
@@ -21,6 +31,9 @@ def build_pipeline(
     hef_path="./yolov8m_pose.hef",
     post_so="./libyolov8pose_postprocess.so",
     video_sink="xvimagesink",
+    params=None,
+    input_source=None,
+    topology="linear",
 ):
     """
     Build profiling pipeline:
@@ -30,29 +43,41 @@ def build_pipeline(
       - fps_pre_hailo:  before hailonet (after downscale + convert)
       - fps_post_hailo: after hailotracker
       - hailo_display:  final display FPS
+
+    topology="bypass" (see pose_pipe.build_pipeline): every frame goes through both hmux branches, hailonet
+    infers at process_fps (InferenceGate pass-through, inference_hold repeats the last detections) and
+    hailo_display runs at sensor_fps; fps_post_hailo then counts all frames, the inferred rate is printed
+    as [INFERRED] once a second.
+
+    Queue depths, n-threads and batch size come from params (pose_pipe.DEFAULT_PARAMS by default).
     """
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"unknown topology {topology!r}, expected one of {TOPOLOGIES}")
+    p = params or DEFAULT_PARAMS
+    hold = "identity name=inference_hold !" if topology == "bypass" else ""
 
-    pipe = f"""
-        hailomuxer name=hmux
-        v4l2src device={device} name=source !
+    source = f"""
+        {source_section(device, input_source)} !
         video/x-raw,format=UYVY,width={width},height={height},framerate={sensor_fps}/1 !
-        videorate drop-only=true !
-        video/x-raw,framerate={process_fps}/1 !
-        queue name=source_scale_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        videoscale name=source_videoscale n-threads=2 !
-        queue name=source_convert_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        videoconvert n-threads=3 name=source_convert qos=false !
+    """
+    convert = f"""
+        {p.queue("source_scale_q")} !
+        videoscale name=source_videoscale n-threads={p.scale_threads} !
+        {p.queue("source_convert_q")} !
+        videoconvert n-threads={p.source_threads} name=source_convert qos=false !
         video/x-raw,format=RGB,pixel-aspect-ratio=1/1 !
-        queue name=inference_scale_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        videoscale name=inference_videoscale n-threads=2 qos=false !
+    """
+    inference = f"""
+        {p.queue("inference_scale_q")} !
+        videoscale name=inference_videoscale n-threads={p.scale_threads} qos=false !
         video/x-raw,width={infer_width},height={infer_height},pixel-aspect-ratio=1/1 !
-        queue name=inference_convert_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+        {p.queue("inference_convert_q")} !
         video/x-raw,pixel-aspect-ratio=1/1 !
-        videoconvert name=inference_videoconvert n-threads=2 !
+        videoconvert name=inference_videoconvert n-threads={p.convert_threads} !
         tee name=t_pre_hailo
 
         t_pre_hailo. !
-          queue name=fps_pre_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+          {p.queue("fps_pre_q")} !
           fpsdisplaysink name=fps_pre_hailo
             video-sink=fakesink
             sync=false
@@ -60,16 +85,17 @@ def build_pipeline(
             signal-fps-measurements=true
 
         t_pre_hailo. !
-          queue name=inference_hailonet_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-          hailonet name=inference_hailonet hef-path={hef_path} batch-size=1 force-writable=true !
-          queue name=inference_hailofilter_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+          {p.queue("inference_hailonet_q", hailonet=True)} !
+          hailonet name=inference_hailonet hef-path={hef_path} batch-size={p.batch_size} force-writable=true !
+          {p.queue("inference_hailofilter_q")} !
           hailofilter name=inference_hailofilter so-path={post_so} function-name=filter qos=false !
-          queue name=inference_hailotracker_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+          {hold}
+          {p.queue("inference_hailotracker_q")} !
           hailotracker name=hailo_tracker class-id=0 !
           tee name=t_post_hailo
 
         t_post_hailo. !
-          queue name=fps_post_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
+          {p.queue("fps_post_q")} !
           fpsdisplaysink name=fps_post_hailo
             video-sink=fakesink
             sync=false
@@ -77,20 +103,35 @@ def build_pipeline(
             signal-fps-measurements=true
 
         t_post_hailo. !
-          queue name=identity_callback_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-          identity name=identity_callback !
-          queue name=hailo_display_hailooverlay_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-          hailooverlay name=hailo_display_hailooverlay !
-          queue name=hailo_display_videoconvert_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-          videoconvert name=hailo_display_videoconvert n-threads=2 qos=false !
-          queue name=hailo_display_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-          fpsdisplaysink name=hailo_display
-            video-sink={video_sink}
-            sync=false
-            text-overlay=false
-            signal-fps-measurements=true
     """
 
+    if topology == "linear":
+        pipe = f"""
+            {source}
+            {videorate_section(process_fps)} !
+            {convert}
+            {inference}
+            {display_section(p, video_sink)}
+        """
+    else:
+        pipe = f"""
+            {source}
+            {convert}
+            tee name=bypass_tee
+
+            bypass_tee. !
+            {p.queue("bypass_q")} !
+            hmux.sink_0
+
+            bypass_tee. !
+            {inference}
+            {p.queue("inference_hmux_q")} !
+            hmux.sink_1
+
+            hailomuxer name=hmux !
+            {display_section(p, video_sink)}
+        """
+
     return " ".join(pipe.split())
 
 
@@ -120,6 +161,9 @@ def run_pipeline(args, loop):
         hef_path=args.hef,
         post_so=args.post,
         video_sink=args.sink,
+        params=params_from_args(args, "pose_profile", DEFAULT_PARAMS),
+        input_source=args.input,
+        topology=args.topology,
     )
 
     if args.print:
@@ -177,7 +221,31 @@ def run_pipeline(args, loop):
 
     bus.connect("message", on_message)
 
+    # bypass: hailonet pass-through above --process-fps instead of videorate (hmux pairs every frame)
+    gate = None
+    if args.topology == "bypass":
+        gate = InferenceGate.from_pipeline(pipeline, fps=args.process_fps)
+        last = {"n": 0, "t": time.monotonic()}
+
+        def print_inferred():
+            now = time.monotonic()
+            fps = (gate.inferred - last["n"]) / (now - last["t"])
+            last["n"], last["t"] = gate.inferred, now
+            print(f"[INFERRED]    fps={fps:6.2f}  share={gate.ratio:6.2f}")
+            return True
+
+        GLib.timeout_add_seconds(1, print_inferred)
+
+    monitor = monitor_from_args(args, pipeline)
+
+    # Per-element latency (pad probes on every element, matched by PTS)
+    tracer = tracer_from_args(args, pipeline)
+
     pipeline.set_state(Gst.State.PLAYING)
+    if monitor is not None:
+        monitor.start()
+    if tracer is not None:
+        tracer.start_reports(args.trace_interval)
     print("Pipeline running. Ctrl+C to stop.\n")
 
     try:
@@ -186,6 +254,10 @@ def run_pipeline(args, loop):
         print("\nStopping pipeline...")
     finally:
         pipeline.set_state(Gst.State.NULL)
+        finish_monitor(monitor, args)
+        finish_tracer(tracer, args)
+        if gate is not None:
+            print(gate.summary())
 
     return 0
 
@@ -193,6 +265,7 @@ def run_pipeline(args, loop):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Hailo pose profiling pipeline (with downscale)")
     parser.add_argument("--device", default="/dev/video0")
+    parser.add_argument("--input", "-i", default=None, help="Video file instead of the camera")
     parser.add_argument("--width", type=int, default=1280, help="Capture width")
     parser.add_argument("--height", type=int, default=720, help="Capture height")
     parser.add_argument("--sensor-fps", type=int, default=60, help="Camera capture FPS")
@@ -202,7 +275,12 @@ if __name__ == "__main__":
     parser.add_argument("--hef", default="./yolov8m_pose.hef")
     parser.add_argument("--post", default="./libyolov8pose_postprocess.so")
     parser.add_argument("--sink", default="xvimagesink")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="linear",
+                        help="bypass: display at --sensor-fps through hailomuxer, hailonet infers at --process-fps")
     parser.add_argument("--print", action="store_true", help="Print pipeline and exit")
+    add_params_arguments(parser)
+    add_queue_monitor_arguments(parser)
+    add_trace_arguments(parser)
 
     args = parser.parse_args()
     loop = GLib.MainLoop()
@@ -8,8 +8,21 @@ gi.require_version("Gst", "1.0")
 gi.require_version("GObject", "2.0")
 from gi.repository import Gst, GObject
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from rate_control import (InferenceRateController, add_rate_control_arguments, print_rate_update,
+                          videorate_section)
+from pipeline_params import PipelineParams, add_params_arguments, params_from_args
+from metrics import (add_metrics_arguments, collect_postprocess, collect_queues, collect_tracker, start_metrics,
+                     watch_fps)
+from queue_monitor import add_queue_monitor_arguments, finish_monitor, monitor_from_args
+from frame_skip import add_frame_skip_arguments, finish_skipper, skipper_from_args
+from np_postprocess import add_postprocess_arguments, finish_postprocess, postprocess_from_args
+from tracker import add_tracker_arguments, finish_tracker, stage_from_args
+
 Gst.init(None)
 
+DEFAULT_PARAMS = PipelineParams(queue_buffers=30, scale_threads=2, convert_threads=2, batch_size=1)
+
 
 def build_detection_pipeline(
     device="/dev/video0",
@@ -20,17 +33,26 @@ def build_detection_pipeline(
     hef_path="./yolov8m.hef",
     post_so="./libyolo_hailortpp_post.so",
     network_name="yolov8m",
-    batch_size=1,
     nms_score_threshold=0.3,
     nms_iou_threshold=0.45,
+    params=None,
     video_sink="xvimagesink",
     input_source=None,          # if provided, can be file OR /dev/videoX
     tcp_host=None,
     tcp_port=None,
+    rate_control=False,           # videorate max-rate retuned at runtime instead of fixed caps
+    propagate=False,              # identity propagate_callback after hailofilter (frame_skip.py)
+    post_engine="so",             # "numpy": identity post_callback (np_postprocess.py) instead of hailofilter
+    track=False,                  # identity tracker_callback before hailooverlay (tracker.py)
 ):
     """
     Build a GStreamer pipeline string for Hailo detection.
     Supports separate input FPS (camera) and inference FPS (via videorate).
+    Queue depths, n-threads and batch size come from params (DEFAULT_PARAMS by default).
+    With propagate=True an identity (propagate_callback) sits between hailofilter and hailooverlay so
+    frame_skip.FrameSkipper can add propagated boxes to frames hailonet passed through.
+    With post_engine="numpy" the FLOAT32 tensors are decoded by np_postprocess in an identity (post_callback).
+    With track=True an identity (tracker_callback) lets tracker.TrackerStage add track IDs for every class.
     """
 
     # ---- Source element (camera vs file) ----
@@ -40,7 +62,7 @@ def build_detection_pipeline(
             source_element = f"v4l2src device={input_source} name=src_0 ! videoflip video-direction=horiz"
         else:
             # file source
-            source_element = f"filesrc location={input_source} name=src_0 ! decodebin"
+            source_element = f"filesrc location={input_source} name=src_0 ! decodebin ! identity name=source_pace sync=false"
     else:
         # Default: raw camera like pose script
         is_camera = True
@@ -48,22 +70,25 @@ def build_detection_pipeline(
         source_element = f"v4l2src device={device} name=src_0 ! videoflip video-direction=horiz"
 
     # ---- FPS control (input vs inference) ----
+    rate_block = videorate_section(inference_fps, controlled=rate_control)
     if is_camera:
         # For camera: set sensor caps to input_fps, then downsample to inference_fps
         fps_block = (
             f" ! video/x-raw,format=UYVY,width={width},height={height},framerate={input_fps}/1 "
-            f"! videorate drop-only=true ! video/x-raw,framerate={inference_fps}/1"
+            f"! {rate_block}"
         )
     else:
         # For files: just enforce inference_fps using videorate
         fps_block = (
-            f" ! videorate drop-only=true ! video/x-raw,framerate={inference_fps}/1"
+            f" ! {rate_block}"
         )
 
+    p = params or DEFAULT_PARAMS
+
     # ---- Sink element (screen or TCP) ----
     if tcp_host and tcp_port:
         sink_element = f"""
-            queue name=queue_before_sink leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
+            {p.queue("queue_before_sink")} !
             videoscale !
             video/x-raw,width=836,height=546,format=RGB !
             tcpclientsink host={tcp_host} port={tcp_port}
@@ -83,23 +108,31 @@ def build_detection_pipeline(
         f"output-format-type=HAILO_FORMAT_TYPE_FLOAT32"
     )
 
+    if post_engine == "numpy":
+        post_element = "identity name=post_callback"
+    else:
+        post_element = (f"hailofilter name=inference_hailofilter function-name={network_name} so-path={post_so} "
+                        f"config-path=null qos=false")
+
     pipe = f"""
         {source_element}
         {fps_block} !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        videoscale qos=false n-threads=2 !
+        {p.queue()} !
+        videoscale qos=false n-threads={p.scale_threads} !
         video/x-raw,pixel-aspect-ratio=1/1 !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        videoconvert n-threads=2 qos=false !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        hailonet hef-path={hef_path} batch-size={batch_size} {thresholds_str} !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        hailofilter function-name={network_name} so-path={post_so} config-path=null qos=false !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
+        {p.queue()} !
+        videoconvert n-threads={p.convert_threads} qos=false !
+        {p.queue("inference_hailonet_q", hailonet=True)} !
+        hailonet name=inference_hailonet hef-path={hef_path} batch-size={p.batch_size} {thresholds_str} !
+        {p.queue()} !
+        {post_element} !
+        {p.queue()} !
+        {"identity name=propagate_callback ! " if propagate else ""}
+        {"identity name=tracker_callback ! " if track else ""}
         hailooverlay qos=false !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        videoconvert n-threads=2 qos=false !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
+        {p.queue()} !
+        videoconvert n-threads={p.convert_threads} qos=false !
+        {p.queue()} !
         {sink_element}
     """
     return " ".join(pipe.split())
@@ -115,22 +148,35 @@ def on_fps_measurement(fpssink, fps):
 
 
 def run_pipeline(args):
+    if args.infer_every and args.rate_control:
+        print("--infer-every and --rate-control are exclusive (both decide which frames reach hailonet)",
+              file=sys.stderr)
+        return 1
+    if args.infer_every and args.tracker == "python":
+        print("--infer-every and --tracker python are exclusive (both assign track IDs)", file=sys.stderr)
+        return 1
+
     pipeline_str = build_detection_pipeline(
         device=args.device,
         width=args.width,
         height=args.height,
         input_fps=args.input_fps,
-        inference_fps=args.inference_fps,
+        # Frame skipping keeps every frame; hailonet itself passes the skipped ones through
+        inference_fps=args.input_fps if args.infer_every else args.inference_fps,
         hef_path=args.hef,
         post_so=args.post,
         network_name=args.network,
-        batch_size=args.batch_size,
+        params=params_from_args(args, "detection", DEFAULT_PARAMS),
         nms_score_threshold=args.nms_score,
         nms_iou_threshold=args.nms_iou,
         video_sink=args.sink,
         input_source=args.input,
         tcp_host=args.tcp_host,
         tcp_port=args.tcp_port,
+        rate_control=args.rate_control,
+        propagate=bool(args.infer_every),
+        post_engine=args.post_engine,
+        track=args.tracker == "python",
     )
 
     if args.print:
@@ -173,7 +219,57 @@ def run_pipeline(args):
 
     bus.connect("message", on_message)
 
+    # Closed-loop inference rate (videorate max-rate from hailonet queue level and inference time)
+    rate_ctl = None
+    if args.rate_control:
+        rate_ctl = InferenceRateController.from_pipeline(
+            pipeline,
+            target_latency_ms=args.target_latency_ms,
+            start_fps=args.inference_fps,
+            min_fps=args.min_inference_fps,
+            max_fps=args.max_inference_fps or args.input_fps,
+            on_update=print_rate_update,
+        )
+
+    # Queue occupancy sampler / bottleneck detector
+    monitor = monitor_from_args(args, pipeline)
+
+    # NumPy decode + NMS in place of hailofilter (--nms-score/--nms-iou unless --post-score/--post-iou),
+    # or tensor capture around the .so filter
+    post, capture = postprocess_from_args(args, pipeline, score=args.nms_score, iou=args.nms_iou)
+
+    # Multi-class ByteTrack on every frame's detections (IDs drawn by hailooverlay)
+    track_stage = stage_from_args(args, pipeline)
+
+    # hailonet on a subset of frames, Kalman/optical-flow boxes on the others
+    skipper = skipper_from_args(args, pipeline)
+
+    # Optional OpenMetrics endpoint: display fps, queue levels, controlled inference rate
+    metrics = start_metrics(args, "detection")
+    if metrics is not None:
+        watch_fps(metrics, pipeline.get_by_name("hailo_display"))
+        metrics.add_collector(collect_queues(pipeline))
+        if rate_ctl is not None:
+            metrics.add_collector(lambda m: m.set("inference_fps", rate_ctl.fps))
+        if skipper is not None:
+            metrics.add_collector(lambda m: (m.set("inference_ratio", skipper.report()["inference_ratio"]),
+                                             m.set("objects", skipper.objects)))
+        if post is not None:
+            metrics.add_collector(collect_postprocess(post))
+        if track_stage is not None:
+            metrics.add_collector(collect_tracker(track_stage.tracker))
+
     pipeline.set_state(Gst.State.PLAYING)
+    if rate_ctl is not None:
+        rate_ctl.start()
+    if monitor is not None:
+        monitor.start()
+    if skipper is not None:
+        skipper.start_reports()
+    if post is not None:
+        post.start_reports()
+    if track_stage is not None:
+        track_stage.start_reports()
     print("Detection pipeline running. Ctrl+C to stop.")
 
     try:
@@ -182,6 +278,13 @@ def run_pipeline(args):
         print("\nStopping pipeline...")
     finally:
         pipeline.set_state(Gst.State.NULL)
+        if rate_ctl is not None:
+            rate_ctl.stop()
+            print(rate_ctl.summary())
+        finish_monitor(monitor, args)
+        finish_skipper(skipper, args)
+        finish_postprocess(post, capture)
+        finish_tracker(track_stage)
 
     return 0
 
@@ -233,8 +336,6 @@ if __name__ == "__main__":
                         help=f"Path to postprocess .so (default: {default_post})")
     parser.add_argument("--network", default="yolov8m",
                         help="Network name for hailofilter function-name (default: yolov8m)")
-    parser.add_argument("--batch-size", type=int, default=1,
-                        help="Hailonet batch size (default: 1)")
     parser.add_argument("--nms-score", type=float, default=0.3,
                         help="NMS score threshold (default: 0.3)")
     parser.add_argument("--nms-iou", type=float, default=0.45,
@@ -248,6 +349,25 @@ if __name__ == "__main__":
     parser.add_argument("--tcp-port", type=int, default=None,
                         help="TCP port for tcpclientsink (requires --tcp-host)")
 
+    # Closed-loop inference rate
+    add_rate_control_arguments(parser)
+
+    # Pipeline params (queue depths, n-threads, batch size; autotune.py profiles)
+    add_params_arguments(parser)
+
+    # Frame skipping with propagated boxes
+    add_frame_skip_arguments(parser)
+
+    # NumPy post-process instead of the .so filter, tensor capture for bench_postprocess.py
+    add_postprocess_arguments(parser)
+
+    # Multi-class Python tracker (no tracker by default)
+    add_tracker_arguments(parser, choices=("none", "python"), default="none")
+
+    # Queue occupancy / bottleneck report
+    add_queue_monitor_arguments(parser)
+    add_metrics_arguments(parser)
+
     # Utility
     parser.add_argument("--print", action="store_true",
                         help="Print pipeline and exit (do not run)")
@@ -8,9 +8,22 @@ gi.require_version("Gst", "1.0")
 gi.require_version("GObject", "2.0")
 from gi.repository import Gst, GLib
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from encoder_probe import add_encoder_arguments, resolve_encoder
+from pipeline_params import add_params_arguments, params_from_args
+from metrics import add_metrics_arguments, collect_encoder, collect_queues, start_metrics
+from rtcp_abr import named_encoder
+
+from detection import DEFAULT_PARAMS
+
 Gst.init(None)
 
 
+def default_encoder(bitrate_kbps, inference_fps):
+    """x264enc settings used unless --encoder selects another one"""
+    return f"x264enc tune=zerolatency speed-preset=ultrafast bitrate={bitrate_kbps} key-int-max={inference_fps}"
+
+
 def build_detection_pipeline(
     device="/dev/video0",
     width=640,
@@ -20,15 +33,16 @@ def build_detection_pipeline(
     hef_path="./yolov8m.hef",
     post_so="./libyolo_hailortpp_post.so",
     network_name="yolov8m",
-    batch_size=1,
     nms_score_threshold=0.3,
     nms_iou_threshold=0.45,
+    params=None,
     input_source=None,          # file OR /dev/videoX OR None (default camera)
     segment_seconds=5.0,
     max_files=0,
     output_dir="./recordings",
     file_prefix="detRec_",
     bitrate_kbps=4000,
+    encoder=None,
 ):
     """
     Build a GStreamer pipeline string for Hailo detection, writing
@@ -36,6 +50,8 @@ def build_detection_pipeline(
 
       source -> fps control -> hailonet -> hailofilter -> hailooverlay
             -> x264enc -> h264parse -> splitmuxsink
+
+    Queue depths, n-threads and batch size come from params (detection.DEFAULT_PARAMS by default).
     """
 
     # Ensure output directory exists
@@ -76,9 +92,13 @@ def build_detection_pipeline(
         f"output-format-type=HAILO_FORMAT_TYPE_FLOAT32"
     )
 
+    p = params or DEFAULT_PARAMS
+
     # ---- Recording sink (encode + mux + segment) ----
+    if encoder is None:
+        encoder = default_encoder(bitrate_kbps, inference_fps)
     sink_element = f"""
-        x264enc tune=zerolatency speed-preset=ultrafast bitrate={bitrate_kbps} key-int-max={inference_fps} !
+        {named_encoder(encoder)} !
         h264parse !
         splitmuxsink name=record_sink
             location={file_pattern}
@@ -90,20 +110,20 @@ def build_detection_pipeline(
     pipe = f"""
         {source_element}
         {fps_block} !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        videoscale qos=false n-threads=2 !
+        {p.queue()} !
+        videoscale qos=false n-threads={p.scale_threads} !
         video/x-raw,pixel-aspect-ratio=1/1 !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        videoconvert n-threads=2 qos=false !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        hailonet hef-path={hef_path} batch-size={batch_size} {thresholds_str} !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
+        {p.queue()} !
+        videoconvert n-threads={p.convert_threads} qos=false !
+        {p.queue("inference_hailonet_q", hailonet=True)} !
+        hailonet name=inference_hailonet hef-path={hef_path} batch-size={p.batch_size} {thresholds_str} !
+        {p.queue()} !
         hailofilter function-name={network_name} so-path={post_so} config-path=null qos=false !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
+        {p.queue()} !
         hailooverlay qos=false !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
-        videoconvert n-threads=2 qos=false !
-        queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
+        {p.queue()} !
+        videoconvert n-threads={p.convert_threads} qos=false !
+        {p.queue()} !
         {sink_element}
     """
     return " ".join(pipe.split())
@@ -119,7 +139,7 @@ def run_pipeline(args):
         hef_path=args.hef,
         post_so=args.post,
         network_name=args.network,
-        batch_size=args.batch_size,
+        params=params_from_args(args, "detection", DEFAULT_PARAMS),
         nms_score_threshold=args.nms_score,
         nms_iou_threshold=args.nms_iou,
         input_source=args.input,
@@ -128,6 +148,8 @@ def run_pipeline(args):
         output_dir=args.output_dir,
         file_prefix=args.prefix,
         bitrate_kbps=args.bitrate,
+        encoder=resolve_encoder(args, args.width, args.height, args.inference_fps, args.bitrate,
+                                args.inference_fps, default=default_encoder(args.bitrate, args.inference_fps)),
     )
 
     if args.print:
@@ -148,6 +170,22 @@ def run_pipeline(args):
 
     pipeline = Gst.parse_launch(pipeline_str)
 
+    # Optional OpenMetrics endpoint: frames, segments, queue levels, encoder bitrate
+    metrics = start_metrics(args, "detection_files")
+    if metrics is not None:
+        frames = {"n": 0}
+
+        def count_frame(pad, info):
+            frames["n"] += 1
+            return Gst.PadProbeReturn.OK
+
+        pipeline.get_by_name("inference_hailonet").get_static_pad("src").add_probe(
+            Gst.PadProbeType.BUFFER, count_frame)
+        metrics.add_collector(lambda m: m.set("frames", frames["n"]))
+        metrics.add_collector(collect_queues(pipeline))
+        metrics.add_collector(collect_encoder(pipeline.get_by_name("encoder")))
+        metrics.set("segments", 0)
+
     # For debug: connect to splitmuxsink element messages (segment open/close)
     bus = pipeline.get_bus()
     bus.add_signal_watch()
@@ -180,6 +218,8 @@ def run_pipeline(args):
                 if not idx_ok:
                     idx = -1
                 print(f"[record] Closed segment #{idx}: {loc}")
+                if metrics is not None:
+                    metrics.inc("segments")
 
     bus.connect("message", on_message)
 
@@ -259,8 +299,6 @@ if __name__ == "__main__":
                         help=f"Path to postprocess .so (default: {default_post})")
     parser.add_argument("--network", default="yolov8m",
                         help="Network name for hailofilter function-name (default: yolov8m)")
-    parser.add_argument("--batch-size", type=int, default=1,
-                        help="Hailonet batch size (default: 1)")
     parser.add_argument("--nms-score", type=float, default=0.3,
                         help="NMS score threshold (default: 0.3)")
     parser.add_argument("--nms-iou", type=float, default=0.45,
@@ -278,6 +316,9 @@ if __name__ == "__main__":
                         help="File name prefix (default: detRec_)")
     parser.add_argument("--bitrate", type=int, default=4000,
                         help="H.264 encoder bitrate in kbps (default: 4000)")
+    add_encoder_arguments(parser)
+    add_params_arguments(parser)
+    add_metrics_arguments(parser)
 
     # Utility
     parser.add_argument("--print", action="store_true",
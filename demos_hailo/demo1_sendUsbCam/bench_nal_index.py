@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+bench_nal_index.py - Micro-benchmark of nal_index against the original per-byte NAL loops
+Builds synthetic 720p-sized access units (AUD, SPS, PPS, SEI, 4 slices) and times:
+  - sender:   analyze_h264_frame + IDR search (old byte loop vs nal_index)
+  - receiver: parse_byte_stream_nalus (old forward rescan vs nal_index)
+Usage: python bench_nal_index.py --sizes 20000 90000 --iterations 50
+"""
+
+import argparse
+import os
+import re
+import time
+
+import nal_index
+
+
+# -------- Original implementations (kept here as the baseline) --------
+
+def legacy_analyze_h264_frame(data):
+    nalus = []
+    i = 0
+    while i < len(data) - 4:
+        if data[i:i+4] == b'\x00\x00\x00\x01':
+            nal_type = data[i+4] & 0x1F
+            nalus.append(nal_type)
+            i += 4
+        else:
+            i += 1
+    return nalus
+
+
+def legacy_find_idr(data):
+    insert_pos = 0
+    i = 0
+    while i < len(data) - 4:
+        if data[i:i+4] == b'\x00\x00\x00\x01':
+            nal_type = data[i+4] & 0x1F
+            if nal_type == 5:
+                insert_pos = i
+                break
+            i += 4
+        else:
+            i += 1
+    return insert_pos
+
+
+def legacy_parse_byte_stream_nalus(data):
+    nalus = []
+    i = 0
+    while i < len(data) - 4:
+        start_code_len = 0
+        if data[i:i+4] == b'\x00\x00\x00\x01':
+            start_code_len = 4
+        elif data[i:i+3] == b'\x00\x00\x01':
+            start_code_len = 3
+        else:
+            i += 1
+            continue
+        end = len(data)
+        for j in range(i + start_code_len, len(data) - 2):
+            if data[j:j+4] == b'\x00\x00\x00\x01' or data[j:j+3] == b'\x00\x00\x01':
+                end = j
+                break
+        if i + start_code_len < len(data):
+            nal_type = data[i + start_code_len] & 0x1F
+            nal_data = data[i + start_code_len:end]
+            nalus.append((i, nal_type, nal_data))
+        i = end
+    return nalus
+
+
+# -------- New implementations (what the scripts now run) --------
+
+def new_sender(data):
+    nalus = nal_index.index_nalus(data)
+    idr = nal_index.find_nal(nalus, nal_index.NAL_IDR)
+    types = [nal.type for nal in nalus]
+    return types, nal_index.start_code_offset(data, idr) if idr else 0
+
+
+def new_receiver(data):
+    view = memoryview(data)
+    return [(nal_index.start_code_offset(view, nal), nal.type, nal_index.nal_view(view, nal))
+            for nal in nal_index.index_nalus(view)]
+
+
+# -------- Synthetic stream --------
+
+_EMULATION = re.compile(b'\x00\x00([\x00-\x03])')
+
+
+def _rbsp(size):
+    """Random NAL payload with emulation prevention applied (no start codes inside)"""
+    body = os.urandom(size)
+    body = _EMULATION.sub(b'\x00\x00\x03\\1', body)
+    return body + b'\x80'
+
+
+def build_access_unit(size, slices=4):
+    parts = [
+        b'\x00\x00\x00\x01\x09\xf0',                       # AUD
+        b'\x00\x00\x00\x01\x67' + _rbsp(26),               # SPS
+        b'\x00\x00\x00\x01\x68' + _rbsp(3),                # PPS
+        b'\x00\x00\x00\x01\x06' + _rbsp(70),               # SEI
+    ]
+    for _ in range(slices):
+        parts.append(b'\x00\x00\x00\x01\x65' + _rbsp(size // slices))
+    return b''.join(parts)
+
+
+def timeit(fn, data, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(data)
+    return (time.perf_counter() - start) / iterations * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NAL indexing vs the original Python loops")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 90000],
+                        help="Access unit sizes in bytes (default: 20000 90000)")
+    parser.add_argument("--iterations", type=int, default=20, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"NAL INDEX BENCHMARK (NumPy: {'yes' if nal_index.HAVE_NUMPY else 'no'})")
+    print("=" * 70)
+
+    for size in args.sizes:
+        data = build_access_unit(size)
+
+        # Sanity: all implementations agree
+        types, idr_pos = new_sender(data)
+        assert types == legacy_analyze_h264_frame(data), "NAL type mismatch"
+        assert idr_pos == legacy_find_idr(data), "IDR offset mismatch"
+        old = legacy_parse_byte_stream_nalus(data)
+        new = new_receiver(data)
+        assert [(p, t, bytes(d)) for p, t, d in new] == [(p, t, d) for p, t, d in old], "receiver mismatch"
+
+        sender_old = timeit(lambda d: (legacy_analyze_h264_frame(d), legacy_find_idr(d)), data, args.iterations)
+        sender_new = timeit(new_sender, data, args.iterations)
+        recv_old = timeit(legacy_parse_byte_stream_nalus, data, args.iterations)
+        recv_new = timeit(new_receiver, data, args.iterations)
+        mv_new = timeit(new_receiver, memoryview(bytearray(data)), args.iterations)
+
+        print(f"📦 Access unit: {len(data)} bytes, NALUs {types}")
+        print(f"  sender   legacy: {sender_old:9.3f} ms   nal_index: {sender_new:7.3f} ms   x{sender_old / sender_new:8.1f}")
+        print(f"  receiver legacy: {recv_old:9.3f} ms   nal_index: {recv_new:7.3f} ms   x{recv_old / recv_new:8.1f}")
+        print(f"  receiver nal_index over memoryview: {mv_new:7.3f} ms")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
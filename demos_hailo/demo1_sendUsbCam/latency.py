@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+latency.py - Clock offset estimation and per-stage latency percentiles for sender -> receiver
+The sender stamps capture, inference and encode wall-clock times into the SEI (sei_schema FLAG_TIMING);
+the receiver adds its receive time, corrected by the sender/receiver clock offset measured with a
+small NTP-style exchange over a side UDP port:
+
+  receiver  --- t0 ------------------>  sender (ClockSyncServer)
+            <-- t0, t1 (recv), t2 (send)
+  offset = ((t1 - t0) + (t2 - t3)) / 2     rtt = (t3 - t0) - (t2 - t1)
+
+The sample with the smallest RTT in the recent window is used (least queuing asymmetry).
+Without --clock-sync the clocks are assumed equal (same host, or NTP-synced hosts).
+"""
+
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+SYNC_REQUEST = struct.Struct('<4sd')
+SYNC_REPLY = struct.Struct('<4sddd')
+SYNC_MAGIC = b'CLKS'
+
+# Stage name -> (start field, end field) in the record passed to LatencyTracker.add
+STAGES = (
+    ("capture->inference", "capture_time", "timestamp"),
+    ("inference->encode", "timestamp", "encode_time"),
+    ("encode->receive", "encode_time", "receive_time"),
+    ("capture->receive", "capture_time", "receive_time"),
+)
+
+
+class ClockSyncServer:
+    """Sender side: answers clock sync requests with its receive/send timestamps"""
+
+    def __init__(self, port, host="0.0.0.0"):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.5)
+        self.port = port
+        self.requests = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="clock-sync-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            try:
+                data, addr = self.sock.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            t1 = time.time()
+            if len(data) != SYNC_REQUEST.size:
+                continue
+            magic, t0 = SYNC_REQUEST.unpack(data)
+            if magic != SYNC_MAGIC:
+                continue
+            self.requests += 1
+            self.sock.sendto(SYNC_REPLY.pack(SYNC_MAGIC, t0, t1, time.time()), addr)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.sock.close()
+
+
+class ClockSyncClient:
+    """Receiver side: periodically measures offset = sender clock - receiver clock"""
+
+    def __init__(self, host, port, interval=1.0, window=16, timeout=0.5):
+        self.addr = (host, port)
+        self.interval = interval
+        self.timeout = timeout
+        self.samples = deque(maxlen=window)  # (rtt, offset)
+        self.sent = 0
+        self.lost = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(timeout)
+        self._running = False
+        self._thread = None
+
+    def measure(self):
+        """One request/reply exchange; returns (rtt, offset) or None"""
+        t0 = time.time()
+        self.sent += 1
+        try:
+            self.sock.sendto(SYNC_REQUEST.pack(SYNC_MAGIC, t0), self.addr)
+            while True:
+                data = self.sock.recv(64)
+                t3 = time.time()
+                if len(data) != SYNC_REPLY.size:
+                    continue
+                magic, echo, t1, t2 = SYNC_REPLY.unpack(data)
+                if magic == SYNC_MAGIC and echo == t0:
+                    break
+        except (socket.timeout, OSError):
+            self.lost += 1
+            return None
+        sample = ((t3 - t0) - (t2 - t1), ((t1 - t0) + (t2 - t3)) / 2.0)
+        self.samples.append(sample)
+        return sample
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="clock-sync-client", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            self.measure()
+            time.sleep(self.interval)
+
+    @property
+    def synced(self):
+        return bool(self.samples)
+
+    @property
+    def offset(self):
+        """Best current offset estimate in seconds (0.0 before the first reply)"""
+        if not self.samples:
+            return 0.0
+        return min(self.samples)[1]
+
+    @property
+    def rtt(self):
+        if not self.samples:
+            return 0.0
+        return min(self.samples)[0]
+
+    def summary(self):
+        if not self.samples:
+            return f"Clock sync {self.addr[0]}:{self.addr[1]}: no replies ({self.sent} sent)"
+        return (f"Clock sync {self.addr[0]}:{self.addr[1]}: offset {self.offset * 1000:+.2f} ms, "
+                f"best RTT {self.rtt * 1000:.2f} ms, {self.sent} sent, {self.lost} lost")
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + self.timeout + 0.5)
+        self.sock.close()
+
+
+class LatencyTracker:
+    """Rolling per-stage latency windows with percentiles"""
+
+    def __init__(self, window=300, percentiles=(50, 90, 99)):
+        self.window = window
+        self.percentiles = percentiles
+        self.samples = {name: deque(maxlen=window) for name, _, _ in STAGES}
+        self.count = 0
+
+    def add(self, record):
+        """record: dict with capture_time/timestamp/encode_time (sender clock) and receive_time
+        (already converted to the sender clock); stages with a missing end are skipped"""
+        for name, start, end in STAGES:
+            t_start, t_end = record.get(start), record.get(end)
+            if t_start is not None and t_end is not None:
+                self.samples[name].append(t_end - t_start)
+        self.count += 1
+
+    def stats(self):
+        """{stage: {'p50': ms, ..., 'max': ms, 'n': count}} over the current window"""
+        out = {}
+        for name, values in self.samples.items():
+            if not values:
+                continue
+            arr = np.fromiter(values, dtype=np.float64, count=len(values)) * 1000.0
+            row = {f"p{p}": float(v) for p, v in zip(self.percentiles, np.percentile(arr, self.percentiles))}
+            row["max"] = float(arr.max())
+            row["n"] = len(arr)
+            out[name] = row
+        return out
+
+    def lines(self):
+        """One formatted line per stage"""
+        out = []
+        for name, row in self.stats().items():
+            pcts = "  ".join(f"p{p} {row[f'p{p}']:7.1f}" for p in self.percentiles)
+            out.append(f"{name:<20} {pcts}  max {row['max']:7.1f} ms  (n={row['n']})")
+        return out
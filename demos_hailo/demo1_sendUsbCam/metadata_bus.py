@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+metadata_bus.py - Shared-memory ring publishing decoded tracking records to local consumers
+One receiver decodes the SEI and writes each frame's tracks into a fixed-size ring; any number
+of local processes (dashboard, counter, recorder) attach by name and read NumPy views of it.
+
+Layout (little-endian, one shared memory block):
+
+  header (64 bytes): magic 'SMTB' | version u16 | num_keypoints u16 | slots u32 |
+                     max_tracks u32 | slot_size u32 | reserved | write_seq u64 @ 24
+  slot i:            seq u64 | frame u32 | count u16 | flags u16 | timestamp f64 | pts u64 |
+                     tracks (max_tracks x sei_schema.track_dtype(num_keypoints))
+
+Single writer, lock-free readers (per-slot seqlock): the writer marks a slot odd (2n+1) while
+writing record n and even (2n+2) when done, then publishes write_seq = n+1. A reader that sees
+the same even seq before and after reading has a consistent record; otherwise it was overwritten.
+
+Usage:
+  python metadata_bus.py simtrack            # tail the bus published by trackReceiver.py --bus simtrack
+"""
+
+import argparse
+import sys
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from sei_schema import PTS_NONE, track_dtype
+
+MAGIC = b'SMTB'
+BUS_VERSION = 1
+HEADER_SIZE = 64
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('num_keypoints', '<u2'),
+    ('slots', '<u4'),
+    ('max_tracks', '<u4'),
+    ('slot_size', '<u4'),
+    ('reserved', '<u4'),
+    ('write_seq', '<u8'),
+])
+
+SLOT_HEADER_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('frame', '<u4'),
+    ('count', '<u2'),
+    ('flags', '<u2'),
+    ('timestamp', '<f8'),
+    ('pts', '<u8'),
+])
+
+FLAG_TRUNCATED = 0x01
+
+# tracks: NumPy view (copy=False) or copy of the record's tracks; seq: record number
+BusRecord = namedtuple("BusRecord", ["seq", "frame", "timestamp", "pts", "tracks"])
+
+
+def _slot_dtype(num_keypoints, max_tracks):
+    return np.dtype([
+        ('head', SLOT_HEADER_DTYPE),
+        ('tracks', track_dtype(num_keypoints), (max_tracks,)),
+    ])
+
+
+class MetadataBusWriter:
+    """Creates the shared memory ring and publishes one record per decoded frame"""
+
+    def __init__(self, name, slots=256, max_tracks=64, num_keypoints=0):
+        self.name = name
+        self.slot_dtype = _slot_dtype(num_keypoints, max_tracks)
+        size = HEADER_SIZE + slots * self.slot_dtype.itemsize
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Stale block left by a crashed receiver: replace it
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        # Lifetime is managed by close() (and the stale-block check above), not the resource tracker,
+        # so readers in the same process can unregister their attachment safely
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        self.header = np.ndarray((), HEADER_DTYPE, buffer=self.shm.buf)
+        self.ring = np.ndarray((slots,), self.slot_dtype, buffer=self.shm.buf, offset=HEADER_SIZE)
+        self.ring['head']['seq'] = 0
+
+        self.header['magic'] = MAGIC
+        self.header['version'] = BUS_VERSION
+        self.header['num_keypoints'] = num_keypoints
+        self.header['slots'] = slots
+        self.header['max_tracks'] = max_tracks
+        self.header['slot_size'] = self.slot_dtype.itemsize
+        self.header['write_seq'] = 0
+
+        self.slots = slots
+        self.max_tracks = max_tracks
+        self.num_keypoints = num_keypoints
+        self.seq = 0
+
+        # Statistics
+        self.published = 0
+        self.truncated = 0
+
+    def publish(self, frame, tracks=None, timestamp=0.0, pts=None):
+        """Write one frame's tracks (any track_dtype, wire or native) into the next slot"""
+        n = self.seq
+        slot = self.ring[n % self.slots]
+        head = slot['head']
+
+        count = 0 if tracks is None else len(tracks)
+        flags = 0
+        if count > self.max_tracks:
+            count = self.max_tracks
+            flags |= FLAG_TRUNCATED
+            self.truncated += 1
+
+        head['seq'] = 2 * n + 1  # odd: being written
+        head['frame'] = frame & 0xFFFFFFFF
+        head['count'] = count
+        head['flags'] = flags
+        head['timestamp'] = timestamp
+        head['pts'] = PTS_NONE if pts is None or pts < 0 else pts
+        if count:
+            dst = slot['tracks'][:count]
+            if tracks.dtype == dst.dtype:
+                dst[...] = tracks[:count]
+            else:
+                # Field by field (float16 wire -> float32, keypoints only if both sides have them)
+                for field in dst.dtype.names:
+                    if field in tracks.dtype.names and tracks.dtype[field].shape == dst.dtype[field].shape:
+                        dst[field] = tracks[field][:count]
+                    else:
+                        dst[field] = 0
+        head['seq'] = 2 * n + 2  # even: complete
+
+        self.seq = n + 1
+        self.header['write_seq'] = self.seq
+        self.published += 1
+
+    def summary(self):
+        return (f"Metadata bus '{self.name}': {self.published} records published, "
+                f"{self.truncated} truncated to {self.max_tracks} tracks, "
+                f"{self.slots} slots x {self.slot_dtype.itemsize} bytes")
+
+    def close(self):
+        """Detach and remove the shared memory block"""
+        self.header = None
+        self.ring = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class MetadataBusReader:
+    """Attaches to a bus by name; poll() returns the records written since the last call"""
+
+    def __init__(self, name, copy=False):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Readers never own the block: keep the resource tracker from unlinking it on exit
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        self.header = np.ndarray((), HEADER_DTYPE, buffer=self.shm.buf)
+        if bytes(self.header['magic']) != MAGIC or int(self.header['version']) != BUS_VERSION:
+            self.shm.close()
+            raise ValueError(f"'{name}' is not a version {BUS_VERSION} metadata bus")
+
+        self.slots = int(self.header['slots'])
+        self.max_tracks = int(self.header['max_tracks'])
+        self.num_keypoints = int(self.header['num_keypoints'])
+        self.slot_dtype = _slot_dtype(self.num_keypoints, self.max_tracks)
+        self.ring = np.ndarray((self.slots,), self.slot_dtype, buffer=self.shm.buf, offset=HEADER_SIZE)
+        self.copy = copy
+
+        # Start at the current end of the ring (only new records)
+        self.next_seq = int(self.header['write_seq'])
+
+        # Statistics
+        self.read_count = 0
+        self.lost = 0
+        self.torn = 0
+
+    def _read(self, n):
+        """Record n, or None if it has been overwritten (or is being overwritten)"""
+        slot = self.ring[n % self.slots]
+        head = slot['head']
+        expected = 2 * n + 2
+        if int(head['seq']) != expected:
+            return None
+        frame = int(head['frame'])
+        count = int(head['count'])
+        timestamp = float(head['timestamp'])
+        pts = int(head['pts'])
+        tracks = slot['tracks'][:count]
+        if self.copy:
+            tracks = tracks.copy()
+        if int(head['seq']) != expected:
+            return None
+        return BusRecord(n, frame, timestamp, None if pts == PTS_NONE else pts, tracks)
+
+    def is_valid(self, record):
+        """True while the slot behind a view-mode record has not been overwritten"""
+        return int(self.ring[record.seq % self.slots]['head']['seq']) == 2 * record.seq + 2
+
+    def poll(self):
+        """Records published since the last poll (oldest first); overwritten ones are counted as lost"""
+        write_seq = int(self.header['write_seq'])
+        if write_seq - self.next_seq > self.slots:
+            self.lost += write_seq - self.slots - self.next_seq
+            self.next_seq = write_seq - self.slots
+
+        records = []
+        for n in range(self.next_seq, write_seq):
+            record = self._read(n)
+            if record is None:
+                self.torn += 1
+                continue
+            records.append(record)
+        self.read_count += len(records)
+        self.next_seq = write_seq
+        return records
+
+    def latest(self):
+        """Most recent complete record (or None), without advancing poll()"""
+        write_seq = int(self.header['write_seq'])
+        if write_seq == 0:
+            return None
+        return self._read(write_seq - 1)
+
+    def wait(self, timeout=1.0, interval=0.002):
+        """poll() until at least one record arrives or timeout expires"""
+        deadline = time.monotonic() + timeout
+        while True:
+            records = self.poll()
+            if records or time.monotonic() >= deadline:
+                return records
+            time.sleep(interval)
+
+    def close(self):
+        self.header = None
+        self.ring = None
+        self.shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail a tracking metadata bus")
+    parser.add_argument("name", help="Bus name (trackReceiver.py --bus NAME)")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after N seconds (default: run forever)")
+    args = parser.parse_args()
+
+    try:
+        reader = MetadataBusReader(args.name)
+    except FileNotFoundError:
+        print(f"❌ No metadata bus named '{args.name}' (is trackReceiver.py --bus {args.name} running?)")
+        return 1
+
+    print(f"📡 Attached to '{args.name}': {reader.slots} slots, up to {reader.max_tracks} tracks, "
+          f"{reader.num_keypoints} keypoints")
+    start = time.monotonic()
+    try:
+        while not args.duration or time.monotonic() - start < args.duration:
+            for rec in reader.wait(timeout=1.0):
+                ids = rec.tracks['track_id'][:8].tolist()
+                print(f"#{rec.seq} frame {rec.frame:05d}: {len(rec.tracks)} tracks, ids {ids}")
+    except KeyboardInterrupt:
+        pass
+    print(f"📊 Read {reader.read_count} records, lost {reader.lost} (overwritten), torn {reader.torn}")
+    reader.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
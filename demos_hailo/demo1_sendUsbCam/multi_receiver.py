@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+multi_receiver.py - N RTP/H.264 tracking streams in one process and one pipeline
+One branch per UDP port (udpsrc -> depay -> h264parse), an optional compositor mosaic of the
+decoded branches, and a single SEI extraction worker shared by all streams: the pad probes only
+copy the small SEI NAL units, the worker decodes them off the streaming threads.
+Reports per-stream bitrate, frame rate, SEI rate and RTP loss.
+
+Usage: python trackReceiver.py 5000 5002 5004 5006 --mosaic
+       python multi_receiver.py 5000 5002 --report-interval 5
+"""
+
+import argparse
+import math
+import os
+import queue
+import sys
+import threading
+import time
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from event_log import get_event_log, add_log_arguments, configure_from_args
+from metrics import add_metrics_arguments, collect_queues, start_metrics, watch_fps
+
+from nal_index import index_leading_nalus, nal_view, NAL_SEI
+from trackReceiver import MultiFormatSEIExtractor
+
+log = get_event_log()
+
+
+class StreamStats:
+    """Counters for one stream; rates are computed between report snapshots"""
+
+    def __init__(self, index, port):
+        self.index = index
+        self.port = port
+        self.rtp_packets = 0
+        self.rtp_bytes = 0
+        self.rtp_lost = 0
+        self.rtp_reordered = 0
+        self.last_seq = None
+        self.frames = 0
+        self.sei_nalus = 0
+        self.sei_records = 0
+        self.last_frame = 0
+        self.objects = 0
+        self._snapshot = (time.monotonic(), 0, 0, 0)
+
+    def on_rtp(self, header, size):
+        """Count one RTP packet; header = first 4 bytes (sequence number in bytes 2-3)"""
+        self.rtp_packets += 1
+        self.rtp_bytes += size
+        seq = (header[2] << 8) | header[3]
+        if self.last_seq is not None:
+            gap = (seq - self.last_seq) & 0xFFFF
+            if gap == 0 or gap > 0x8000:
+                # Duplicate or late packet; a late one was already counted as lost
+                self.rtp_reordered += 1
+                if gap and self.rtp_lost:
+                    self.rtp_lost -= 1
+                return
+            self.rtp_lost += gap - 1
+        self.last_seq = seq
+
+    def loss_percent(self):
+        expected = self.rtp_packets + self.rtp_lost
+        return self.rtp_lost / expected * 100.0 if expected else 0.0
+
+    def rates(self):
+        """(Mbit/s, frames/s, SEI records/s) since the previous call"""
+        now = time.monotonic()
+        t, rtp_bytes, frames, sei = self._snapshot
+        dt = max(now - t, 1e-6)
+        self._snapshot = (now, self.rtp_bytes, self.frames, self.sei_records)
+        return ((self.rtp_bytes - rtp_bytes) * 8 / dt / 1e6,
+                (self.frames - frames) / dt,
+                (self.sei_records - sei) / dt)
+
+
+class MultiStreamReceiver:
+    """One pipeline, one branch per port, one SEI decode worker"""
+
+    def __init__(self, ports, mosaic=False, tile_width=480, tile_height=270, report_interval=5,
+                 queue_size=256, metrics=None):
+        self.ports = ports
+        self.mosaic = mosaic
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.report_interval = report_interval
+        self.pipeline = None
+        self.loop = None
+        self.start_time = time.time()
+
+        self.streams = [StreamStats(i, port) for i, port in enumerate(ports)]
+
+        # Probes hand (stream index, SEI NAL bytes, pts) to the shared worker
+        self.sei_queue = queue.Queue(maxsize=queue_size)
+        self.sei_dropped = 0
+        self.worker = None
+
+        # OpenMetrics registry (--metrics-port), read by the HTTP thread at scrape time
+        self.metrics = metrics
+
+        Gst.init(None)
+
+    # -------- pipeline --------
+
+    def branch_description(self, i, port):
+        rtp_caps = "application/x-rtp,media=video,encoding-name=H264,payload=96"
+        parts = [
+            f"udpsrc port={port} name=src{i} caps=\"{rtp_caps}\" !",
+            f"rtph264depay name=depay{i} !",
+            f"h264parse name=parse{i} config-interval=-1 !",
+            # One access unit per buffer: the SEI probe only reads the NAL units before the first slice
+            "video/x-h264,stream-format=byte-stream,alignment=au !",
+        ]
+        if self.mosaic:
+            parts += [
+                f"queue name=dec_q{i} leaky=downstream max-size-buffers=5 max-size-bytes=0 max-size-time=0 !",
+                "avdec_h264 ! videoconvert ! videoscale !",
+                f"video/x-raw,width={self.tile_width},height={self.tile_height} !",
+                f"mosaic.sink_{i}",
+            ]
+        else:
+            parts += [f"fakesink name=sink{i} sync=false async=false"]
+        return " ".join(parts)
+
+    def mosaic_description(self):
+        cols = math.ceil(math.sqrt(len(self.ports)))
+        pads = " ".join(
+            f"sink_{i}::xpos={(i % cols) * self.tile_width} sink_{i}::ypos={(i // cols) * self.tile_height}"
+            for i in range(len(self.ports))
+        )
+        return (f"compositor name=mosaic background=black {pads} ! videoconvert ! "
+                "fpsdisplaysink name=display video-sink=xvimagesink sync=false text-overlay=true")
+
+    def create_pipeline(self):
+        parts = [self.branch_description(i, port) for i, port in enumerate(self.ports)]
+        if self.mosaic:
+            parts.insert(0, self.mosaic_description())
+        pipeline_str = "  ".join(parts)
+
+        try:
+            self.pipeline = Gst.parse_launch(pipeline_str)
+        except GLib.GError as e:
+            print(f"Error creating pipeline: {e}")
+            sys.exit(1)
+
+        for stream in self.streams:
+            i = stream.index
+            self.pipeline.get_by_name(f"src{i}").get_static_pad("src").add_probe(
+                Gst.PadProbeType.BUFFER, self.on_rtp_probe, stream)
+            self.pipeline.get_by_name(f"parse{i}").get_static_pad("src").add_probe(
+                Gst.PadProbeType.BUFFER, self.on_sei_probe, stream)
+
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self.on_message)
+
+    def register_metrics(self):
+        if self.metrics is None:
+            return
+        self.metrics.declare("sei_dropped", "counter", "SEI NAL units dropped (worker queue full)")
+        self.metrics.add_collector(self.collect_metrics)
+        self.metrics.add_collector(collect_queues(self.pipeline))
+        watch_fps(self.metrics, self.pipeline.get_by_name("display"))
+
+    def collect_metrics(self, m):
+        """Per-stream counters, labelled by port"""
+        for s in self.streams:
+            port = str(s.port)
+            m.set("rtp_packets", s.rtp_packets, port=port)
+            m.set("rtp_lost", s.rtp_lost, port=port)
+            m.set("frames", s.frames, port=port)
+            m.set("sei", s.sei_records, port=port)
+            m.set("objects", s.objects, port=port)
+        m.set("sei_dropped", self.sei_dropped)
+
+    # -------- streaming threads --------
+
+    def on_rtp_probe(self, pad, info, stream):
+        """Bitrate and loss from the RTP header (only its first 4 bytes are read)"""
+        buffer = info.get_buffer()
+        if buffer is None:
+            return Gst.PadProbeReturn.OK
+        header = buffer.extract_dup(0, 4)
+        if len(header) == 4:
+            stream.on_rtp(header, buffer.get_size())
+        return Gst.PadProbeReturn.OK
+
+    def on_sei_probe(self, pad, info, stream):
+        """Copy the SEI NAL units out of the AU head and queue them for the worker"""
+        buffer = info.get_buffer()
+        if buffer is None:
+            return Gst.PadProbeReturn.OK
+        stream.frames += 1
+
+        success, map_info = buffer.map(Gst.MapFlags.READ)
+        if not success:
+            return Gst.PadProbeReturn.OK
+        try:
+            nalus, _ = index_leading_nalus(map_info.data)
+            sei_nalus = [bytes(nal_view(map_info.data, nal)) for nal in nalus if nal.type == NAL_SEI]
+        finally:
+            buffer.unmap(map_info)
+
+        for sei_nal in sei_nalus:
+            stream.sei_nalus += 1
+            try:
+                self.sei_queue.put_nowait((stream.index, sei_nal, buffer.pts))
+            except queue.Full:
+                self.sei_dropped += 1
+        return Gst.PadProbeReturn.OK
+
+    # -------- shared SEI worker --------
+
+    def sei_worker(self):
+        while True:
+            item = self.sei_queue.get()
+            if item is None:
+                break
+            index, sei_nal, pts = item
+            stream = self.streams[index]
+            try:
+                records = MultiFormatSEIExtractor.extract_from_sei_payload(sei_nal[1:])
+            except Exception as e:
+                log.error("❌ Stream %d (port %d): SEI decode failed: %s", index, stream.port, e)
+                continue
+            for record in records:
+                stream.sei_records += 1
+                stream.last_frame = record.get('frame', 0)
+                stream.objects = record.get('objects', 0)
+                log.log("track", "[%d:%d] frame %s: %s objects (pts %s)",
+                        index, stream.port, stream.last_frame, stream.objects, pts)
+
+    # -------- reporting --------
+
+    def report(self):
+        print(f"\n{'stream':<8}{'port':>6}{'Mbit/s':>9}{'fps':>7}{'SEI/s':>7}{'loss %':>8}"
+              f"{'lost':>7}{'frame':>8}{'objs':>6}")
+        for s in self.streams:
+            mbps, fps, sei_rate = s.rates()
+            print(f"{s.index:<8}{s.port:>6}{mbps:>9.2f}{fps:>7.1f}{sei_rate:>7.1f}{s.loss_percent():>8.2f}"
+                  f"{s.rtp_lost:>7}{s.last_frame:>8}{s.objects:>6}")
+        if self.sei_dropped:
+            print(f"⚠️  SEI worker queue full: {self.sei_dropped} SEI NAL units dropped")
+        return True
+
+    def print_final_statistics(self):
+        runtime = time.time() - self.start_time
+        print("\n" + "=" * 60)
+        print(f"📊 FINAL MULTI-STREAM STATISTICS ({len(self.streams)} streams, {runtime:.1f} s)")
+        print("=" * 60)
+        for s in self.streams:
+            mbps = s.rtp_bytes * 8 / max(runtime, 1e-6) / 1e6
+            print(f"📡 [{s.index}] port {s.port}: {s.rtp_packets} RTP packets, {mbps:.2f} Mbit/s avg, "
+                  f"lost {s.rtp_lost} ({s.loss_percent():.2f}%), reordered {s.rtp_reordered}, "
+                  f"{s.frames} frames, {s.sei_records} SEI records")
+        print(f"🧵 SEI worker: {self.sei_dropped} dropped (queue full)")
+        print(f"📝 {log.summary()}")
+        print("=" * 60)
+
+    # -------- lifecycle --------
+
+    def on_message(self, bus, message):
+        t = message.type
+        if t == Gst.MessageType.EOS:
+            print("\n✅ All streams complete")
+            self.stop()
+        elif t == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            print(f"\n❌ Error from {message.src.get_name()}: {err}, {debug}")
+            self.stop()
+
+    def start(self):
+        print("=" * 60)
+        print("MULTI-STREAM H.264 TRACKING RECEIVER")
+        print("=" * 60)
+        print(f"📡 UDP ports: {', '.join(str(p) for p in self.ports)}")
+        print(f"📺 Mosaic: {'Enabled' if self.mosaic else 'Disabled'}")
+        print("=" * 60)
+
+        self.create_pipeline()
+        self.register_metrics()
+        self.worker = threading.Thread(target=self.sei_worker, name="sei-worker", daemon=True)
+        self.worker.start()
+
+        ret = self.pipeline.set_state(Gst.State.PLAYING)
+        if ret == Gst.StateChangeReturn.FAILURE:
+            print("Unable to set pipeline to playing state")
+            sys.exit(1)
+
+        self.loop = GLib.MainLoop()
+        if self.report_interval:
+            GLib.timeout_add_seconds(self.report_interval, self.report)
+        try:
+            self.loop.run()
+        except KeyboardInterrupt:
+            print("\n⏹️  Interrupted by user")
+            self.stop()
+
+    def stop(self):
+        if self.pipeline:
+            self.pipeline.set_state(Gst.State.NULL)
+        if self.worker is not None:
+            self.sei_queue.put(None)
+            self.worker.join(timeout=2.0)
+            self.worker = None
+            self.print_final_statistics()
+        if self.loop:
+            self.loop.quit()
+        print("🛑 Multi-stream receiver stopped")
+
+
+def add_multi_arguments(parser):
+    """Options shared by trackReceiver.py (several ports) and this script"""
+    parser.add_argument('--mosaic', action='store_true', help='Composite the decoded streams into one window')
+    parser.add_argument('--tile', default='480x270', help='Mosaic tile size WxH (default: 480x270)')
+    parser.add_argument('--report-interval', type=int, default=5,
+                        help='Seconds between per-stream stat tables, 0 = off (default: 5)')
+
+
+def run(ports, args):
+    tile_width, tile_height = (int(v) for v in args.tile.lower().split('x'))
+    receiver = MultiStreamReceiver(ports, args.mosaic, tile_width, tile_height, args.report_interval,
+                                   metrics=start_metrics(args, "multi_receiver"))
+    try:
+        receiver.start()
+    finally:
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Receive several tracking streams in one pipeline')
+    parser.add_argument('ports', type=int, nargs='+', help='UDP ports, one per stream')
+    add_multi_arguments(parser)
+    add_metrics_arguments(parser)
+    add_log_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    run(args.ports, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+nal_index.py - Fast H.264 NAL unit indexing shared by trackSender and trackReceiver
+Finds start codes with NumPy (or bytes.find) instead of stepping byte by byte in Python.
+Every function accepts bytes, bytearray or a memoryview (e.g. a mapped Gst.Buffer) and
+returns (offset, type, length) tuples pointing into it, so nothing is copied.
+"""
+
+from collections import namedtuple
+
+# Optional NumPy fast path
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except Exception:
+    HAVE_NUMPY = False
+
+START_CODE = b'\x00\x00\x01'
+
+NAL_SLICE = 1
+NAL_IDR = 5
+NAL_SEI = 6
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9
+
+NAL_NAMES = {1: "P-slice", 5: "IDR", 6: "SEI", 7: "SPS", 8: "PPS", 9: "AUD"}
+
+# offset: first byte of the NAL header (after the start code / length prefix)
+# type:   nal_unit_type (header & 0x1F)
+# length: NAL size in bytes including the header, excluding the start code
+NalUnit = namedtuple("NalUnit", ["offset", "type", "length"])
+
+
+def _start_codes_numpy(data):
+    """Return positions of every 00 00 01 using vectorized compares over the buffer"""
+    a = np.frombuffer(data, dtype=np.uint8)
+    if a.size < 3:
+        return []
+    # Look for the 0x01 first (rare in compressed data), then confirm the two zeros
+    cand = np.flatnonzero(a[2:] == 1)
+    if cand.size == 0:
+        return []
+    cand = cand[(a[cand] == 0) & (a[cand + 1] == 0)]
+    return cand.tolist()
+
+
+def _start_codes_find(data):
+    """Return positions of every 00 00 01 using bytes.find (C speed, no per-byte loop)"""
+    if not isinstance(data, (bytes, bytearray)):
+        data = bytes(data)
+    positions = []
+    find = data.find
+    i = find(START_CODE)
+    while i != -1:
+        positions.append(i)
+        i = find(START_CODE, i + 3)
+    return positions
+
+
+def find_start_codes(data):
+    """Positions of all 3-byte start code patterns in an Annex-B buffer"""
+    if isinstance(data, (bytes, bytearray)) or not HAVE_NUMPY:
+        return _start_codes_find(data)
+    return _start_codes_numpy(data)
+
+
+def index_nalus(data):
+    """Index NAL units in byte-stream (Annex-B) format -> list of NalUnit"""
+    view = data if isinstance(data, (bytes, bytearray)) else memoryview(data).cast('B')
+    size = len(view)
+    positions = find_start_codes(view)
+
+    nalus = []
+    count = len(positions)
+    for n in range(count):
+        header = positions[n] + 3
+        if header >= size:
+            break
+        if n + 1 < count:
+            end = positions[n + 1]
+            # 4-byte start code: the leading zero belongs to the next NAL's prefix
+            if end > header and view[end - 1] == 0:
+                end -= 1
+        else:
+            end = size
+        nalus.append(NalUnit(header, view[header] & 0x1F, end - header))
+    return nalus
+
+
+def index_avc_nalus(data, length_size=4):
+    """Index NAL units in AVC (length-prefixed) format -> list of NalUnit"""
+    view = memoryview(data).cast('B') if not isinstance(data, (bytes, bytearray)) else data
+    size = len(view)
+    nalus = []
+    i = 0
+    while i + length_size < size:
+        nal_length = int.from_bytes(view[i:i + length_size], 'big')
+        start = i + length_size
+        if nal_length <= 0 or start + nal_length > size:
+            break
+        nalus.append(NalUnit(start, view[start] & 0x1F, nal_length))
+        i = start + nal_length
+    return nalus
+
+
+def find_nal(nalus, nal_type):
+    """First NalUnit of the given type, or None"""
+    for nal in nalus:
+        if nal.type == nal_type:
+            return nal
+    return None
+
+
+def start_code_offset(data, nal):
+    """Offset of the start code in front of an Annex-B NalUnit (3 or 4 byte prefix)"""
+    offset = nal.offset
+    if offset >= 4 and data[offset - 4] == 0:
+        return offset - 4
+    return offset - 3
+
+
+def nal_view(data, nal):
+    """Zero-copy memoryview over one NAL unit (header included)"""
+    return memoryview(data)[nal.offset:nal.offset + nal.length]
+
+
+def find_first_vcl(nalus):
+    """First slice NAL (types 1-5), where SEI must be inserted before, or None"""
+    for nal in nalus:
+        if 1 <= nal.type <= 5:
+            return nal
+    return None
+
+
+def is_vcl(nal_type):
+    """Slice NAL types (coded picture data)"""
+    return 1 <= nal_type <= 5
+
+
+def _next_start_code(view, pos, window=64):
+    """Next start code at or after pos, searching growing windows; returns (position or -1, bytes scanned up to)"""
+    size = len(view)
+    while pos < size:
+        end = min(size, pos + window)
+        hits = find_start_codes(view[pos:end])
+        if hits:
+            return pos + hits[0], pos + hits[0] + 3
+        if end == size:
+            return -1, size
+        # Overlap so a start code on the window edge is not missed
+        pos = end - 2
+        window *= 2
+    return -1, size
+
+
+def index_leading_nalus(data, stream_format="byte-stream", length_size=4):
+    """Index only the non-VCL NAL units in front of the first slice of an access unit
+
+    Slice data is never read. Returns (nalus, scanned) where scanned is the number of
+    leading bytes that were looked at; the rest of the buffer was skipped.
+    """
+    view = memoryview(data).cast('B') if not isinstance(data, (bytes, bytearray)) else memoryview(data)
+    size = len(view)
+    nalus = []
+
+    if stream_format == "avc":
+        i = 0
+        while i + length_size < size:
+            nal_length = int.from_bytes(view[i:i + length_size], 'big')
+            start = i + length_size
+            if nal_length <= 0 or start + nal_length > size:
+                return nalus, start
+            nal_type = view[start] & 0x1F
+            if is_vcl(nal_type):
+                return nalus, start + 1
+            nalus.append(NalUnit(start, nal_type, nal_length))
+            i = start + nal_length
+        return nalus, size
+
+    sc, scanned = _next_start_code(view, 0)
+    while sc != -1:
+        header = sc + 3
+        if header >= size:
+            return nalus, size
+        nal_type = view[header] & 0x1F
+        if is_vcl(nal_type):
+            return nalus, header + 1
+        sc, scanned = _next_start_code(view, header + 1)
+        end = size if sc == -1 else sc
+        if sc != -1 and end > header and view[end - 1] == 0:
+            end -= 1
+        nalus.append(NalUnit(header, nal_type, end - header))
+    return nalus, scanned
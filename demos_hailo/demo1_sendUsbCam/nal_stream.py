@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+nal_stream.py - Incremental H.264 parser that pulls SEI NAL units out of a buffer stream
+Keeps a small carry-over between buffers so NAL units split across buffers are not lost,
+works directly on the mapped memoryview and only copies the bytes of SEI NAL units.
+"""
+
+from nal_index import find_start_codes, NAL_SEI
+
+
+class StreamingSEIParser:
+    """Feed consecutive buffers, get back complete SEI NAL units (header byte included)"""
+
+    def __init__(self, stream_format="byte-stream", length_size=4, max_sei_size=65536):
+        self.stream_format = stream_format
+        self.length_size = length_size
+        self.max_sei_size = max_sei_size
+
+        # Carry-over state
+        self._tail = b''              # byte-stream: last 2 bytes (start code split across buffers)
+        self._prefix = bytearray()    # avc: partial length prefix
+        self._remaining = 0           # avc: bytes left in the current NAL
+        self._header_pending = False  # NAL header byte is in the next buffer
+        self._collect = None          # bytes of the SEI NAL being assembled
+
+        # Statistics
+        self.buffers = 0
+        self.bytes_seen = 0
+        self.nal_count = 0
+        self.sei_count = 0
+        self.sei_bytes = 0
+        self.oversized = 0
+
+    def feed(self, data):
+        """Parse one buffer (bytes or memoryview) and return the SEI NAL units completed in it"""
+        view = memoryview(data).cast('B') if not isinstance(data, (bytes, bytearray)) else memoryview(data)
+        self.buffers += 1
+        self.bytes_seen += len(view)
+        if self.stream_format == "avc":
+            return self._feed_avc(view)
+        return self._feed_byte_stream(view)
+
+    def flush(self):
+        """End of stream: return the SEI still being assembled (byte-stream NALs end at EOS)"""
+        out = []
+        if self._collect is not None and self.stream_format != "avc":
+            self._finish(out, self._collect.rstrip(b'\x00'))
+        self._collect = None
+        self._header_pending = False
+        self._tail = b''
+        self._prefix.clear()
+        self._remaining = 0
+        return out
+
+    # -------- shared helpers --------
+
+    def _begin_nal(self, header):
+        """Header byte read: collect the NAL only if it is an SEI"""
+        self.nal_count += 1
+        if header & 0x1F == NAL_SEI:
+            self._collect = bytearray((header,))
+        else:
+            self._collect = None
+
+    def _append(self, chunk):
+        if self._collect is None:
+            return
+        if len(self._collect) + len(chunk) > self.max_sei_size:
+            self.oversized += 1
+            self._collect = None
+            return
+        self._collect += chunk
+
+    def _finish(self, out, nal):
+        self.sei_count += 1
+        self.sei_bytes += len(nal)
+        out.append(bytes(nal))
+
+    # -------- AVC (length-prefixed) --------
+
+    def _feed_avc(self, view):
+        out = []
+        size = len(view)
+        i = 0
+        while i < size:
+            if self._header_pending:
+                self._begin_nal(view[i])
+                self._header_pending = False
+                i += 1
+                self._remaining -= 1
+
+            if self._remaining > 0:
+                # Inside a NAL body: copy it only for SEI, otherwise jump over it
+                take = min(self._remaining, size - i)
+                if self._collect is not None:
+                    self._append(view[i:i + take])
+                i += take
+                self._remaining -= take
+
+            if self._remaining == 0 and self._collect is not None:
+                self._finish(out, self._collect)
+                self._collect = None
+
+            if i >= size:
+                break
+
+            # Length prefix (may be split across buffers)
+            need = self.length_size - len(self._prefix)
+            chunk = view[i:i + need]
+            self._prefix += chunk
+            i += len(chunk)
+            if len(self._prefix) < self.length_size:
+                break
+            nal_length = int.from_bytes(self._prefix, 'big')
+            self._prefix.clear()
+            if nal_length > 0:
+                self._remaining = nal_length
+                self._header_pending = True
+        return out
+
+    # -------- byte-stream (Annex-B) --------
+
+    def _feed_byte_stream(self, view):
+        out = []
+        size = len(view)
+        pos = 0
+
+        if self._header_pending and size:
+            self._begin_nal(view[0])
+            self._header_pending = False
+            pos = 1
+
+        # Start codes that began in the previous buffer's tail, then the ones inside this buffer
+        starts = []
+        if self._tail:
+            junction = self._tail + bytes(view[:2])
+            starts = [p - len(self._tail) for p in find_start_codes(junction) if p < len(self._tail)]
+        starts.extend(p for p in find_start_codes(view) if p >= pos)
+
+        for start in starts:
+            if self._collect is not None:
+                if start > pos:
+                    self._append(view[pos:start])
+                elif start < 0:
+                    # Part of this start code was appended from the previous buffer
+                    del self._collect[len(self._collect) + start:]
+                if self._collect is not None:
+                    # Trailing zero of a 4-byte start code is not part of the SEI
+                    self._finish(out, self._collect.rstrip(b'\x00'))
+                    self._collect = None
+
+            header = start + 3
+            if header >= size:
+                self._header_pending = True
+                pos = size
+                break
+            self._begin_nal(view[header])
+            pos = header + 1
+
+        if self._collect is not None and pos < size:
+            self._append(view[pos:size])
+
+        self._tail = bytes(view[-2:]) if size >= 2 else (self._tail + bytes(view))[-2:]
+        return out
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+pts_join.py - Bounded PTS-keyed ring joining inference metadata to encoded frames
+The detection branch (hailonet) and the encode branch see the same buffer PTS after the tee,
+so tracking data stored under the buffer PTS can be matched to the exact encoded frame.
+"""
+
+import threading
+import time
+
+
+class PtsMetadataRing:
+    """Fixed-size ring of (pts -> metadata); the oldest entry is overwritten when full"""
+
+    def __init__(self, capacity=64, tolerance_ns=0):
+        self.capacity = capacity
+        self.tolerance_ns = tolerance_ns
+
+        self._pts = [None] * capacity
+        self._items = [None] * capacity
+        self._stamps = [0.0] * capacity
+        self._seq = [0] * capacity
+        self._index = {}
+        self._head = 0
+        self._put_count = 0
+        self._lock = threading.Lock()
+
+        # Join statistics
+        self.hits = 0
+        self.nearest_hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.lag_frames_total = 0
+        self.lag_frames_max = 0
+        self.lag_time_total = 0.0
+        self.lag_time_max = 0.0
+
+    def put(self, pts, item):
+        """Store metadata for a buffer PTS (no-op for invalid PTS)"""
+        if pts is None or pts < 0:
+            return
+        with self._lock:
+            slot = self._head
+            old_pts = self._pts[slot]
+            if old_pts is not None and self._index.get(old_pts) == slot:
+                del self._index[old_pts]
+                self.evicted += 1
+
+            self._put_count += 1
+            self._pts[slot] = pts
+            self._items[slot] = item
+            self._stamps[slot] = time.monotonic()
+            self._seq[slot] = self._put_count
+            self._index[pts] = slot
+            self._head = (slot + 1) % self.capacity
+
+    def _find_slot(self, pts):
+        slot = self._index.get(pts)
+        if slot is not None or not self.tolerance_ns:
+            return slot, False
+        best, best_delta = None, self.tolerance_ns + 1
+        for key, candidate in self._index.items():
+            delta = abs(key - pts)
+            if delta < best_delta:
+                best, best_delta = candidate, delta
+        return best, best is not None
+
+    def lookup(self, pts):
+        """Metadata for pts if already stored (does not consume or count)"""
+        with self._lock:
+            slot, _ = self._find_slot(pts)
+            return None if slot is None else self._items[slot]
+
+    def join(self, pts):
+        """Consume the metadata stored for pts and record hit/miss and lag, or return None"""
+        with self._lock:
+            slot, nearest = self._find_slot(pts) if pts is not None and pts >= 0 else (None, False)
+            if slot is None:
+                self.misses += 1
+                return None
+
+            item = self._items[slot]
+            del self._index[self._pts[slot]]
+
+            lag_frames = self._put_count - self._seq[slot]
+            lag_time = time.monotonic() - self._stamps[slot]
+            self.hits += 1
+            self.nearest_hits += int(nearest)
+            self.lag_frames_total += lag_frames
+            self.lag_frames_max = max(self.lag_frames_max, lag_frames)
+            self.lag_time_total += lag_time
+            self.lag_time_max = max(self.lag_time_max, lag_time)
+            return item
+
+    def summary(self):
+        """One-line join report"""
+        joins = self.hits + self.misses
+        hit_rate = (self.hits / joins * 100.0) if joins else 0.0
+        avg_frames = (self.lag_frames_total / self.hits) if self.hits else 0.0
+        avg_ms = (self.lag_time_total / self.hits * 1000.0) if self.hits else 0.0
+        return (f"PTS join: {self.hits} hits ({self.nearest_hits} nearest), {self.misses} misses "
+                f"({hit_rate:.1f}% hit), lag avg {avg_frames:.1f} frames / {avg_ms:.1f} ms, "
+                f"max {self.lag_frames_max} frames / {self.lag_time_max * 1000.0:.1f} ms, "
+                f"evicted unjoined {self.evicted}")
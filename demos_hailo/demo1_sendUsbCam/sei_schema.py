@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+sei_schema.py - Compact binary tracking payload carried in the SIMTRACK SEI
+Versioned, struct-packed layout shared by trackSender and trackReceiver:
+
+  user_data_unregistered payload = SIMTRACK UUID (16 bytes)
+                                 + header (HEADER, little-endian, 28 bytes)
+                                 + count x track record (track_dtype, packed)
+
+  header: version u8 | flags u8 | num_keypoints u8 | reserved u8 | frame u32 |
+          count u16 | reserved u16 | timestamp f64 | pts u64
+
+  [ timing (version 2, FLAG_TIMING): capture_time f64 | encode_time f64 ]   (sender wall clock; timestamp = inference done)
+
+  track:  track_id i4 | class_id i2 | confidence f2 | bbox f2[4] (xmin, ymin, w, h; normalized)
+          [ keypoints f2[K][3] (x, y, confidence; normalized to the frame) ]
+
+Version 2 added the timing block between the header and the tracks. Payloads without timing are still
+written as version 1, so receivers that only know version 1 keep working; a timing payload is rejected
+by them (version check) instead of being read 16 bytes out of place.
+
+The legacy payload (UUID + JSON text) starts with '{' after the UUID, the binary one with the
+version byte, so a receiver can tell them apart from the first byte.
+"""
+
+import re
+import struct
+
+import numpy as np
+
+SIMTRACK_UUID = b'SIMTRACK' + b'\x00' * 8
+
+SCHEMA_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+HEADER = struct.Struct('<BBBBIHHdQ')
+
+FLAG_KEYPOINTS = 0x01
+FLAG_TIMING = 0x02
+
+TIMING = struct.Struct('<dd')
+
+PTS_NONE = 0xFFFFFFFFFFFFFFFF  # Gst.CLOCK_TIME_NONE
+
+SEI_USER_DATA_UNREGISTERED = 5
+
+_EMULATION_INSERT = re.compile(b'\x00\x00(?=[\x00-\x03])')
+_EMULATION_REMOVE = re.compile(b'\x00\x00\x03')
+
+
+def track_dtype(num_keypoints=0, wire=False):
+    """Structured dtype for one frame's tracks (wire=True: packed float16 layout sent in the SEI)"""
+    f = '<f2' if wire else '<f4'
+    fields = [
+        ('track_id', '<i4'),
+        ('class_id', '<i2'),  # -1 = detection without a class; same bytes as the former u2 for 0..32767
+        ('confidence', f),
+        ('bbox', f, (4,)),
+    ]
+    if num_keypoints:
+        fields.append(('keypoints', f, (num_keypoints, 3)))
+    return np.dtype(fields)
+
+
+def empty_tracks(count, num_keypoints=0):
+    """Preallocated track array (track_id -1 = not tracked)"""
+    tracks = np.zeros(count, dtype=track_dtype(num_keypoints))
+    tracks['track_id'] = -1
+    return tracks
+
+
+def num_keypoints_of(tracks):
+    """Keypoints per object stored in a track array's dtype"""
+    if 'keypoints' not in tracks.dtype.names:
+        return 0
+    return tracks.dtype['keypoints'].shape[0]
+
+
+def encode_payload(frame, tracks, timestamp, pts=None, timing=None):
+    """Pack one frame's tracks into the binary payload (without UUID)
+
+    timing: optional (capture_time, encode_time) wall-clock pair for latency measurement
+    """
+    num_keypoints = num_keypoints_of(tracks)
+    wire = tracks.astype(track_dtype(num_keypoints, wire=True), copy=False)
+    flags = FLAG_KEYPOINTS if num_keypoints else 0
+    version = 1
+    if timing is not None:
+        flags |= FLAG_TIMING
+        version = SCHEMA_VERSION
+    header = HEADER.pack(
+        version, flags, num_keypoints, 0,
+        frame & 0xFFFFFFFF, len(wire), 0,
+        timestamp, PTS_NONE if pts is None else pts,
+    )
+    if timing is not None:
+        header += TIMING.pack(*timing)
+    return header + wire.tobytes()
+
+
+def is_binary_payload(payload):
+    """True if the bytes after the UUID look like this schema rather than legacy JSON"""
+    return len(payload) >= HEADER.size and payload[0] in SUPPORTED_VERSIONS
+
+
+def decode_payload(payload):
+    """Unpack a binary payload (without UUID) into a metadata dict with a zero-copy track array"""
+    version, flags, num_keypoints, _, frame, count, _, timestamp, pts = HEADER.unpack_from(payload)
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"unsupported SEI schema version {version}")
+
+    offset = HEADER.size
+    capture_time = encode_time = None
+    if version >= 2 and flags & FLAG_TIMING:
+        if offset + TIMING.size > len(payload):
+            raise ValueError("truncated SEI payload: timing block missing")
+        capture_time, encode_time = TIMING.unpack_from(payload, offset)
+        offset += TIMING.size
+
+    dtype = track_dtype(num_keypoints, wire=True)
+    if offset + count * dtype.itemsize > len(payload):
+        raise ValueError(f"truncated SEI payload: {count} tracks need "
+                         f"{offset + count * dtype.itemsize} bytes, got {len(payload)}")
+
+    tracks = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+    return {
+        'version': version,
+        'frame': frame,
+        'objects': count,
+        'timestamp': timestamp,
+        'pts': None if pts == PTS_NONE else pts,
+        'capture_time': capture_time,
+        'encode_time': encode_time,
+        'tracks': tracks,
+    }
+
+
+def add_emulation_prevention(rbsp):
+    """Insert 0x03 after every 00 00 that is followed by a byte <= 3"""
+    return _EMULATION_INSERT.sub(b'\x00\x00\x03', rbsp)
+
+
+def remove_emulation_prevention(ebsp):
+    """Drop emulation prevention bytes (00 00 03 -> 00 00)"""
+    return _EMULATION_REMOVE.sub(b'\x00\x00', bytes(ebsp))
+
+
+def build_sei_nal(user_data, uuid=SIMTRACK_UUID):
+    """Annex-B SEI NAL (start code included) with one user_data_unregistered message"""
+    payload_size = len(uuid) + len(user_data)
+
+    sei = bytearray()
+    sei.append(SEI_USER_DATA_UNREGISTERED)
+    while payload_size >= 255:
+        sei.append(0xFF)
+        payload_size -= 255
+    sei.append(payload_size)
+    sei.extend(uuid)
+    sei.extend(user_data)
+    sei.append(0x80)  # RBSP stop bit
+
+    return b'\x00\x00\x00\x01\x06' + add_emulation_prevention(bytes(sei))
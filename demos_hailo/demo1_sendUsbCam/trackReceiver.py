@@ -8,16 +8,29 @@ Usage: python multi_format_receiver.py 5000 --display
 import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
+import os
 import sys
 import json
 import argparse
 import time
 import struct
 
+from nal_index import index_leading_nalus, nal_view, NAL_SEI
+from nal_stream import StreamingSEIParser
+from sei_schema import SIMTRACK_UUID, is_binary_payload, decode_payload, remove_emulation_prevention
+from metadata_bus import MetadataBusWriter
+from latency import ClockSyncClient, LatencyTracker
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from event_log import get_event_log, add_log_arguments, configure_from_args
+from metrics import add_metrics_arguments, collect_queues, start_metrics, watch_fps
+
+log = get_event_log()
+
 class MultiFormatSEIExtractor:
     """SEI extractor that handles both byte-stream and AVC formats"""
     
-    CUSTOM_UUID = b'SIMTRACK' + b'\x00' * 8  # Custom UUID for simple tracking data
+    CUSTOM_UUID = SIMTRACK_UUID  # Custom UUID for simple tracking data
     
     @staticmethod
     def detect_stream_format(data):
@@ -37,118 +50,16 @@ class MultiFormatSEIExtractor:
         
         return "unknown"
     
-    @staticmethod
-    def parse_byte_stream_nalus(data):
-        """Parse NAL units in byte-stream format"""
-        nalus = []
-        i = 0
-        
-        while i < len(data) - 4:
-            start_code_len = 0
-            if data[i:i+4] == b'\x00\x00\x00\x01':
-                start_code_len = 4
-            elif data[i:i+3] == b'\x00\x00\x01':
-                start_code_len = 3
-            else:
-                i += 1
-                continue
-            
-            # Find next start code or end of data
-            end = len(data)
-            for j in range(i + start_code_len, len(data) - 2):
-                if data[j:j+4] == b'\x00\x00\x00\x01' or data[j:j+3] == b'\x00\x00\x01':
-                    end = j
-                    break
-            
-            if i + start_code_len < len(data):
-                nal_type = data[i + start_code_len] & 0x1F
-                nal_data = data[i + start_code_len:end]
-                nalus.append((i, nal_type, nal_data))
-            
-            i = end
-        
-        return nalus
-    
-    @staticmethod
-    def parse_avc_nalus(data):
-        """Parse NAL units in AVC/length-prefixed format"""
-        nalus = []
-        i = 0
-        
-        while i < len(data) - 4:
-            try:
-                # Read NAL length
-                nal_length = struct.unpack('>I', data[i:i+4])[0]
-                
-                if nal_length <= 0 or i + 4 + nal_length > len(data):
-                    break
-                
-                nal_data = data[i+4:i+4+nal_length]
-                if nal_data:
-                    nal_type = nal_data[0] & 0x1F
-                    nalus.append((i, nal_type, nal_data))
-                
-                i += 4 + nal_length
-                
-            except (struct.error, IndexError):
-                break
-        
-        return nalus
-    
-    @staticmethod
-    def find_and_extract_sei(data):
-        """Extract SEI from data, auto-detecting format"""
-        extracted = []
-        
-        # Detect stream format
-        stream_format = MultiFormatSEIExtractor.detect_stream_format(data)
-        print(f"🔍 Stream format detected: {stream_format}, buffer size: {len(data)} bytes", flush=True)
-        
-        # Parse NAL units based on format
-        if stream_format == "byte-stream":
-            nalus = MultiFormatSEIExtractor.parse_byte_stream_nalus(data)
-        elif stream_format == "avc":
-            nalus = MultiFormatSEIExtractor.parse_avc_nalus(data)
-        else:
-            print(f"❌ Unknown stream format, trying both parsers...", flush=True)
-            # Try both parsers
-            nalus = MultiFormatSEIExtractor.parse_byte_stream_nalus(data)
-            if not nalus:
-                nalus = MultiFormatSEIExtractor.parse_avc_nalus(data)
-        
-        print(f"🔍 Found {len(nalus)} NAL units", flush=True)
-        
-        # Show NAL unit summary
-        for i, (pos, nal_type, nal_data) in enumerate(nalus[:10]):  # Show first 10
-            nal_names = {1: "P-slice", 5: "IDR", 6: "SEI", 7: "SPS", 8: "PPS", 9: "AUD"}
-            nal_name = nal_names.get(nal_type, f"Type-{nal_type}")
-            print(f"  📍 NAL #{i}: {nal_name} (type {nal_type}) at {pos}, size {len(nal_data)}", flush=True)
-        
-        # Process SEI NAL units
-        sei_count = 0
-        for pos, nal_type, nal_data in nalus:
-            if nal_type == 6:  # SEI
-                sei_count += 1
-                print(f"🎯 Processing SEI NAL #{sei_count} at position {pos}", flush=True)
-                
-                try:
-                    extracted_from_sei = MultiFormatSEIExtractor.extract_from_sei_payload(nal_data[1:])  # Skip NAL header
-                    extracted.extend(extracted_from_sei)
-                except Exception as e:
-                    print(f"❌ Error processing SEI: {e}", flush=True)
-        
-        if sei_count == 0:
-            print("❌ No SEI NAL units found", flush=True)
-        
-        return extracted
-    
     @staticmethod
     def extract_from_sei_payload(sei_payload):
         """Extract tracking data from SEI payload"""
         extracted = []
         
-        print(f"📦 SEI payload size: {len(sei_payload)} bytes", flush=True)
-        print(f"🔍 SEI payload preview: {sei_payload[:32].hex() if len(sei_payload) >= 32 else sei_payload.hex()}", flush=True)
+        # Undo emulation prevention (no-op for the legacy JSON payload)
+        sei_payload = remove_emulation_prevention(sei_payload)
+        
+        log.log("sei", "📦 SEI payload size: %s bytes", len(sei_payload))
+        log.log("sei", "🔍 SEI payload preview: %s", sei_payload[:32].hex() if len(sei_payload) >= 32 else sei_payload.hex())
         
         # Parse SEI messages
         k = 0
@@ -156,7 +67,7 @@ class MultiFormatSEIExtractor:
         
         while k < len(sei_payload) - 1:
             payload_count += 1
-            print(f"📋 Processing SEI message #{payload_count} at offset {k}", flush=True)
+            log.log("sei", "📋 Processing SEI message #%s at offset %s", payload_count, k)
             
             # Read payload type
             payload_type = 0
@@ -176,44 +87,56 @@ class MultiFormatSEIExtractor:
                 payload_size += sei_payload[k]
                 k += 1
             
-            print(f"  📊 Message type: {payload_type}, size: {payload_size}", flush=True)
+            log.log("sei", "  📊 Message type: %s, size: %s", payload_type, payload_size)
             
             # Check for user_data_unregistered (type 5)
             if payload_type == 5 and k + payload_size <= len(sei_payload):
-                payload = sei_payload[k:k+payload_size]
+                payload = bytes(sei_payload[k:k+payload_size])
                 
-                print(f"  🎯 user_data_unregistered found, size: {len(payload)}", flush=True)
+                log.log("sei", "  🎯 user_data_unregistered found, size: %s", len(payload))
                 
                 # Check for our UUID
                 if len(payload) >= 16:
                     uuid_in_payload = payload[:16]
                     expected_uuid = MultiFormatSEIExtractor.CUSTOM_UUID
                     
-                    print(f"  🆔 UUID in payload: {uuid_in_payload.hex()}", flush=True)
-                    print(f"  🆔 Expected UUID:   {expected_uuid.hex()}", flush=True)
+                    log.log("sei", "  🆔 UUID in payload: %s", uuid_in_payload.hex())
+                    log.log("sei", "  🆔 Expected UUID:   %s", expected_uuid.hex())
+                    
+                    if uuid_in_payload == expected_uuid and is_binary_payload(payload[16:]):
+                        log.log("sei", "  ✅ UUID match! Decoding binary tracks...")
+                        
+                        try:
+                            metadata = decode_payload(payload[16:])
+                            log.log("sei", "  🎉 Decoded schema v%s: frame %s, %s tracks",
+                                    metadata['version'], metadata['frame'], metadata['objects'])
+                            extracted.append(metadata)
+                        
+                        except (ValueError, struct.error) as e:
+                            log.error("  ❌ Binary payload error: %s", e)
                     
-                    if uuid_in_payload == expected_uuid:
-                        print("  ✅ UUID match! Extracting JSON data...", flush=True)
+                    elif uuid_in_payload == expected_uuid:
+                        log.log("sei", "  ✅ UUID match! Extracting JSON data...")
                         
                         try:
                             json_data = payload[16:].rstrip(b'\x00\x80')
                             json_str = json_data.decode('utf-8')
-                            print(f"  📝 JSON string: {json_str}", flush=True)
+                            log.log("sei", "  📝 JSON string: %s", json_str)
                             
                             metadata = json.loads(json_str)
-                            print(f"  🎉 Successfully parsed metadata: {metadata}", flush=True)
+                            log.log("sei", "  🎉 Successfully parsed metadata: %s", metadata)
                             extracted.append(metadata)
                             
                         except (UnicodeDecodeError, json.JSONDecodeError) as e:
-                            print(f"  ❌ JSON parsing error: {e}", flush=True)
+                            log.error("  ❌ JSON parsing error: %s", e)
                     else:
-                        print("  ❌ UUID mismatch - not our tracking data", flush=True)
+                        log.error("  ❌ UUID mismatch - not our tracking data")
                 else:
-                    print(f"  ❌ Payload too short for UUID: {len(payload)} bytes", flush=True)
+                    log.error("  ❌ Payload too short for UUID: %s bytes", len(payload))
                 
                 k += payload_size
             else:
-                print(f"  ⏭️  Skipping message type {payload_type}", flush=True)
+                log.log("sei", "  ⏭️  Skipping message type %s", payload_type)
                 if payload_type != 5 and k + payload_size <= len(sei_payload):
                     k += payload_size
                 else:
@@ -222,7 +145,8 @@ class MultiFormatSEIExtractor:
         return extracted
 
 class MultiFormatReceiver:
-    def __init__(self, port, display=True, save_video=None):
+    def __init__(self, port, display=True, save_video=None, sei_scan="leading", bus=None,
+                 clock_sync=None, latency_window=300, rtcp_sender=None, metrics=None):
         self.port = port
         self.display = display
         self.save_video = save_video
@@ -236,15 +160,50 @@ class MultiFormatReceiver:
         self.total_objects_seen = 0
         self.start_time = time.time()
         
+        # Incremental SEI parser, created on the first buffer once the stream format is known
+        self.sei_parser = None
+        
+        # Probe scan mode: "stream" = parse every byte, "leading" = only the non-VCL head of each AU,
+        # "keyframes" = leading + skip DELTA_UNIT buffers (sender puts SEI on keyframes only)
+        self.sei_scan = sei_scan
+        self.au_aligned = False
+        self.probe_bytes_scanned = 0
+        self.probe_bytes_skipped = 0
+        self.delta_buffers_skipped = 0
+        
+        # Optional shared-memory bus for local consumers (MetadataBusWriter)
+        self.bus = bus
+        
+        # Per-stage latency from the sender's SEI timing (receive time corrected by the clock offset)
+        self.clock_sync = clock_sync
+        self.latency = LatencyTracker(window=latency_window)
+        self.latency_report_every = 30
+        
+        # rtpbin receive mode: return RTCP receiver reports to this sender host (sender --rtcp)
+        self.rtcp_sender = rtcp_sender
+        
+        # OpenMetrics registry (--metrics-port), read by the HTTP thread at scrape time
+        self.metrics = metrics
+        self.last_object_count = 0
+        
         Gst.init(None)
     
     def on_pad_probe(self, pad, info):
-        """Multi-format probe with enhanced SEI extraction"""
+        """Multi-format probe with incremental SEI extraction (only SEI bytes are copied)"""
+        t_receive = time.time()
         buffer = info.get_buffer()
         if not buffer:
             return Gst.PadProbeReturn.OK
         
         self.buffer_count += 1
+        size = buffer.get_size()
+        
+        # Fast path: delta frames from a keyframe-only sender cannot carry our SEI, skip without mapping
+        if (self.sei_scan == "keyframes" and self.au_aligned
+                and buffer.has_flags(Gst.BufferFlags.DELTA_UNIT)):
+            self.delta_buffers_skipped += 1
+            self.probe_bytes_skipped += size
+            return Gst.PadProbeReturn.OK
         
         try:
             # Get buffer data
@@ -252,30 +211,99 @@ class MultiFormatReceiver:
             if not success:
                 return Gst.PadProbeReturn.OK
             
-            data = bytes(map_info.data)
-            buffer.unmap(map_info)
+            try:
+                if self.sei_parser is None:
+                    self.sei_parser = self.create_sei_parser(pad, map_info.data)
+                
+                if self.sei_scan != "stream" and self.au_aligned:
+                    # One access unit per buffer: SEI precedes the first slice, never read slice data
+                    data = map_info.data
+                    nalus, scanned = index_leading_nalus(data, self.sei_parser.stream_format,
+                                                         self.sei_parser.length_size)
+                    sei_nalus = [bytes(nal_view(data, nal)) for nal in nalus if nal.type == NAL_SEI]
+                    self.probe_bytes_scanned += scanned
+                    self.probe_bytes_skipped += size - scanned
+                else:
+                    # Works on the mapped memory; NAL units split across buffers are carried over
+                    sei_nalus = self.sei_parser.feed(map_info.data)
+                    self.probe_bytes_scanned += size
+            finally:
+                buffer.unmap(map_info)
             
-            print(f"\n🔍 Processing buffer #{self.buffer_count}", flush=True)
+            log.log("probe", "\n🔍 Processing buffer #%s: %s bytes, %s SEI NAL(s)",
+                    self.buffer_count, size, len(sei_nalus))
             
-            # Extract SEI metadata with multi-format support
-            extracted_list = MultiFormatSEIExtractor.find_and_extract_sei(data)
+            # Extract SEI metadata from the complete SEI NAL units
+            extracted_list = []
+            for sei_nal in sei_nalus:
+                extracted_list.extend(MultiFormatSEIExtractor.extract_from_sei_payload(sei_nal[1:]))  # Skip NAL header
             
             if extracted_list:
                 self.sei_buffer_count += 1
-                print(f"🎯 Buffer #{self.buffer_count} contains valid SEI data!", flush=True)
+                log.log("probe", "🎯 Buffer #%s contains valid SEI data!", self.buffer_count)
             
             for tracking_data in extracted_list:
                 self.sei_count += 1
-                print(f"\n🎉 SEI extraction #{self.sei_count} successful!", flush=True)
+                log.log("probe", "\n🎉 SEI extraction #%s successful!", self.sei_count)
                 
                 # Print tracking information
                 self.print_tracking_data(tracking_data)
                 
+                if self.bus is not None:
+                    pts = tracking_data.get('pts')
+                    self.bus.publish(tracking_data.get('frame', 0), tracking_data.get('tracks'),
+                                     tracking_data.get('timestamp', 0.0),
+                                     buffer.pts if pts is None else pts)
+                
+                if tracking_data.get('capture_time') is not None:
+                    self.record_latency(tracking_data, t_receive)
+                
         except Exception as e:
-            print(f"❌ Error in probe: {e}", flush=True)
+            log.error("❌ Error in probe: %s", e)
         
         return Gst.PadProbeReturn.OK
     
+    def record_latency(self, tracking_data, t_receive):
+        """Add one frame's capture/inference/encode/receive times (sender clock) to the rolling windows"""
+        offset = self.clock_sync.offset if self.clock_sync is not None else 0.0
+        self.latency.add({
+            'capture_time': tracking_data['capture_time'],
+            'timestamp': tracking_data.get('timestamp'),
+            'encode_time': tracking_data.get('encode_time'),
+            'receive_time': t_receive + offset,
+        })
+        if self.latency.count % self.latency_report_every == 0:
+            for line in self.latency.lines():
+                log.log("latency", "⏱️  %s", line)
+    
+    def create_sei_parser(self, pad, data):
+        """Create the streaming SEI parser for the negotiated stream-format (caps, else sniffed)"""
+        stream_format = None
+        length_size = 4
+        
+        caps = pad.get_current_caps()
+        if caps and caps.get_size() > 0:
+            structure = caps.get_structure(0)
+            stream_format = structure.get_string("stream-format")
+            self.au_aligned = structure.get_string("alignment") == "au"
+            
+            # avcC: lengthSizeMinusOne in the low 2 bits of byte 4
+            if stream_format in ("avc", "avc3") and structure.has_field("codec_data"):
+                codec_data = structure.get_value("codec_data")
+                ok, codec_map = codec_data.map(Gst.MapFlags.READ)
+                if ok:
+                    if len(codec_map.data) > 4:
+                        length_size = (codec_map.data[4] & 0x03) + 1
+                    codec_data.unmap(codec_map)
+        
+        if stream_format is None:
+            stream_format = MultiFormatSEIExtractor.detect_stream_format(data)
+        
+        stream_format = "avc" if stream_format in ("avc", "avc3") else "byte-stream"
+        print(f"🔧 Streaming SEI parser: {stream_format}, NAL length size {length_size}, "
+              f"AU aligned: {self.au_aligned}, scan: {self.sei_scan}", flush=True)
+        return StreamingSEIParser(stream_format, length_size)
+    
     def print_tracking_data(self, tracking_data):
         """Print tracking information"""
         frame_num = tracking_data.get('frame', 0)
@@ -286,22 +314,42 @@ class MultiFormatReceiver:
         
         # Update statistics
         self.last_frame_num = frame_num
+        self.last_object_count = object_count
         self.total_objects_seen += object_count
         
-        print("=" * 50)
-        print(f"🎯 TRACKING DATA #{self.sei_count:03d}")
-        print("=" * 50)
-        print(f"📍 Frame Number: {frame_num:04d}")
-        print(f"👥 Object Count: {object_count:02d}")
-        print(f"⏰ Timestamp: {timestamp:.3f}")
-        print(f"⏱️  Runtime: {runtime:.1f}s")
-        print(f"📊 Total Objects: {self.total_objects_seen}")
-        print("=" * 50)
+        log.log("track", "=" * 50)
+        log.log("track", "🎯 TRACKING DATA #%03d", self.sei_count)
+        log.log("track", "=" * 50)
+        log.log("track", "📍 Frame Number: %04d", frame_num)
+        log.log("track", "👥 Object Count: %02d", object_count)
+        log.log("track", "⏰ Timestamp: %.3f", timestamp)
+        log.log("track", "⏱️  Runtime: %.1fs", runtime)
+        log.log("track", "📊 Total Objects: %s", self.total_objects_seen)
+        
+        tracks = tracking_data.get('tracks')
+        if tracks is not None:
+            for t in tracks[:10]:
+                x, y, w, h = (float(v) for v in t['bbox'])
+                log.log("track", "  🏷️  id %4d  class %2d  conf %.2f  box (%.3f,%.3f,%.3f,%.3f)",
+                        int(t['track_id']), int(t['class_id']), float(t['confidence']), x, y, w, h)
+        log.log("track", "=" * 50)
     
     def create_pipeline(self):
         """Create pipeline with multiple probe points for debugging"""
-        pipeline_parts = [
-            f"udpsrc port={self.port} caps=\"application/x-rtp,media=video,encoding-name=H264,payload=96\" !",
+        rtp_caps = "application/x-rtp,media=video,encoding-name=H264,clock-rate=90000,payload=96"
+        if self.rtcp_sender:
+            # RTP on port, sender RTCP on port+1, our receiver reports back to the sender on port+5
+            pipeline_head = [
+                "rtpbin name=rtpbin latency=50",
+                f"udpsrc port={self.port} caps=\"{rtp_caps}\" ! rtpbin.recv_rtp_sink_0",
+                f"udpsrc port={self.port + 1} ! rtpbin.recv_rtcp_sink_0",
+                f"rtpbin.send_rtcp_src_0 ! udpsink host={self.rtcp_sender} port={self.port + 5} sync=false async=false",
+                "rtpbin. !",
+            ]
+        else:
+            pipeline_head = [f"udpsrc port={self.port} caps=\"{rtp_caps}\" !"]
+        
+        pipeline_parts = pipeline_head + [
             "rtph264depay name=depay !",
             "h264parse name=parse config-interval=-1 !",
             "tee name=t"
@@ -373,6 +421,27 @@ class MultiFormatReceiver:
         bus.add_signal_watch()
         bus.connect("message", self.on_message)
     
+    def register_metrics(self):
+        """Scrape-time collectors for --metrics-port once the pipeline exists"""
+        if self.metrics is None:
+            return
+        self.metrics.declare("objects_seen", "counter", "Objects summed over all SEI records")
+        self.metrics.declare("latency_ms", "gauge", "Sender-to-receiver latency percentile per stage")
+        self.metrics.add_collector(self.collect_metrics)
+        self.metrics.add_collector(collect_queues(self.pipeline))
+        watch_fps(self.metrics, self.pipeline.get_by_name("display"))
+    
+    def collect_metrics(self, m):
+        """Counters the receiver already keeps"""
+        m.set("frames", self.buffer_count)
+        m.set("sei", self.sei_count)
+        m.set("sei_buffers", self.sei_buffer_count)
+        m.set("objects", self.last_object_count)
+        m.set("objects_seen", self.total_objects_seen)
+        for stage, row in self.latency.stats().items():
+            for key in ("p50", "p90", "p99"):
+                m.set("latency_ms", row[key], stage=stage, quantile=key)
+    
     def debug_probe(self, pad, info, location):
         """Debug probe to show format at different pipeline points"""
         buffer = info.get_buffer()
@@ -381,15 +450,17 @@ class MultiFormatReceiver:
         
         success, map_info = buffer.map(Gst.MapFlags.READ)
         if success:
-            data = bytes(map_info.data)
+            # Only the first bytes are needed, no full-buffer copy
+            data = map_info.data
+            size = len(data)
+            format_type = MultiFormatSEIExtractor.detect_stream_format(data)
+            preview = bytes(data[:16]).hex()
             buffer.unmap(map_info)
             
-            format_type = MultiFormatSEIExtractor.detect_stream_format(data)
-            print(f"🔧 Debug {location}: {len(data)} bytes, format: {format_type}", flush=True)
+            log.log("debug", "🔧 Debug %s: %s bytes, format: %s", location, size, format_type)
             
             # Show first few bytes
-            preview = data[:16].hex() if len(data) >= 16 else data.hex()
-            print(f"   Preview: {preview}", flush=True)
+            log.log("debug", "   Preview: %s", preview)
         
         return Gst.PadProbeReturn.OK
     
@@ -425,10 +496,31 @@ class MultiFormatReceiver:
         print(f"🎯 Last frame number: {self.last_frame_num}")
         print(f"👥 Total objects detected: {self.total_objects_seen}")
         
+        if self.sei_parser is not None:
+            p = self.sei_parser
+            print(f"🧮 Parser: {p.bytes_seen} bytes seen, {p.nal_count} NALs, "
+                  f"{p.sei_bytes} SEI bytes copied ({p.oversized} oversized SEI dropped)")
+        
+        total = self.probe_bytes_scanned + self.probe_bytes_skipped
+        if total > 0:
+            print(f"⏩ Probe [{self.sei_scan}]: scanned {self.probe_bytes_scanned} bytes, "
+                  f"skipped {self.probe_bytes_skipped} bytes ({self.probe_bytes_skipped / total * 100:.1f}%), "
+                  f"{self.delta_buffers_skipped} delta buffers not mapped")
+        
         if self.buffer_count > 0:
             sei_rate = (self.sei_buffer_count / self.buffer_count) * 100
             print(f"📈 SEI success rate: {sei_rate:.1f}%")
         
+        if self.latency.count:
+            print(f"⏱️  Latency over the last {self.latency.window} frames (ms):")
+            for line in self.latency.lines():
+                print(f"   {line}")
+        if self.clock_sync is not None:
+            print(f"🕒 {self.clock_sync.summary()}")
+        
+        if self.bus is not None:
+            print(f"🚌 {self.bus.summary()}")
+        print(f"📝 {log.summary()}")
         print("=" * 60)
     
     def start(self):
@@ -444,6 +536,7 @@ class MultiFormatReceiver:
         print("=" * 60)
         
         self.create_pipeline()
+        self.register_metrics()
         
         ret = self.pipeline.set_state(Gst.State.PLAYING)
         if ret == Gst.StateChangeReturn.FAILURE:
@@ -489,6 +582,8 @@ class MultiFormatReceiver:
         print("🛑 Multi-format receiver stopped")
 
 def main():
+    from multi_receiver import add_multi_arguments, run as run_multi
+
     parser = argparse.ArgumentParser(
         description='Multi-format H.264 receiver with enhanced SEI detection',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -498,24 +593,84 @@ Enhanced receiver that handles both byte-stream and AVC H.264 formats.
 Examples:
   python multi_format_receiver.py 5000 --display
   python multi_format_receiver.py 5000 --save-video output.mp4
+  python multi_format_receiver.py 5000 5002 5004 5006 --mosaic
         """
     )
     
-    parser.add_argument('port', type=int, help='UDP port to receive on')
+    parser.add_argument('port', type=int, nargs='+',
+                        help='UDP port to receive on (several ports: one pipeline with a branch per stream)')
     parser.add_argument('--display', action='store_true', help='Display live video')
     parser.add_argument('--save-video', help='Save video to file (MP4)')
+    parser.add_argument('--sei-scan', choices=['stream', 'leading', 'keyframes'], default=None,
+                        help='SEI probe scan: every byte, only the non-VCL head of each AU, '
+                             'or head of keyframes only (default: leading)')
+    parser.add_argument('--bus', metavar='NAME',
+                        help='Publish decoded tracks to a shared-memory bus for local consumers (metadata_bus.py)')
+    parser.add_argument('--bus-slots', type=int, default=256, help='Records kept in the bus ring (default: 256)')
+    parser.add_argument('--bus-max-tracks', type=int, default=64, help='Tracks stored per record (default: 64)')
+    parser.add_argument('--bus-keypoints', type=int, default=0,
+                        help='Keypoints per track stored on the bus, 0 = boxes only (default: 0)')
+    parser.add_argument('--clock-sync', metavar='HOST:PORT',
+                        help='Measure the clock offset to the sender (trackSender.py --clock-sync-port); '
+                             'without it both clocks are assumed equal')
+    parser.add_argument('--rtcp', metavar='SENDER_HOST', nargs='?', const='127.0.0.1', default=None,
+                        help='Receive through rtpbin and send RTCP receiver reports to the sender '
+                             '(trackSender.py --rtcp); RTCP on port+1, reports to SENDER_HOST:port+5')
+    parser.add_argument('--latency-window', type=int, default=None,
+                        help='Frames in the rolling latency percentile window (default: 300)')
+    add_multi_arguments(parser)
+    add_metrics_arguments(parser)
+    add_log_arguments(parser)
     
     args = parser.parse_args()
+    configure_from_args(args)
     
-    if args.port < 1024 or args.port > 65535:
-        print("Error: Port must be between 1024 and 65535")
-        sys.exit(1)
+    for port in args.port:
+        if port < 1024 or port > 65535:
+            print("Error: Port must be between 1024 and 65535")
+            sys.exit(1)
+    
+    if len(args.port) > 1:
+        # The multi-stream pipeline has no per-stream save/bus/latency/RTCP path and displays via --mosaic
+        single = [option for option, value in (
+            ('--display', args.display), ('--save-video', args.save_video), ('--sei-scan', args.sei_scan),
+            ('--bus', args.bus), ('--clock-sync', args.clock_sync), ('--rtcp', args.rtcp),
+            ('--latency-window', args.latency_window)) if value]
+        if single:
+            parser.error(f"{', '.join(single)} only work with a single port "
+                         f"(several ports: --mosaic, --tile, --report-interval)")
+        run_multi(args.port, args)
+        return
+    args.port = args.port[0]
+    if args.sei_scan is None:
+        args.sei_scan = 'leading'
+    if args.latency_window is None:
+        args.latency_window = 300
     
     if not args.display and not args.save_video:
         args.display = True
     
-    receiver = MultiFormatReceiver(args.port, args.display, args.save_video)
-    receiver.start()
+    bus = None
+    if args.bus:
+        bus = MetadataBusWriter(args.bus, args.bus_slots, args.bus_max_tracks, args.bus_keypoints)
+        print(f"🚌 Metadata bus '{args.bus}' ready (python metadata_bus.py {args.bus} to tail it)")
+    
+    clock_sync = None
+    if args.clock_sync:
+        host, _, sync_port = args.clock_sync.rpartition(':')
+        clock_sync = ClockSyncClient(host or '127.0.0.1', int(sync_port)).start()
+    
+    receiver = MultiFormatReceiver(args.port, args.display, args.save_video, args.sei_scan, bus,
+                                   clock_sync, args.latency_window, args.rtcp,
+                                   metrics=start_metrics(args, "trackReceiver"))
+    try:
+        receiver.start()
+    finally:
+        log.close()
+        if clock_sync is not None:
+            clock_sync.stop()
+        if bus is not None:
+            bus.close()
 
 if __name__ == '__main__':
     main()
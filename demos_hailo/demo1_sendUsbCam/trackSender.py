@@ -6,11 +6,12 @@ Usage: python fixed_tracking_sender.py --device /dev/video0 --host 127.0.0.1 --p
 """
 
 import argparse
+import os
 import sys
 import time
 import json
 import threading
-import queue
+from collections import deque
 
 import gi
 gi.require_version("Gst", "1.0")
@@ -24,12 +25,30 @@ try:
 except Exception:
     HAVE_HAILO = False
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from event_log import get_event_log, add_log_arguments, configure_from_args
+from encoder_probe import add_encoder_arguments, resolve_encoder
+from rtcp_abr import RtcpAbr, add_abr_arguments, controller_from_args, named_encoder, rtpbin_send_section
+from rate_control import InferenceRateController, add_rate_control_arguments, videorate_section
+from metrics import (add_metrics_arguments, collect_analytics, collect_encoder, collect_queues, collect_tracker,
+                     start_metrics)
+from analytics import add_analytics_arguments, analytics_from_args, finish_analytics
+from roi_arrays import RoiExtractor
+from tracker import add_tracker_arguments, tracker_from_args
+
+from nal_index import index_nalus, find_nal, find_first_vcl, start_code_offset, NAL_IDR
+from latency import ClockSyncServer
+from pts_join import PtsMetadataRing
+from sei_schema import SIMTRACK_UUID, build_sei_nal, empty_tracks, encode_payload
+
 Gst.init(None)
 
+log = get_event_log()
+
 class SEINALInjector:
     """Helper class for creating SEI NAL units with simple tracking metadata"""
     
-    CUSTOM_UUID = b'SIMTRACK' + b'\x00' * 8  # Custom UUID for simple tracking data
+    CUSTOM_UUID = SIMTRACK_UUID  # Custom UUID for simple tracking data
     
     @staticmethod
     def create_sei_nal_unit(frame_num, object_count):
@@ -61,9 +80,82 @@ class SEINALInjector:
         sei_payload.append(0x80)  # RBSP stop bit
         
         return b'\x00\x00\x00\x01\x06' + bytes(sei_payload)
+    
+    @staticmethod
+    def create_binary_sei_nal_unit(frame_num, tracks, timestamp, pts=None, timing=None):
+        """Create a SEI NAL unit carrying full per-object tracks (sei_schema binary payload)"""
+        return build_sei_nal(encode_payload(frame_num, tracks, timestamp, pts, timing))
+    
+    @staticmethod
+    def insert_sei_memory(buffer, sei_nal, insert_pos):
+        """Return a buffer sharing the frame's GstMemory with the SEI inserted at insert_pos"""
+        # Shallow copy: refs the same memories and keeps PTS/DTS/duration/flags/meta
+        out = buffer.copy()
+        sei_mem = Gst.Buffer.new_wrapped(sei_nal).get_memory(0)
+        
+        found, idx, length, skip = out.find_memory(insert_pos, 1)
+        if not found:
+            # insert_pos == size (or empty buffer): append at the end
+            out.append_memory(sei_mem)
+            return out
+        
+        if skip > 0:
+            # insert_pos lands inside a memory block: split it into two shared views
+            mem = out.get_memory(idx)
+            out.replace_memory(idx, mem.share(0, skip))
+            out.insert_memory(idx + 1, mem.share(skip, -1))
+            idx += 1
+        
+        out.insert_memory(idx, sei_mem)
+        return out
+
+class InjectionStats:
+    """Per-frame cost of the SEI injection path (frame copies and time on the streaming thread)"""
+    
+    # Full-frame copies done by the original bytes path:
+    # bytes(map_info.data), the slice/concat splice (SEI frames only) and Gst.Buffer.new_wrapped
+    COPY_PATH_COPIES = {False: 2, True: 3}
+    
+    def __init__(self, mode):
+        self.mode = mode
+        self.frames = 0
+        self.sei_frames = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.copies = 0
+        self.copies_avoided = 0
+        self.bytes_avoided = 0
+    
+    def add(self, elapsed, frame_size, injected):
+        """Record one encoded frame"""
+        legacy_copies = self.COPY_PATH_COPIES[injected]
+        copies = legacy_copies if self.mode == "copy" else 0
+        
+        self.frames += 1
+        self.sei_frames += int(injected)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.copies += copies
+        self.copies_avoided += legacy_copies - copies
+        self.bytes_avoided += (legacy_copies - copies) * frame_size
+    
+    def summary(self):
+        """One-line summary for the session report"""
+        avg_ms = (self.total_time / self.frames * 1000.0) if self.frames else 0.0
+        return (f"SEI inject [{self.mode}]: {self.frames} frames ({self.sei_frames} with SEI), "
+                f"avg {avg_ms:.3f} ms/frame, max {self.max_time * 1000.0:.3f} ms, "
+                f"frame copies {self.copies}, avoided {self.copies_avoided} "
+                f"({self.bytes_avoided / 1e6:.1f} MB)")
+
+# Transmission branch: 1280x720 at the 8 fps inference rate, keyframe every second
+TX_WIDTH, TX_HEIGHT, TX_FPS, TX_BITRATE_KBPS, TX_KEY_INT = 1280, 720, 8, 2000, 8
+DEFAULT_ENCODER = "x264enc tune=zerolatency bitrate=2000 key-int-max={key_int} speed-preset=ultrafast bframes=0"
 
 class FixedTrackingSender:
-    def __init__(self, device, hef, post_so, host, port, width=640, height=480):
+    def __init__(self, device, hef, post_so, host, port, width=640, height=480, sei_inject="memory",
+                 sei_format="binary", sei_every_frame=False, sei_max_wait_ms=250, pipeline_mode="split",
+                 clock_sync_port=0, encoder=None, abr=None, netsim_drop=0.0, rate_control=None, metrics=None,
+                 analytics=None, tracker=None):
         self.device = device
         self.hef = hef
         self.post_so = post_so
@@ -73,29 +165,80 @@ class FixedTrackingSender:
         self.height = height
         
         # Simple tracking data
+        self.extractor = RoiExtractor()  # detections -> sei_schema track array, buffer reused across frames
         self.frame_counter = 0
         self.current_object_count = 0
         self.sei_injection_counter = 0
         
-        # SEI injection queue
-        self.sei_queue = queue.Queue(maxsize=10)
+        # SEI injection path ("memory" = zero-copy GstMemory insert, "copy" = original bytes splice)
+        self.sei_inject = sei_inject
+        self.injection_stats = InjectionStats(sei_inject)
+        
+        # SEI payload format ("binary" = sei_schema tracks, "json" = legacy frame/objects/timestamp)
+        self.sei_format = sei_format
+        
+        # Tracking metadata keyed by buffer PTS, joined to the encoded frame with the same PTS
+        self.meta_ring = PtsMetadataRing(capacity=64)
+        self.sei_every_frame = sei_every_frame
+        self.sei_max_wait = sei_max_wait_ms / 1000.0
+        
+        # Encoded frames waiting for their metadata (released in order)
+        self.pending_frames = deque()
+        self.pending_lock = threading.Lock()
+        self.meta_cond = threading.Condition()
         
-        # Pipelines
+        # Pipelines ("split" = detection/encode/RTP pipelines joined by appsink/appsrc, "single" = one pipeline)
+        self.pipeline_mode = pipeline_mode
         self.detection_pipeline = None
         self.transmission_pipeline = None
+        self.rtp_pipeline = None
+        self.single_pipeline = None
         self.appsrc = None
+        self.rtp_appsrc = None
+        self.pay_sinkpad = None
+        self.sei_flow = Gst.FlowReturn.OK  # single mode: last non-OK chain result stops the SEI probe
+        
+        # H.264 encoder fragment (--encoder), the tuned x264enc line by default
+        self.encoder = encoder or DEFAULT_ENCODER.format(key_int=TX_KEY_INT)
+        
+        # RTCP-driven bitrate adaptation (BitrateController, None = plain udpsink at a fixed bitrate)
+        self.abr = abr
+        self.netsim_drop = netsim_drop
+        self.rtcp_abr = None
+        
+        # Closed-loop inference rate (InferenceRateController kwargs, None = fixed TX_FPS)
+        self.rate_control = rate_control
+        self.rate_ctl = None
+        
+        # OpenMetrics registry (--metrics-port), read by the HTTP thread at scrape time
+        self.metrics = metrics
+        
+        # User analytics (--analytics): the handoff only queues copied metadata, workers run the callback
+        self.analytics = analytics
+        
+        # Multi-class Python tracker (--tracker python, tracker.ByteTracker) in place of hailotracker
+        self.tracker = tracker
+        
+        # Answers the receiver's clock offset requests (latency measurement), 0 = disabled
+        self.clock_sync_port = clock_sync_port
+        self.clock_sync = None
+        
+        # CPU usage for A/B runs between pipeline modes
+        self.cpu_start = 0.0
+        self.wall_start = 0.0
         
         # Threading
         self.running = False
         self.lock = threading.Lock()
         
-    def create_detection_pipeline(self):
-        """Create Hailo detection pipeline"""
-        pipeline_str = f"""
+    def capture_section(self):
+        """Capture -> tee -> Hailo inference branch, plus the head of the 720p transmission branch"""
+        # With the Python tracker the handoff assigns track IDs itself
+        hailotracker = "" if self.tracker is not None else "hailotracker name=hailo_tracker class-id=0 !"
+        return f"""
         v4l2src device={self.device} name=source !
         video/x-raw,format=UYVY,width={self.width},height={self.height},framerate=30/1 !
-        videorate drop-only=true !
-        video/x-raw,framerate=8/1 !
+        {videorate_section(TX_FPS, controlled=self.rate_control is not None)} !
         queue name=source_scale_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
         videoscale name=source_videoscale n-threads=2 !
         queue name=source_convert_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
@@ -113,7 +256,7 @@ class FixedTrackingSender:
         queue name=inference_hailofilter_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
         hailofilter name=inference_hailofilter so-path={self.post_so} function-name=filter qos=false !
         queue name=inference_hailotracker_q leaky=no max-size-buffers=3 max-size-bytes=0 max-size-time=0 !
-        hailotracker name=hailo_tracker class-id=0 !
+        {hailotracker}
         identity name=tracking_callback signal-handoffs=true !
         fakesink
         
@@ -122,6 +265,89 @@ class FixedTrackingSender:
         videoconvert !
         videoscale !
         video/x-raw,format=I420,width=1280,height=720 !
+        """
+    
+    def encoder_section(self):
+        """H.264 encoder settings shared by both pipeline modes"""
+        return f"""
+        {named_encoder(self.encoder)} !
+        video/x-h264,stream-format=byte-stream !
+        """
+    
+    def rtp_sink_section(self):
+        """After the RTP caps: plain udpsink, or rtpbin with RTCP for --rtcp"""
+        if self.abr is None:
+            return f"udpsink host={self.host} port={self.port} sync=false"
+        return rtpbin_send_section(self.host, self.port, drop_probability=self.netsim_drop)
+    
+    def start_abr(self, rtp_pipeline, encoder_pipeline):
+        """Follow RTCP receiver reports once the RTP pipeline exists"""
+        if self.abr is None:
+            return
+        rtpbin = rtp_pipeline.get_by_name("rtpbin")
+        encoder = encoder_pipeline.get_by_name("encoder")
+        self.rtcp_abr = RtcpAbr(rtpbin, encoder, self.abr, on_update=self.on_abr_update).start()
+        print(f"📶 RTCP ABR: {self.abr.min_kbps}-{self.abr.max_kbps} kbit/s, "
+              f"RTCP to {self.host}:{self.port + 1}, reports on UDP {self.port + 5}"
+              + (f", simulated drop {self.netsim_drop:.1%}" if self.netsim_drop else ""))
+    
+    def on_abr_update(self, state, changed):
+        """Controller state after every receiver report"""
+        log.log("abr", "📶 RR: loss %.1f%%, jitter %.1f ms, RTT %.1f ms -> %s %d kbit/s (key-int %s)",
+                state["loss"] * 100, state["jitter_ms"], state["rtt_ms"], state["action"],
+                state["bitrate_kbps"], state["key_int"], **state)
+    
+    def start_rate_control(self, pipeline):
+        """Retune the inference/transmission rate from the hailonet queue once the pipeline plays"""
+        if self.rate_control is None:
+            return
+        self.rate_ctl = InferenceRateController.from_pipeline(
+            pipeline, start_fps=TX_FPS, on_update=self.on_rate_update, **self.rate_control).start()
+        print(f"⏱️  Rate control: {self.rate_ctl.min_fps}-{self.rate_ctl.max_fps} fps, "
+              f"target {self.rate_ctl.target_ms:.0f} ms in front of/inside hailonet")
+    
+    def on_rate_update(self, state, changed):
+        """Controller state after every sample"""
+        if changed:
+            log.log("rate", "⏱️  queue %d, inference %.1f ms, latency ~%.0f ms -> %s to %d fps",
+                    state["queue_level"], state["infer_ms"], state["latency_ms"], state["action"],
+                    state["fps"], **state)
+    
+    def register_metrics(self):
+        """Scrape-time collectors for --metrics-port once the pipelines exist"""
+        if self.metrics is None:
+            return
+        self.metrics.add_collector(self.collect_metrics)
+        pipelines = (("single", self.single_pipeline), ("detection", self.detection_pipeline),
+                     ("transmission", self.transmission_pipeline), ("rtp", self.rtp_pipeline))
+        for label, pipeline in pipelines:
+            if pipeline is not None:
+                self.metrics.add_collector(collect_queues(pipeline, label))
+        encoder = (self.single_pipeline or self.transmission_pipeline).get_by_name("encoder")
+        if encoder is not None:
+            self.metrics.add_collector(collect_encoder(encoder))
+        if self.analytics is not None:
+            self.metrics.add_collector(collect_analytics(self.analytics))
+        if self.tracker is not None:
+            self.metrics.add_collector(collect_tracker(self.tracker))
+    
+    def collect_metrics(self, m):
+        """Counters the sender already keeps"""
+        m.set("frames", self.frame_counter)
+        m.set("sei", self.sei_injection_counter)
+        m.set("sei_buffers", self.injection_stats.sei_frames)
+        m.set("objects", self.current_object_count)
+        if self.injection_stats.frames:
+            m.set("sei_inject_ms_avg", self.injection_stats.total_time / self.injection_stats.frames * 1000.0)
+        if self.rate_ctl is not None:
+            m.set("inference_fps", self.rate_ctl.fps)
+        if self.abr is not None:
+            m.set("rtcp_loss_fraction", self.abr.loss)
+            m.set("rtcp_jitter_ms", self.abr.jitter_ms)
+    
+    def create_detection_pipeline(self):
+        """Create Hailo detection pipeline"""
+        pipeline_str = self.capture_section() + """
         appsink name=frame_sink emit-signals=true sync=false max-buffers=5 drop=true
         """
         
@@ -146,13 +372,48 @@ class FixedTrackingSender:
         bus.add_signal_watch()
         bus.connect("message", self.on_detection_message)
     
+    def create_single_pipeline(self):
+        """Create one pipeline: capture, inference, encode, SEI probe and RTP without appsink/appsrc hops"""
+        pipeline_str = self.capture_section() + self.encoder_section() + f"""
+        h264parse name=sei_parse config-interval=1 !
+        video/x-h264,stream-format=byte-stream,alignment=au !
+        queue name=sei_q leaky=no max-size-buffers=16 max-size-bytes=0 max-size-time=0 !
+        rtph264pay name=pay config-interval=1 mtu=1400 pt=96 !
+        application/x-rtp,media=video,encoding-name=H264,payload=96 !
+        {self.rtp_sink_section()}
+        """
+        
+        try:
+            self.single_pipeline = Gst.parse_launch(pipeline_str)
+        except Exception as e:
+            print(f"ERROR: Failed to create single pipeline: {e}")
+            sys.exit(1)
+        
+        # Connect tracking callback
+        identity = self.single_pipeline.get_by_name("tracking_callback")
+        if identity:
+            identity.connect("handoff", self.on_tracking_handoff)
+        
+        # SEI insertion probe in front of rtph264pay, on the sei_q thread: waiting for metadata never stalls the encoder
+        self.pay_sinkpad = self.single_pipeline.get_by_name("pay").get_static_pad("sink")
+        sei_src = self.single_pipeline.get_by_name("sei_q").get_static_pad("src")
+        sei_src.add_probe(Gst.PadProbeType.BUFFER, self.on_sei_probe)
+        
+        self.start_abr(self.single_pipeline, self.single_pipeline)
+        
+        # Bus handling
+        bus = self.single_pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self.on_detection_message)
+    
     def create_transmission_pipeline(self):
         """Create transmission pipeline with manual SEI injection"""
         # Create a custom pipeline that manually handles SEI injection
+        # --rate-control: the transmitted rate follows the inference rate, so the caps announce a variable rate
+        framerate = "0/1" if self.rate_control is not None else f"{TX_FPS}/1"
         pipeline_str = f"""
-        appsrc name=src format=3 is-live=true caps=video/x-raw,format=I420,width=1280,height=720,framerate=8/1 !
-        x264enc tune=zerolatency bitrate=2000 key-int-max=8 speed-preset=ultrafast bframes=0 !
-        video/x-h264,stream-format=byte-stream !
+        appsrc name=src format=3 is-live=true caps=video/x-raw,format=I420,width=1280,height=720,framerate={framerate} !
+        """ + self.encoder_section() + """
         h264parse config-interval=1 !
         appsink name=h264_sink emit-signals=true sync=false max-buffers=10 drop=true
         """
@@ -179,7 +440,7 @@ class FixedTrackingSender:
         appsrc name=rtp_src format=3 is-live=true caps=video/x-h264,stream-format=byte-stream,alignment=au !
         rtph264pay config-interval=1 mtu=1400 pt=96 !
         application/x-rtp,media=video,encoding-name=H264,payload=96 !
-        udpsink host={self.host} port={self.port} sync=false
+        {self.rtp_sink_section()}
         """
         
         try:
@@ -189,6 +450,8 @@ class FixedTrackingSender:
             print(f"ERROR: Failed to create RTP pipeline: {e}")
             sys.exit(1)
         
+        self.start_abr(self.rtp_pipeline, self.transmission_pipeline)
+        
         # Bus handling
         bus = self.transmission_pipeline.get_bus()
         bus.add_signal_watch()
@@ -202,6 +465,7 @@ class FixedTrackingSender:
         """Handle tracking data from Hailo pipeline"""
         self.frame_counter += 1
         object_count = 0
+        tracks = empty_tracks(0)
         
         if HAVE_HAILO:
             try:
@@ -219,31 +483,51 @@ class FixedTrackingSender:
                     
                     object_count = len(objs)
                     
+                    if self.sei_format == "binary" or self.analytics is not None or self.tracker is not None:
+                        # One copy per frame, shared by the SEI payload and the analytics queue
+                        # (the tracker returns its own copy with track IDs set)
+                        tracks = self.extractor.extract(objs, copy=self.tracker is None)
+                        if self.tracker is not None:
+                            tracks = self.tracker.update(tracks)
+                    
+                    if self.analytics is not None:
+                        self.analytics.submit(tracks, buffer.pts, self.extractor.labels)
+                    
                     if object_count > 0:
-                        print(f"🎯 Frame {self.frame_counter}: {object_count} objects detected", flush=True)
+                        log.log("track", "🎯 Frame %d: %d objects detected", self.frame_counter, object_count)
                 
             except Exception as e:
-                print(f"[ERROR] Frame {self.frame_counter}: Hailo meta read failed: {e}", flush=True)
+                log.error("[ERROR] Frame %d: Hailo meta read failed: %s", self.frame_counter, e)
         
         # Store tracking data for SEI injection
+        now = time.time()
         tracking_data = {
             'frame': self.frame_counter,
             'objects': object_count,
-            'timestamp': time.time()
+            'timestamp': now,
+            'capture_time': self.capture_wall_time(identity, buffer.pts, now),
+            'tracks': tracks
         }
         
-        # Add to SEI queue (non-blocking)
-        try:
-            self.sei_queue.put_nowait(tracking_data)
-        except queue.Full:
-            # Remove oldest if queue is full
-            try:
-                self.sei_queue.get_nowait()
-                self.sei_queue.put_nowait(tracking_data)
-            except queue.Empty:
-                pass
+        # Index by PTS; the tee upstream gives the encoded copy of this frame the same PTS
+        self.meta_ring.put(buffer.pts, tracking_data)
         
-        print(f"📊 Tracking data queued: Frame {self.frame_counter}, Objects {object_count}", flush=True)
+        log.log("track", "📊 Tracking data stored: Frame %d, Objects %d, PTS %d",
+                self.frame_counter, object_count, buffer.pts)
+        
+        # Encoded frames may already be waiting for this metadata
+        with self.meta_cond:
+            self.meta_cond.notify_all()
+        with self.pending_lock:
+            self.release_pending_frames()
+    
+    def capture_wall_time(self, element, pts, now):
+        """Wall-clock time the frame was captured: live source PTS is the running time at capture"""
+        clock = element.get_clock()
+        if clock is None or pts == Gst.CLOCK_TIME_NONE:
+            return now
+        running_time = clock.get_time() - element.get_base_time()
+        return now - max(0, running_time - pts) / Gst.SECOND
     
     def on_frame_sample(self, sink):
         """Handle video frames for transmission"""
@@ -259,89 +543,185 @@ class FixedTrackingSender:
     
     def analyze_h264_frame(self, data):
         """Analyze H.264 frame structure for debugging"""
-        nalus = []
-        i = 0
-        while i < len(data) - 4:
-            if data[i:i+4] == b'\x00\x00\x00\x01':
-                # Found start code
-                nal_type = data[i+4] & 0x1F
-                nalus.append(nal_type)
-                i += 4
-            else:
-                i += 1
-        return nalus
+        return [nal.type for nal in index_nalus(data)]
     
     def on_h264_sample(self, sink):
-        """Handle H.264 encoded frames and inject SEI"""
+        """Handle H.264 encoded frames: index NAL units and queue the frame for its PTS join"""
         sample = sink.emit("pull-sample")
         if not sample or not self.rtp_appsrc:
             return Gst.FlowReturn.OK
         
         buffer = sample.get_buffer()
+        t_start = time.perf_counter()
         
         # Get buffer data
         success, map_info = buffer.map(Gst.MapFlags.READ)
         if not success:
             return Gst.FlowReturn.OK
         
-        data = bytes(map_info.data)
-        buffer.unmap(map_info)
+        if self.sei_inject == "copy":
+            data = bytes(map_info.data)
+            buffer.unmap(map_info)
+        else:
+            # Index straight over the mapped memory, unmap once offsets are known
+            data = map_info.data
         
         # Analyze frame structure
-        nalus = self.analyze_h264_frame(data)
+        nal_units = index_nalus(data)
+        nalus = [nal.type for nal in nal_units]
+        frame_size = len(data)
         
         # Check if this is a keyframe (contains IDR - type 5)
-        is_keyframe = 5 in nalus
+        is_keyframe = find_nal(nal_units, NAL_IDR) is not None
         
-        output_data = data
+        # SEI goes in front of the first slice (the IDR on keyframes)
+        vcl_nal = find_first_vcl(nal_units)
+        insert_pos = start_code_offset(data, vcl_nal) if vcl_nal else 0
         
-        print(f"🎬 H.264 frame: NALUs {nalus}, Keyframe: {is_keyframe}, Size: {len(data)} bytes", flush=True)
+        if self.sei_inject != "copy":
+            buffer.unmap(map_info)
+            data = None
         
-        # Inject SEI on keyframes if we have tracking data
-        if is_keyframe:
-            try:
-                tracking_data = self.sei_queue.get_nowait()
-                
-                # Create SEI NAL unit
-                frame_num = tracking_data['frame']
-                obj_count = tracking_data['objects']
-                
-                sei_nal = SEINALInjector.create_sei_nal_unit(frame_num, obj_count)
-                
-                print(f"📝 Creating SEI: Frame {frame_num}, Objects {obj_count}", flush=True)
-                print(f"📦 SEI NAL size: {len(sei_nal)} bytes, UUID: {SEINALInjector.CUSTOM_UUID[:8].hex()}", flush=True)
-                
-                # Find IDR frame position for insertion
-                insert_pos = 0
-                i = 0
-                while i < len(data) - 4:
-                    if data[i:i+4] == b'\x00\x00\x00\x01':
-                        nal_type = data[i+4] & 0x1F
-                        if nal_type == 5:  # IDR frame
-                            insert_pos = i
-                            break
-                        i += 4
-                    else:
-                        i += 1
-                
-                # Insert SEI before IDR frame
-                if insert_pos > 0:
-                    output_data = data[:insert_pos] + sei_nal + data[insert_pos:]
-                    print(f"💉 Inserted SEI at position {insert_pos} (before IDR)", flush=True)
-                else:
-                    # If no IDR found, insert at beginning
-                    output_data = sei_nal + data
-                    print(f"💉 Inserted SEI at beginning (no IDR found)", flush=True)
-                
-                self.sei_injection_counter += 1
-                print(f"✅ SEI injection #{self.sei_injection_counter} successful! New size: {len(output_data)} bytes", flush=True)
+        log.log("frame", "🎬 H.264 frame: NALUs %s, Keyframe: %s, Size: %d bytes", nalus, is_keyframe, frame_size)
+        
+        wants_sei = is_keyframe or self.sei_every_frame
+        pending = (buffer, data, insert_pos, frame_size, is_keyframe, wants_sei,
+                   time.monotonic(), time.perf_counter() - t_start)
+        
+        with self.pending_lock:
+            self.pending_frames.append(pending)
+            self.release_pending_frames()
+        return Gst.FlowReturn.OK
+    
+    def release_pending_frames(self):
+        """Push encoded frames in order once their PTS has metadata (or they waited max_wait)"""
+        now = time.monotonic()
+        while self.pending_frames:
+            buffer, data, insert_pos, frame_size, is_keyframe, wants_sei, t_arrival, t_index = self.pending_frames[0]
+            
+            # Inference runs behind the encoder: hold the frame until its metadata shows up
+            if (wants_sei and self.meta_ring.lookup(buffer.pts) is None
+                    and now - t_arrival < self.sei_max_wait):
+                break
+            self.pending_frames.popleft()
+            
+            t_start = time.perf_counter()
+            sei_nal = None
+            
+            if wants_sei:
+                tracking_data = self.meta_ring.join(buffer.pts)
                 
-                # Verify SEI was added
-                new_nalus = self.analyze_h264_frame(output_data)
-                print(f"🔍 After injection NALUs: {new_nalus}", flush=True)
+                if tracking_data is not None:
+                    sei_nal = self.create_sei_for(tracking_data, buffer.pts)
                 
-            except queue.Empty:
-                print("⚠️  Keyframe but no tracking data available for SEI", flush=True)
+                elif is_keyframe:
+                    log.log("sei", "⚠️  Keyframe but no tracking data for PTS %d", buffer.pts)
+            
+            if self.sei_inject == "copy":
+                new_buffer = self.inject_sei_copy(buffer, data, sei_nal, insert_pos)
+            else:
+                new_buffer = self.inject_sei_memory(buffer, sei_nal, insert_pos)
+            
+            self.injection_stats.add(time.perf_counter() - t_start + t_index, frame_size, sei_nal is not None)
+            
+            ret = self.rtp_appsrc.emit("push-buffer", new_buffer)
+    
+    def create_sei_for(self, tracking_data, pts):
+        """Create the SEI NAL unit for one frame's tracking data in the selected format"""
+        frame_num = tracking_data['frame']
+        obj_count = tracking_data['objects']
+        
+        if self.sei_format == "binary":
+            # Encoded frame leaves the sender now (after waiting for its metadata)
+            timing = (tracking_data['capture_time'], time.time())
+            sei_nal = SEINALInjector.create_binary_sei_nal_unit(
+                frame_num, tracking_data['tracks'], tracking_data['timestamp'], pts, timing)
+        else:
+            sei_nal = SEINALInjector.create_sei_nal_unit(frame_num, obj_count)
+        
+        log.log("sei", "📝 Creating SEI: Frame %d, Objects %d, PTS %d, NAL size: %d bytes",
+                frame_num, obj_count, pts, len(sei_nal))
+        return sei_nal
+    
+    def on_sei_probe(self, pad, info):
+        """Single-pipeline mode: insert SEI between h264parse and rtph264pay, touching only metadata"""
+        buffer = info.get_buffer()
+        if not buffer or self.sei_flow != Gst.FlowReturn.OK:
+            return Gst.PadProbeReturn.OK
+        
+        t_start = time.perf_counter()
+        success, map_info = buffer.map(Gst.MapFlags.READ)
+        if not success:
+            return Gst.PadProbeReturn.OK
+        
+        data = map_info.data
+        nal_units = index_nalus(data)
+        is_keyframe = find_nal(nal_units, NAL_IDR) is not None
+        vcl_nal = find_first_vcl(nal_units)
+        insert_pos = start_code_offset(data, vcl_nal) if vcl_nal else 0
+        frame_size = len(data)
+        buffer.unmap(map_info)
+        
+        if not (is_keyframe or self.sei_every_frame):
+            self.injection_stats.add(time.perf_counter() - t_start, frame_size, False)
+            return Gst.PadProbeReturn.OK
+        
+        # Inference runs behind the encoder: hold sei_q (the encoder keeps filling it) until the metadata for this PTS arrives
+        pts = buffer.pts
+        t_index = time.perf_counter() - t_start
+        with self.meta_cond:
+            self.meta_cond.wait_for(lambda: self.meta_ring.lookup(pts) is not None, timeout=self.sei_max_wait)
+        t_start = time.perf_counter()
+        
+        tracking_data = self.meta_ring.join(pts)
+        if tracking_data is None:
+            if is_keyframe:
+                log.log("sei", "⚠️  Keyframe but no tracking data for PTS %d", pts)
+            self.injection_stats.add(t_index, frame_size, False)
+            return Gst.PadProbeReturn.OK
+        
+        sei_nal = self.create_sei_for(tracking_data, pts)
+        new_buffer = SEINALInjector.insert_sei_memory(buffer, sei_nal, insert_pos)
+        self.sei_injection_counter += 1
+        self.injection_stats.add(time.perf_counter() - t_start + t_index, frame_size, True)
+        
+        # The probe cannot swap the buffer from Python: chain the new one into the payloader, drop the original.
+        # DROP reports OK upstream, so a failed chain stops injecting: later buffers pass and carry the real flow return
+        ret = self.pay_sinkpad.chain(new_buffer)
+        if ret != Gst.FlowReturn.OK and ret != Gst.FlowReturn.FLUSHING:
+            self.sei_flow = ret
+            if ret != Gst.FlowReturn.EOS:
+                self.post_sei_error(pad.get_parent_element(), ret)
+        return Gst.PadProbeReturn.DROP
+    
+    def post_sei_error(self, element, ret):
+        """Error message on the pipeline bus for a payloader flow error behind the SEI probe"""
+        name = Gst.flow_get_name(ret)
+        print(f"⚠️  SEI injection stopped: rtph264pay returned {name}")
+        error = GLib.Error.new_literal(Gst.stream_error_quark(), f"rtph264pay returned {name} after SEI injection",
+                                       int(Gst.StreamError.FAILED))
+        element.post_message(Gst.Message.new_error(element, error, "trackSender.on_sei_probe"))
+    
+    def inject_sei_copy(self, buffer, data, sei_nal, insert_pos):
+        """Original path: splice SEI into a Python bytes copy and wrap it in a new buffer"""
+        output_data = data
+        
+        if sei_nal is not None:
+            # Insert SEI before IDR frame
+            if insert_pos > 0:
+                output_data = data[:insert_pos] + sei_nal + data[insert_pos:]
+                log.log("sei", "💉 Inserted SEI at position %d (before IDR)", insert_pos)
+            else:
+                # If no IDR found, insert at beginning
+                output_data = sei_nal + data
+                log.log("sei", "💉 Inserted SEI at beginning (no IDR found)")
+            
+            self.sei_injection_counter += 1
+            log.log("sei", "✅ SEI injection #%d successful! New size: %d bytes", self.sei_injection_counter, len(output_data))
+            
+            # Verify SEI was added (debug only, it re-scans the whole frame)
+            if log.mode == "verbose":
+                log.log("sei", "🔍 After injection NALUs: %s", self.analyze_h264_frame(output_data))
         
         # Create new buffer and send to RTP pipeline
         new_buffer = Gst.Buffer.new_wrapped(output_data)
@@ -349,9 +729,20 @@ class FixedTrackingSender:
         new_buffer.dts = buffer.dts
         new_buffer.duration = buffer.duration
         new_buffer.set_flags(buffer.get_flags())
-        
-        ret = self.rtp_appsrc.emit("push-buffer", new_buffer)
-        return Gst.FlowReturn.OK
+        return new_buffer
+    
+    def inject_sei_memory(self, buffer, sei_nal, insert_pos):
+        """Zero-copy path: add the SEI as its own GstMemory in front of the IDR slice"""
+        if sei_nal is None:
+            # Nothing to add, forward the encoder's buffer untouched
+            return buffer
+        
+        new_buffer = SEINALInjector.insert_sei_memory(buffer, sei_nal, insert_pos)
+        
+        self.sei_injection_counter += 1
+        log.log("sei", "💉 SEI injection #%d: memory inserted at position %d (%d memories, no frame copy), new size %d bytes",
+                self.sei_injection_counter, insert_pos, new_buffer.n_memory(), new_buffer.get_size())
+        return new_buffer
     
     def on_detection_message(self, bus, message):
         """Handle detection pipeline messages"""
@@ -406,11 +797,45 @@ class FixedTrackingSender:
         print(f"📦 Resolution: {self.width}x{self.height} -> 1280x720")
         print(f"🔧 Hailo Python: {'Available' if HAVE_HAILO else 'Not Available'}")
         print(f"🆔 SEI UUID: {SEINALInjector.CUSTOM_UUID[:8].hex()}")
+        print(f"💉 SEI inject: {self.sei_inject}, format: {self.sei_format}, "
+              f"{'every frame' if self.sei_every_frame else 'keyframes only'}")
+        print(f"🧩 Pipeline mode: {self.pipeline_mode}")
+        print(f"🎞️  Encoder: {self.encoder}")
         print("=" * 70)
         
         self.running = True
+        if self.clock_sync_port:
+            self.clock_sync = ClockSyncServer(self.clock_sync_port).start()
+            print(f"🕒 Clock sync server on UDP {self.clock_sync_port}")
+        self.cpu_start = time.process_time()
+        self.wall_start = time.monotonic()
+        
+        if self.pipeline_mode == "single":
+            self.create_single_pipeline()
+            
+            print("Starting single pipeline...")
+            ret = self.single_pipeline.set_state(Gst.State.PLAYING)
+            if ret == Gst.StateChangeReturn.FAILURE:
+                print("ERROR: Unable to set single pipeline to PLAYING")
+                sys.exit(1)
+            self.start_rate_control(self.single_pipeline)
+        else:
+            self.start_split_pipelines()
+        self.register_metrics()
         
-        # Create pipelines
+        print("All pipelines started! Detecting and transmitting with SEI debug:")
+        print("-" * 70)
+        
+        try:
+            loop = GLib.MainLoop()
+            loop.run()
+        except KeyboardInterrupt:
+            print(f"\n[INFO] Keyboard interrupt. Frames: {self.frame_counter}, SEI injections: {self.sei_injection_counter}")
+        finally:
+            self.stop()
+    
+    def start_split_pipelines(self):
+        """Create and start the detection, encode and RTP pipelines"""
         self.create_detection_pipeline()
         self.create_transmission_pipeline()
         
@@ -434,23 +859,16 @@ class FixedTrackingSender:
         if ret == Gst.StateChangeReturn.FAILURE:
             print("ERROR: Unable to set detection pipeline to PLAYING")
             sys.exit(1)
-        
-        print("All pipelines started! Detecting and transmitting with SEI debug:")
-        print("-" * 70)
-        
-        try:
-            loop = GLib.MainLoop()
-            loop.run()
-        except KeyboardInterrupt:
-            print(f"\n[INFO] Keyboard interrupt. Frames: {self.frame_counter}, SEI injections: {self.sei_injection_counter}")
-        finally:
-            self.stop()
+        self.start_rate_control(self.detection_pipeline)
     
     def stop(self):
         """Stop all pipelines"""
         self.running = False
         
         print("[INFO] Stopping pipelines...")
+        if self.rate_ctl is not None:
+            self.rate_ctl.stop()
+        finish_analytics(self.analytics)
         
         if self.detection_pipeline:
             self.detection_pipeline.set_state(Gst.State.NULL)
@@ -458,8 +876,29 @@ class FixedTrackingSender:
             self.transmission_pipeline.set_state(Gst.State.NULL)
         if self.rtp_pipeline:
             self.rtp_pipeline.set_state(Gst.State.NULL)
+        if self.single_pipeline:
+            self.single_pipeline.set_state(Gst.State.NULL)
+        if self.clock_sync:
+            self.clock_sync.stop()
+            print(f"[INFO] Clock sync: answered {self.clock_sync.requests} requests")
+            self.clock_sync = None
         
         print(f"[INFO] Session complete. Frames: {self.frame_counter}, SEI: {self.sei_injection_counter}")
+        print(f"[INFO] {self.injection_stats.summary()}")
+        print(f"[INFO] {self.meta_ring.summary()}")
+        if self.abr is not None:
+            print(f"[INFO] {self.abr.summary()}")
+        if self.rate_ctl is not None:
+            print(f"[INFO] {self.rate_ctl.summary()}")
+        if self.tracker is not None:
+            print(f"[INFO] {self.tracker.status_line()}")
+        print(f"[INFO] {log.summary()}")
+        
+        wall = time.monotonic() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        if wall > 0:
+            print(f"[INFO] CPU [{self.pipeline_mode}]: {cpu:.1f} s over {wall:.1f} s wall "
+                  f"({cpu / wall * 100.0:.1f}% of one core)")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -480,8 +919,37 @@ Example:
     parser.add_argument("--port", type=int, default=5000, help="UDP port")
     parser.add_argument("--width", type=int, default=640, help="Input width")
     parser.add_argument("--height", type=int, default=480, help="Input height")
+    parser.add_argument("--sei-inject", choices=["memory", "copy"], default="memory",
+                        help="SEI injection path: zero-copy GstMemory insert or original bytes splice (default: memory)")
+    parser.add_argument("--sei-format", choices=["binary", "json"], default="binary",
+                        help="SEI payload: binary per-object tracks or legacy JSON counts (default: binary)")
+    parser.add_argument("--sei-every-frame", action="store_true",
+                        help="Insert SEI on every encoded frame instead of keyframes only")
+    parser.add_argument("--sei-max-wait-ms", type=int, default=250,
+                        help="Max time an encoded frame waits for its PTS metadata (default: 250)")
+    parser.add_argument("--pipeline", choices=["split", "single"], default="split",
+                        help="split: detection/encode/RTP pipelines via appsink/appsrc; "
+                             "single: one pipeline with an SEI pad probe (default: split)")
+    parser.add_argument("--clock-sync-port", type=int, default=0,
+                        help="Answer receiver clock sync requests on this UDP port for latency "
+                             "measurement (trackReceiver.py --clock-sync HOST:PORT), 0 = off (default: 0)")
+    
+    add_encoder_arguments(parser)
+    add_abr_arguments(parser)
+    add_rate_control_arguments(parser)
+    add_metrics_arguments(parser)
+    add_analytics_arguments(parser)
+    add_tracker_arguments(parser)
+    add_log_arguments(parser)
     
     args = parser.parse_args()
+    configure_from_args(args)
+    # --rate-control moves the transmitted rate too (up to --max-inference-fps): size the encoder for the top
+    # rate, keeping one keyframe per second there (the bitrate is per second, so it holds at any rate)
+    tx_fps = (args.max_inference_fps or 30) if args.rate_control else TX_FPS
+    tx_key_int = TX_KEY_INT * tx_fps // TX_FPS
+    encoder = resolve_encoder(args, TX_WIDTH, TX_HEIGHT, tx_fps, TX_BITRATE_KBPS, tx_key_int,
+                              default=DEFAULT_ENCODER.format(key_int=tx_key_int))
     
     sender = FixedTrackingSender(
         device=args.device,
@@ -490,10 +958,27 @@ Example:
         host=args.host,
         port=args.port,
         width=args.width,
-        height=args.height
+        height=args.height,
+        sei_inject=args.sei_inject,
+        sei_format=args.sei_format,
+        sei_every_frame=args.sei_every_frame,
+        sei_max_wait_ms=args.sei_max_wait_ms,
+        pipeline_mode=args.pipeline,
+        clock_sync_port=args.clock_sync_port,
+        encoder=encoder,
+        abr=controller_from_args(args, TX_BITRATE_KBPS, tx_key_int) if args.rtcp else None,
+        netsim_drop=args.netsim_drop,
+        rate_control=dict(target_latency_ms=args.target_latency_ms, min_fps=args.min_inference_fps,
+                          max_fps=args.max_inference_fps or 30) if args.rate_control else None,
+        metrics=start_metrics(args, "trackSender"),
+        analytics=analytics_from_args(args),
+        tracker=tracker_from_args(args)
     )
     
-    sender.start()
+    try:
+        sender.start()
+    finally:
+        log.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,7 @@
+# receiver for sender.py --rtcp: RTP on 5000, sender RTCP on 5001, receiver reports back to the sender on 5005
+SENDER=${1:-127.0.0.1}
+gst-launch-1.0  rtpbin name=rtpbin latency=50 \
+  udpsrc port=5000 caps="application/x-rtp, media=video, encoding-name=H264, clock-rate=90000, payload=96" ! rtpbin.recv_rtp_sink_0 \
+  udpsrc port=5001 ! rtpbin.recv_rtcp_sink_0 \
+  rtpbin.send_rtcp_src_0 ! udpsink host=$SENDER port=5005 sync=false async=false \
+  rtpbin. ! rtph264depay ! h264parse ! avdec_h264 ! videoconvert ! autovideosink sync=false
@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 import argparse
+import os
 import sys
 
 import gi
 gi.require_version("Gst", "1.0")
 from gi.repository import Gst, GObject, GLib
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from encoder_probe import add_encoder_arguments, resolve_encoder
+from rtcp_abr import RtcpAbr, add_abr_arguments, controller_from_args, named_encoder, rtpbin_send_section
 
-def build_pipeline(args):
+# The file's size/rate are only known after decodebin: --encoder auto probes at 720p30
+PROBE_WIDTH, PROBE_HEIGHT, PROBE_FPS = 1280, 720, 30
+
+
+def build_pipeline(args, encoder):
     """
     Build a GStreamer pipeline equivalent to:
 
@@ -17,6 +25,11 @@ def build_pipeline(args):
       videoconvert ! x264enc ! rtph264pay ! udpsink ...
     """
 
+    if args.rtcp:
+        rtp_sink = rtpbin_send_section(args.host, args.port, drop_probability=args.netsim_drop)
+    else:
+        rtp_sink = f'udpsink host="{args.host}" port={args.port}'
+
     pipeline_str = f"""
         filesrc location="{args.input}" name=src_0 !
         decodebin !
@@ -40,12 +53,9 @@ def build_pipeline(args):
         hailooverlay qos=false !
         queue leaky=no max-size-buffers=30 max-size-bytes=0 max-size-time=0 !
         videoconvert n-threads=2 qos=false !
-        x264enc tune=zerolatency
-                 speed-preset=ultrafast
-                 bitrate={args.bitrate}
-                 key-int-max=30 !
+        {named_encoder(encoder)} !
         rtph264pay config-interval=1 pt=96 !
-        udpsink host="{args.host}" port={args.port}
+        {rtp_sink}
     """
 
     # Strip leading spaces so parse_launch is happy
@@ -104,12 +114,27 @@ def main():
         default=4000,
         help="Video bitrate (kbps) for x264enc",
     )
+    add_encoder_arguments(parser)
+    add_abr_arguments(parser)
 
     args = parser.parse_args()
 
     Gst.init(None)
 
-    pipeline = build_pipeline(args)
+    default_encoder = f"x264enc tune=zerolatency speed-preset=ultrafast bitrate={args.bitrate} key-int-max=30"
+    encoder = resolve_encoder(args, PROBE_WIDTH, PROBE_HEIGHT, PROBE_FPS, args.bitrate, 30,
+                              default=default_encoder)
+    pipeline = build_pipeline(args, encoder)
+
+    abr = None
+    if args.rtcp:
+        def on_abr_update(state, changed):
+            if changed:
+                print(f"[ABR] loss {state['loss'] * 100:.1f}%, jitter {state['jitter_ms']:.1f} ms -> "
+                      f"{state['action']} {state['bitrate_kbps']} kbit/s (key-int {state['key_int']})")
+
+        abr = RtcpAbr(pipeline.get_by_name("rtpbin"), pipeline.get_by_name("encoder"),
+                      controller_from_args(args, args.bitrate, 30), on_update=on_abr_update).start()
 
     # Bus handling
     bus = pipeline.get_bus()
@@ -141,6 +166,8 @@ def main():
         print("Interrupted by user, stopping...")
     finally:
         pipeline.set_state(Gst.State.NULL)
+        if abr is not None:
+            print(abr.controller.summary())
 
 
 if __name__ == "__main__":